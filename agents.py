@@ -1,36 +1,25 @@
+import asyncio
 import json
 import logging
 import os
-from typing import Any, Callable, Dict, List, Optional, Union
-
-from langchain.memory import \
-    ConversationBufferMemory  # Changed from langchain_core
-# Chat models
-from langchain_anthropic import ChatAnthropic
-from langchain_aws.chat_models import ChatBedrock
-from langchain_core.agents import AgentExecutor, ConversationalAgent, Tool
-from langchain_core.chains import LLMChain
-from langchain_core.messages import BaseMessage, SystemMessage
-# Core components
-from langchain_core.prompts import (ChatPromptTemplate,
-                                    HumanMessagePromptTemplate, PromptTemplate,
-                                    SystemMessagePromptTemplate)
-from langchain_core.tools import BaseTool
-# Database
-from langchain_mongodb import MongoDBChatMessageHistory
-from langchain_ollama import ChatOllama
-from langchain_openai import ChatOpenAI
-from langgraph.graph import END, Graph, StateGraph
-from langgraph.graph.state import State
-from langgraph_sdk.client import SyncAssistantsClient
-
-from config import (MODEL_CONFIGS, MONGODB_CONFIG, OLLAMA_CONFIG,
-                    PROMPT_TEMPLATES)
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from config import MONGODB_CONFIG, OLLAMA_CONFIG, get_model_config
 from mongodb import MongoDBManager
-from prompts import get_prompt_for_agent
+from message_log import alog_message, message_history
+from prompt_registry import get_prompt_registry
 from state import NovelSystemState
 from utils import create_prompt_with_context, current_timestamp
 
+# Provider SDKs, memory and the LangGraph client are imported where they are
+# used, so importing this module (API and job workers) stays fast
+if TYPE_CHECKING:
+    from langchain.memory import ConversationBufferMemory
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.tools import BaseTool
+    from langchain_mongodb import MongoDBChatMessageHistory
+    from langgraph_sdk.client import SyncAssistantsClient
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -46,15 +35,26 @@ class AgentFactory:
             mongo_manager: The MongoDB manager for persistence.
         """
         self.mongo_manager = mongo_manager or MongoDBManager()
-        self.assistants_client = SyncAssistantsClient()
+        self._assistants_client: Optional["SyncAssistantsClient"] = None
+
+    @property
+    def assistants_client(self) -> "SyncAssistantsClient":
+        """The LangGraph Cloud client, created on first use."""
+        if self._assistants_client is None:
+            from langgraph_sdk.client import SyncAssistantsClient
+
+            self._assistants_client = SyncAssistantsClient()
+        return self._assistants_client
 
     def _get_llm(self, agent_name: str) -> Any:
         """Get an LLM for an agent based on its configuration."""
         try:
-            config = MODEL_CONFIGS.get(agent_name, {})
+            config = get_model_config(agent_name)
             model_name = config.get("model", "")
 
             if model_name.startswith("anthropic/"):
+                from langchain_anthropic import ChatAnthropic
+
                 return ChatAnthropic(
                     model=model_name.split("/")[1],
                     temperature=config.get("temperature", 0.2),
@@ -62,12 +62,16 @@ class AgentFactory:
                     anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
                 )
             elif model_name.startswith("openai/"):
+                from langchain_openai import ChatOpenAI
+
                 return ChatOpenAI(
                     model=model_name.split("/")[1],
                     temperature=config.get("temperature", 0.2),
                     max_tokens=config.get("max_tokens", 4000),
                 )
             elif model_name.startswith("ollama/"):
+                from langchain_ollama import ChatOllama
+
                 return ChatOllama(
                     model=model_name.split("/")[1],
                     temperature=config.get("temperature", 0.2),
@@ -81,16 +85,20 @@ class AgentFactory:
 
     def _get_message_history(
         self, agent_name: str, project_id: str
-    ) -> MongoDBChatMessageHistory:
+    ) -> "MongoDBChatMessageHistory":
         """Get message history for an agent."""
+        from langchain_mongodb import MongoDBChatMessageHistory
+
         return MongoDBChatMessageHistory(
             connection_string=MONGODB_CONFIG["connection_string"],
             database_name=MONGODB_CONFIG["database_name"],
             collection_name=f"message_history_{agent_name}_{project_id}",
         )
 
-    def _get_memory(self, agent_name: str, project_id: str) -> ConversationBufferMemory:
+    def _get_memory(self, agent_name: str, project_id: str) -> "ConversationBufferMemory":
         """Get memory for an agent."""
+        from langchain.memory import ConversationBufferMemory
+
         message_history = self._get_message_history(agent_name, project_id)
         return ConversationBufferMemory(
             memory_key="chat_history", chat_memory=message_history, return_messages=True
@@ -107,11 +115,11 @@ class AgentFactory:
         """
         try:
             # Get the model configuration
-            config = MODEL_CONFIGS.get(agent_name, {})
+            config = get_model_config(agent_name)
             model_name = config.get("model", "")
 
             # Get the specialized prompt for this agent
-            prompt = get_prompt_for_agent(agent_name)
+            prompt = get_prompt_registry().get(agent_name).text
 
             # Create the assistant using LangGraph SDK
             assistant = self.assistants_client.create(
@@ -129,7 +137,7 @@ class AgentFactory:
 
     def create_agent(
         self, agent_name: str, project_id: str
-    ) -> Callable[[NovelSystemState], Dict]:
+    ) -> Callable[[NovelSystemState], Awaitable[Dict]]:
         """Create an agent function for use in the graph.
 
         Args:
@@ -144,170 +152,165 @@ class AgentFactory:
             if os.getenv("LANGGRAPH_CLOUD") >= "true":
                 assistant_id = self._get_or_create_assistant(agent_name)
 
-                def cloud_agent_function(state: NovelSystemState) -> Dict:
+                def run_assistant(context: Dict[str, Any]) -> str:
+                    """Run the assistant on a new thread (the client is synchronous)."""
+                    thread = self.assistants_client.create_thread()
+                    self.assistants_client.add_message(
+                        thread_id=thread.id,
+                        role="user",
+                        content=json.dumps(context),
+                    )
+                    self.assistants_client.run_thread(
+                        thread_id=thread.id, assistant_id=assistant_id
+                    )
+                    messages = self.assistants_client.get_messages(thread.id)
+                    return messages[0].content[0].text.value
+
+                async def cloud_agent_function(state: NovelSystemState) -> Dict:
                     """The agent function to be used in the graph with LangGraph Cloud.
 
                     Args:
                         state: The current state.
 
                     Returns:
-                        The updated state.
+                        The fields of the state the agent changed.
                     """
                     try:
-                        # Prepare the context
+                        # Prepare the context, with the latest messages of the team
                         context = {
-                            "project_state": json.dumps(state["project"], indent=2),
+                            "project_state": state["project"].to_json(),
                             "current_phase": state["project"].current_phase,
                             "task": state["current_input"].get("task", ""),
                             "input": state["current_input"].get("content", ""),
+                            "recent_messages": await message_history(state).arecent(),
                         }
 
-                        # Create a thread and run the assistant
-                        thread = self.assistants_client.create_thread()
-                        self.assistants_client.add_message(
-                            thread_id=thread.id,
-                            role="user",
-                            content=json.dumps(context),
-                        )
-                        run = self.assistants_client.run_thread(
-                            thread_id=thread.id, assistant_id=assistant_id
-                        )
-
-                        # Get the response
-                        messages = self.assistants_client.get_messages(thread.id)
-                        response = messages[0].content[0].text.value
+                        # Blocking client and log calls run in worker threads
+                        response = await asyncio.to_thread(run_assistant, context)
 
-                        # Update the state
-                        state["current_output"] = {
-                            "agent": agent_name,
-                            "content": response,
-                            "timestamp": current_timestamp(),
-                        }
-
-                        # Add to message history
-                        state["messages"].append(
-                            {
-                                "role": agent_name,
+                        # Return only the changes; the message goes to the message
+                        # log and the state keeps its id
+                        timestamp = current_timestamp()
+                        return {
+                            "current_output": {
+                                "agent": agent_name,
                                 "content": response,
-                                "timestamp": current_timestamp(),
-                            }
-                        )
-
-                        return state
+                                "timestamp": timestamp,
+                            },
+                            **await alog_message(
+                                state,
+                                {
+                                    "role": agent_name,
+                                    "content": response,
+                                    "timestamp": timestamp,
+                                },
+                            ),
+                        }
                     except Exception as e:
                         logger.error(
                             f"Error in cloud agent function for agent {agent_name}: {e}"
                         )
-                        state["errors"].append(
-                            {
-                                "agent": agent_name,
-                                "error": str(e),
-                                "timestamp": current_timestamp(),
-                            }
-                        )
-                        return state
+                        return {
+                            "errors": [
+                                {
+                                    "agent": agent_name,
+                                    "error": str(e),
+                                    "timestamp": current_timestamp(),
+                                }
+                            ]
+                        }
 
                 return cloud_agent_function
 
             # For local deployment, use LangChain
             else:
+                from langchain_core.chains import LLMChain
+
                 llm = self._get_llm(agent_name)
                 memory = self._get_memory(agent_name, project_id)
                 prompt = self._get_prompt_template(agent_name)
 
                 chain = LLMChain(llm=llm, prompt=prompt, memory=memory, verbose=True)
 
-                def local_agent_function(state: NovelSystemState) -> Dict:
+                async def local_agent_function(state: NovelSystemState) -> Dict:
                     """The agent function to be used in the graph locally.
 
                     Args:
                         state: The current state.
 
                     Returns:
-                        The updated state.
+                        The fields of the state the agent changed.
                     """
                     try:
-                        # Prepare the context
+                        # Prepare the context, with the latest messages of the team
                         context = {
-                            "project_state": json.dumps(state["project"], indent=2),
+                            "project_state": state["project"].to_json(),
                             "current_phase": state["project"].current_phase,
                             "task": state["current_input"].get("task", ""),
                             "input": state["current_input"].get("content", ""),
+                            "recent_messages": await message_history(state).arecent(),
                         }
 
                         # Run the chain
-                        response = chain.run(input=json.dumps(context))
-
-                        # Update the state
-                        state["current_output"] = {
-                            "agent": agent_name,
-                            "content": response,
-                            "timestamp": current_timestamp(),
-                        }
+                        response = await chain.arun(input=json.dumps(context))
 
-                        # Add to message history
-                        state["messages"].append(
-                            {
-                                "role": agent_name,
+                        # Return only the changes; the message goes to the message
+                        # log and the state keeps its id
+                        timestamp = current_timestamp()
+                        return {
+                            "current_output": {
+                                "agent": agent_name,
                                 "content": response,
-                                "timestamp": current_timestamp(),
-                            }
-                        )
-
-                        return state
+                                "timestamp": timestamp,
+                            },
+                            **await alog_message(
+                                state,
+                                {
+                                    "role": agent_name,
+                                    "content": response,
+                                    "timestamp": timestamp,
+                                },
+                            ),
+                        }
                     except Exception as e:
                         logger.error(
                             f"Error in local agent function for agent {agent_name}: {e}"
                         )
-                        state["errors"].append(
-                            {
-                                "agent": agent_name,
-                                "error": str(e),
-                                "timestamp": current_timestamp(),
-                            }
-                        )
-                        return state
+                        return {
+                            "errors": [
+                                {
+                                    "agent": agent_name,
+                                    "error": str(e),
+                                    "timestamp": current_timestamp(),
+                                }
+                            ]
+                        }
 
                 return local_agent_function
         except Exception as e:
             logger.error(f"Error creating agent {agent_name}: {e}")
             raise
 
-    def _get_prompt_template(self, agent_name: str) -> PromptTemplate:
-        """Get a prompt template for an agent.
+    def _get_prompt_template(self, agent_name: str) -> "ChatPromptTemplate":
+        """Get the compiled prompt template for an agent.
+
+        The specialized prompts override the basic templates in config; both
+        are compiled once per process by the prompt registry.
 
         Args:
             agent_name: Name of the agent.
 
         Returns:
-            A PromptTemplate instance.
+            A shared ChatPromptTemplate instance.
         """
-        try:
-            # First try to get from the specialized prompts file
-            template = get_prompt_for_agent(agent_name)
-
-            # If not found, fall back to the basic templates in config
-            if not template:
-                template = PROMPT_TEMPLATES.get(agent_name, "You are an AI assistant.")
-
-            # Create a ChatPromptTemplate
-            system_message_prompt = SystemMessagePromptTemplate.from_template(template)
-            human_message_prompt = HumanMessagePromptTemplate.from_template("{input}")
-            chat_prompt = ChatPromptTemplate.from_messages(
-                [system_message_prompt, human_message_prompt]
-            )
-
-            return chat_prompt
-        except Exception as e:
-            logger.error(f"Error getting prompt template for agent {agent_name}: {e}")
-            raise
+        return get_prompt_registry().get(agent_name).template
 
 
 # Replace ToolExecutor with our own implementation
 class ToolExecutor:
     """Simple tool executor implementation"""
 
-    def __init__(self, tools: List[BaseTool]):
+    def __init__(self, tools: List["BaseTool"]):
         self.tools = {tool.name: tool for tool in tools}
 
     def invoke(self, tool_name: str, tool_input: Any) -> Any:
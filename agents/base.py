@@ -1,31 +1,278 @@
+import asyncio
+import json
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
-from langchain_anthropic import ChatAnthropic
 import structlog
 
+from indexing.bm25 import Chunk, format_chunks, project_index
+from prompt_registry import get_prompt_registry
+from singleflight import get_single_flight, request_key
+from utils import estimate_tokens, lazy, lazy_attributes
+from workflows.batch import active_batch
+
 logger = structlog.get_logger(__name__)
 
+# Provider SDKs are slow to import, so they are loaded when the first agent is built
+__getattr__ = lazy_attributes(__name__, {"ChatAnthropic": "langchain_anthropic:ChatAnthropic"})
+
+BATCH_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """{instructions}
+
+Each item below is tagged with an "id". Process every item independently.
+Your output must be valid JSON with the following structure:
+{{
+    "results": [
+        {{
+            "id": "the item id",
+            "...": "the result fields for that item"
+        }}
+    ]
+}}
+Return exactly one result per item and copy each id unchanged."""),
+    ("human", "{input}")
+])
+
+
+def pack_batches(
+    items: List[Dict[str, Any]],
+    render: Callable[[Dict[str, Any]], str],
+    max_items: int,
+    token_budget: int
+) -> List[List[Dict[str, Any]]]:
+    """Greedily pack items into batches bounded by count and estimated tokens.
+
+    An item that alone exceeds the budget is sent in a batch of its own.
+    """
+    batches: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    current_tokens = 0
+
+    for item in items:
+        item_tokens = estimate_tokens(render(item))
+        if current and (
+            len(current) >= max_items or current_tokens + item_tokens > token_budget
+        ):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += item_tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def gather_bounded(aws: Iterable[Awaitable[Any]], limit: int) -> List[Any]:
+    """Await all awaitables with at most ``limit`` running at once.
+
+    Results are returned in input order; the first exception propagates.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(aw: Awaitable[Any]) -> Any:
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws))
+
+
+def build_prompt(system_prompt: str) -> ChatPromptTemplate:
+    """The compiled chat prompt whose system message is taken literally.
+
+    Agent prompts embed JSON examples, so their braces must not be parsed
+    as template variables. Each distinct prompt is compiled once per process.
+    """
+    return get_prompt_registry().literal(system_prompt).template
+
+
 class BaseAgent(ABC):
     """Base class for all story creation agents."""
-    
+
+    # Whether calls may be deferred to a provider batch in batch execution mode.
+    batch_eligible: bool = True
+
+    # State fields the agent reads and writes, used to memoize workflow nodes.
+    # An agent that declares no reads is always run.
+    reads: Tuple[str, ...] = ()
+    writes: Tuple[str, ...] = ()
+
+    # Whether a feedback re-run can be limited to the scenes in
+    # ``state['recompute_scope']``.
+    item_scoped: bool = False
+
     def __init__(
         self,
         model_name: str = "claude-3-opus-20240229",
         system_prompt: Optional[str] = None
     ):
-        self.llm = ChatAnthropic(model=model_name)
+        self.model_name = model_name
+        self.llm = lazy(__name__, "ChatAnthropic")(model=model_name)
         self.output_parser = JsonOutputParser()
         self.logger = structlog.get_logger(f"{__name__}.{self.__class__.__name__}")
-        
+
+        # Hash of the system prompt, for cache keys
+        self.prompt_version: Optional[str] = None
         if system_prompt:
-            self.prompt = ChatPromptTemplate.from_messages([
-                ("system", system_prompt),
-                ("human", "{input}")
-            ])
-    
+            compiled = get_prompt_registry().literal(system_prompt, type(self).__name__)
+            self.prompt = compiled.template
+            self.prompt_version = compiled.version
+
+    def _model_params(self) -> Dict[str, Any]:
+        """Model parameters that change the response for a given prompt."""
+        return {
+            "model": getattr(self.llm, "model", self.model_name),
+            "temperature": getattr(self.llm, "temperature", None),
+            "max_tokens": getattr(self.llm, "max_tokens", None),
+        }
+
+    async def _ainvoke_chain(
+        self,
+        input_text: str,
+        prompt: Optional[ChatPromptTemplate] = None,
+        **variables: Any
+    ) -> Dict[str, Any]:
+        """Run a prompt through the LLM and parse the JSON response.
+
+        Uses the agent's own prompt unless another one is given. Identical
+        concurrent requests share a single provider call. In batch execution
+        mode the request is deferred to the active provider batch.
+        """
+        prompt = prompt or self.prompt
+        messages = prompt.format_messages(input=input_text, **variables)
+        key = request_key(messages, self._model_params())
+
+        collector = active_batch.get()
+        if collector is not None and self.batch_eligible:
+            text = await collector.dispatch(key, messages, self._model_params())
+            return self.output_parser.parse(text)
+
+        chain = self.llm | self.output_parser
+        return await get_single_flight().do(key, lambda: chain.ainvoke(messages))
+
+    def retrieve_chunks(
+        self,
+        state: Dict[str, Any],
+        query: str,
+        k: int = 8,
+        max_tokens: int = 1500,
+        exclude_scenes: Iterable[str] = ()
+    ) -> List[Chunk]:
+        """The story bible and scene chunks most relevant to ``query``.
+
+        Retrieves up to ``k`` chunks within ``max_tokens`` from the project's
+        local BM25 index, which is updated from ``state`` first. Prose of
+        ``exclude_scenes`` is left out.
+        """
+        chunks = project_index(state).retrieve(
+            query, k=k, max_tokens=max_tokens, exclude_scenes=exclude_scenes
+        )
+        self.logger.info("context_retrieved", chunk_count=len(chunks))
+        return chunks
+
+    def retrieve_context(
+        self,
+        state: Dict[str, Any],
+        query: str,
+        k: int = 8,
+        max_tokens: int = 1500,
+        exclude_scenes: Iterable[str] = ()
+    ) -> str:
+        """``retrieve_chunks`` formatted for a prompt."""
+        return format_chunks(self.retrieve_chunks(state, query, k, max_tokens, exclude_scenes))
+
+    async def invoke_batched(
+        self,
+        items: List[Dict[str, Any]],
+        instructions: str,
+        validate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        render: Optional[Callable[[Dict[str, Any]], str]] = None,
+        max_items: int = 20,
+        token_budget: int = 6000,
+        max_retries: int = 2
+    ) -> Dict[str, Dict[str, Any]]:
+        """Process independent items with as few LLM calls as possible.
+
+        Items (scenes, dialogues, chapters, ...) must each carry an ``id``.
+        They are packed into id-tagged requests bounded by ``max_items`` and
+        ``token_budget``, the responses are matched back to their items, and
+        only the items that are missing or fail ``validate`` are retried, in
+        smaller batches.
+
+        Returns:
+            A mapping of item id to its validated result. Items that still
+            fail after ``max_retries`` retries are left out.
+        """
+        render = render or (lambda item: json.dumps(item, default=str))
+        validate = validate or (lambda result: True)
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = list(items)
+
+        for attempt in range(max_retries + 1):
+            if not pending:
+                break
+
+            batches = pack_batches(pending, render, max_items, token_budget)
+            outputs = await asyncio.gather(
+                *(self._invoke_batch(batch, instructions, render) for batch in batches),
+                return_exceptions=True
+            )
+
+            failed: List[Dict[str, Any]] = []
+            for batch, output in zip(batches, outputs):
+                if isinstance(output, Exception):
+                    self.logger.warning(
+                        "batch_request_failed",
+                        attempt=attempt,
+                        item_count=len(batch),
+                        error=str(output)
+                    )
+                    failed.extend(batch)
+                    continue
+
+                for item in batch:
+                    result = output.get(str(item["id"]))
+                    if result is not None and validate(result):
+                        results[str(item["id"])] = result
+                    else:
+                        failed.append(item)
+
+            self.logger.info(
+                "batch_round_complete",
+                attempt=attempt,
+                batch_count=len(batches),
+                succeeded=len(pending) - len(failed),
+                failed=len(failed)
+            )
+            pending = failed
+            max_items = max(1, max_items // 2)
+
+        if pending:
+            self.logger.error(
+                "batch_items_failed",
+                item_ids=[str(item["id"]) for item in pending]
+            )
+        return results
+
+    async def _invoke_batch(
+        self,
+        batch: List[Dict[str, Any]],
+        instructions: str,
+        render: Callable[[Dict[str, Any]], str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Send one packed batch and index the results by item id."""
+        input_text = "\n".join(render(item) for item in batch)
+        response = await self._ainvoke_chain(
+            input_text, prompt=BATCH_PROMPT, instructions=instructions
+        )
+        return {
+            str(result["id"]): result
+            for result in response.get("results", [])
+            if isinstance(result, dict) and "id" in result
+        }
+
     @abstractmethod
     async def invoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        """Process the current state and return updated state."""
+        """Process the current state and return the fields it changes, for ``apply_delta``."""
         pass
\ No newline at end of file
@@ -1,5 +1,6 @@
 from typing import Dict, Any, List
 from .base import BaseAgent
+from .prompt_format import to_prompt
 
 CHARACTER_DESIGNER_PROMPT = """You are the Character Designer responsible for creating deep, 
 compelling characters. Create detailed character profiles based on the story requirements.
@@ -40,6 +41,12 @@ Your output must be valid JSON with the following structure:
 }"""
 
 class CharacterDesigner(BaseAgent):
+    reads = ('title', 'genre', 'world_building', 'creative_direction', 'characters')
+    writes = (
+        'characters', 'character_arcs', 'ensemble_dynamics',
+        'character_development_complete'
+    )
+
     def __init__(self, model_name: str = "claude-3-opus-20240229"):
         super().__init__(model_name, CHARACTER_DESIGNER_PROMPT)
     
@@ -48,20 +55,19 @@ class CharacterDesigner(BaseAgent):
             input_text = f"""
             Title: {state.get('title')}
             Genre: {state.get('genre')}
-            Creative Direction: {state.get('creative_direction', {})}
-            World Building: {state.get('world_building', {})}
-            Existing Characters: {state.get('characters', [])}
+            Creative Direction: {to_prompt(state.get('creative_direction', {}))}
+            World Building: {to_prompt(state.get('world_building', {}))}
+            Existing Characters: {to_prompt(state.get('characters', []))}
             """
             
-            chain = self.prompt | self.llm | self.output_parser
-            result = await chain.ainvoke({"input": input_text})
+            result = await self._ainvoke_chain(input_text)
             
-            state.update({
+            delta = {
                 'characters': result['characters'],
                 'character_arcs': result['character_arcs'],
                 'ensemble_dynamics': result['ensemble_dynamics'],
                 'character_development_complete': True
-            })
+            }
             
             self.logger.info(
                 "character_design_complete",
@@ -70,7 +76,7 @@ class CharacterDesigner(BaseAgent):
                 chemistry_score=result["ensemble_dynamics"]["character_chemistry_score"]
             )
             
-            return state
+            return delta
             
         except Exception as e:
             self.logger.error("character_design_failed", error=str(e))
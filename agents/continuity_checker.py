@@ -1,9 +1,20 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List, Optional
+from indexing.entity_index import sync_entity_index
+from indexing.manuscript import scene_passages
+from state import delta_view
+from workflows.invalidation import recompute_scope
 from .base import BaseAgent
+from .continuity_index import (ContinuityIndex, load_continuity_index,
+                               save_continuity_index)
+from .prompt_format import to_prompt
 
-CONTINUITY_CHECKER_PROMPT = """You are the Continuity Checker responsible for maintaining 
+CONTINUITY_CHECKER_PROMPT = """You are the Continuity Checker responsible for maintaining
 story consistency. Verify plot continuity, character arcs, and world-building rules.
 
+You are given the scenes to check and the facts already established by earlier scenes.
+Check the scenes against those facts and against each other, and record every new fact
+the scenes establish about a character, location, object or world rule.
+
 Your output must be valid JSON with the following structure:
 {
     "continuity_analysis": {
@@ -30,6 +41,14 @@ Your output must be valid JSON with the following structure:
             }
         ]
     },
+    "established_facts": [
+        {
+            "entity_type": "character/location/object/world_rule",
+            "entity": "Entity name",
+            "fact": "What the scene establishes",
+            "scene_id": "scene_identifier"
+        }
+    ],
     "consistency_metrics": {
         "plot_consistency": 0.0,
         "character_consistency": 0.0,
@@ -38,37 +57,156 @@ Your output must be valid JSON with the following structure:
     }
 }"""
 
+# Retrieved context given to later checks in place of the plot structure
+CONTEXT_CHUNKS = 8
+CONTEXT_TOKENS = 1500
+CONTEXT_QUERY_FIELDS = ('title', 'location', 'setting', 'summary')
+
 class ContinuityChecker(BaseAgent):
-    def __init__(self, model_name: str = "claude-3-opus-20240229"):
+    reads = (
+        'project_id', 'scenes', 'manuscript', 'scene_dialogues', 'characters',
+        'world_building', 'plot_structure', 'continuity_index', 'scene_entity_index'
+    )
+    writes = (
+        'continuity_analysis', 'consistency_metrics', 'continuity_index',
+        'scene_entity_index', 'continuity_check_complete'
+    )
+    item_scoped = True
+
+    def __init__(
+        self,
+        model_name: str = "claude-3-opus-20240229",
+        mongo_manager: Optional[Any] = None
+    ):
         super().__init__(model_name, CONTINUITY_CHECKER_PROMPT)
-    
+        self.mongo_manager = mongo_manager
+
     async def invoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            input_text = f"""
-            Plot Structure: {state.get('plot_structure', {})}
-            Characters: {state.get('characters', [])}
-            World Building: {state.get('world_building', {})}
-            Scenes: {state.get('scenes', [])}
-            Dialogue: {state.get('scene_dialogues', [])}
-            """
-            
-            chain = self.prompt | self.llm | self.output_parser
-            result = await chain.ainvoke({"input": input_text})
-            
-            state.update({
-                'continuity_analysis': result['continuity_analysis'],
-                'consistency_metrics': result['consistency_metrics'],
+            scenes = state.get('scenes', [])
+            index = await self._load_index(state)
+            dialogues = {
+                dialogue.get('scene_id'): dialogue
+                for dialogue in state.get('scene_dialogues', [])
+            }
+
+            # Scenes removed from the story no longer establish anything
+            scene_ids = {str(scene.get('id')) for scene in scenes}
+            removed = [scene_id for scene_id in index.scene_hashes if scene_id not in scene_ids]
+            index.forget_scenes(removed)
+            for scene_id in removed:
+                del index.scene_hashes[scene_id]
+
+            # The first check also covers plot, characters and world on their own
+            changed = index.changed_scenes(scenes, dialogues)
+            scope = recompute_scope(state)
+            if scope is not None:
+                # Scenes a feedback item affects are rechecked even if unchanged
+                changed = [
+                    scene for scene in scenes
+                    if scene in changed or str(scene.get('id')) in scope
+                ]
+            # The scene entity index is synced into the view and returned with the rest
+            view = delta_view(state)
+            if changed or not index.analysis:
+                await self._check_scenes(view, index, changed, dialogues)
+
+            delta = {
+                **view.maps[0],
+                'continuity_analysis': index.analysis,
+                'consistency_metrics': index.metrics,
+                'continuity_index': index.to_dict(),
                 'continuity_check_complete': True
-            })
-            
+            }
+            await self._save_index(state, index)
+
             self.logger.info(
                 "continuity_check_complete",
-                overall_consistency=result['consistency_metrics']['overall_consistency'],
-                issues_found=len(result['continuity_analysis']['world_rule_violations'])
+                checked_scenes=len(changed),
+                skipped_scenes=len(scenes) - len(changed),
+                overall_consistency=index.metrics.get('overall_consistency'),
+                issues_found=len(index.analysis.get('world_rule_violations', []))
             )
-            
-            return state
-            
+
+            return delta
+
         except Exception as e:
             self.logger.error("continuity_check_failed", error=str(e))
-            raise
\ No newline at end of file
+            raise
+
+    async def _check_scenes(
+        self,
+        state: Dict[str, Any],
+        index: ContinuityIndex,
+        scenes: List[Dict[str, Any]],
+        dialogues: Dict[str, Dict[str, Any]]
+    ) -> None:
+        """Check new or changed scenes against the relevant slice of the index."""
+        first_check = not index.scene_hashes
+        index.forget_scenes(str(scene.get('id')) for scene in scenes)
+        scene_dialogues = [
+            dialogues[scene.get('id')] for scene in scenes if scene.get('id') in dialogues
+        ]
+        established = index.relevant_facts(scenes + scene_dialogues)
+
+        characters = state.get('characters', [])
+        world = state.get('world_building', {})
+        story = f"Plot Structure: {to_prompt(state.get('plot_structure', {}))}"
+        if not first_check:
+            # Later checks only need the characters involved, the world rules
+            # and the parts of the story bible and prose closest to the scenes
+            entity_index = sync_entity_index(
+                state, scene_passages(state.get('scenes', [])), key='scene_entity_index'
+            )
+            mentioned = set(entity_index.entities_in(str(scene.get('id')) for scene in scenes))
+            characters = [
+                character for character in characters
+                if character.get('name') in mentioned or any(
+                    character.get('name') in entities for entities in established.values()
+                )
+            ]
+            world = {'rules': world.get('rules', [])}
+            context = self.retrieve_context(
+                state,
+                self._context_query(scenes, sorted(mentioned)),
+                k=CONTEXT_CHUNKS,
+                max_tokens=CONTEXT_TOKENS,
+                exclude_scenes=[str(scene.get('id')) for scene in scenes]
+            )
+            story = f"Related Story Context: {context}"
+
+        input_text = f"""
+            {story}
+            Characters: {to_prompt(characters)}
+            World Building: {to_prompt(world)}
+            Established Facts: {to_prompt(established)}
+            Scenes: {to_prompt(scenes)}
+            Dialogue: {to_prompt(scene_dialogues)}
+            """
+
+        result = await self._ainvoke_chain(input_text)
+
+        scene_ids = [str(scene.get('id')) for scene in scenes]
+        index.add_facts(result.get('established_facts', []))
+        index.merge_analysis(result['continuity_analysis'], scene_ids)
+        index.update_metrics(result['consistency_metrics'], scene_ids)
+        index.mark_checked(scenes, dialogues)
+
+    @staticmethod
+    def _context_query(scenes: List[Dict[str, Any]], entities: Iterable[str]) -> str:
+        """Search terms for the context of ``scenes``: their entities and settings."""
+        terms = list(entities)
+        for scene in scenes:
+            terms.extend(
+                to_prompt(scene[field]) for field in CONTEXT_QUERY_FIELDS if scene.get(field)
+            )
+        return " ".join(terms)
+
+    async def _load_index(self, state: Dict[str, Any]) -> ContinuityIndex:
+        if self.mongo_manager is not None and state.get('project_id'):
+            return await load_continuity_index(self.mongo_manager, state['project_id'])
+        return ContinuityIndex.from_dict(state.get('continuity_index'))
+
+    async def _save_index(self, state: Dict[str, Any], index: ContinuityIndex) -> None:
+        if self.mongo_manager is not None and state.get('project_id'):
+            await save_continuity_index(self.mongo_manager, state['project_id'], index)
\ No newline at end of file
@@ -0,0 +1,220 @@
+import copy
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+import structlog
+
+from utils import content_hash
+
+logger = structlog.get_logger(__name__)
+
+ENTITY_TYPES = ("character", "location", "object", "world_rule")
+
+# Analysis sections and the field identifying their entries
+ANALYSIS_KEYS = {
+    "plot_threads": "thread_id",
+    "character_arcs": "character",
+    "world_rule_violations": "rule"
+}
+
+
+class ContinuityIndex:
+    """Facts established by the story so far, with the scene that introduced each.
+
+    The index also remembers the content hash of every scene it has checked,
+    so later runs only need to look at new or changed scenes. Analysis
+    entries and metrics are attributed to the scenes whose check produced
+    them, and are dropped along with those scenes' facts.
+    """
+
+    def __init__(
+        self,
+        facts: Optional[Dict[str, Dict[str, List[Dict[str, Any]]]]] = None,
+        scene_hashes: Optional[Dict[str, str]] = None,
+        metrics: Optional[Dict[str, float]] = None,
+        analysis: Optional[Dict[str, Any]] = None,
+        scene_metrics: Optional[Dict[str, Dict[str, float]]] = None
+    ):
+        self.facts = facts or {entity_type: {} for entity_type in ENTITY_TYPES}
+        self.scene_hashes = scene_hashes or {}
+        self.metrics = metrics or {}
+        self.analysis = analysis or {}
+        # Metrics of the check that last covered each scene
+        self.scene_metrics = scene_metrics or {}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "ContinuityIndex":
+        """An index over a copy of ``data``, so updating it leaves the state's snapshot alone."""
+        data = copy.deepcopy(data or {})
+        return cls(
+            facts=data.get("facts"),
+            scene_hashes=data.get("scene_hashes"),
+            metrics=data.get("metrics"),
+            analysis=data.get("analysis"),
+            scene_metrics=data.get("scene_metrics")
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "facts": self.facts,
+            "scene_hashes": self.scene_hashes,
+            "metrics": self.metrics,
+            "analysis": self.analysis,
+            "scene_metrics": self.scene_metrics
+        }
+
+    @staticmethod
+    def scene_hash(scene: Dict[str, Any], dialogue: Optional[Dict[str, Any]]) -> str:
+        return content_hash({"scene": scene, "dialogue": dialogue})
+
+    def changed_scenes(
+        self,
+        scenes: List[Dict[str, Any]],
+        dialogues: Dict[str, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Scenes that are new or whose content or dialogue changed since the last check."""
+        return [
+            scene for scene in scenes
+            if self.scene_hashes.get(str(scene.get("id")))
+            != self.scene_hash(scene, dialogues.get(scene.get("id")))
+        ]
+
+    def relevant_facts(self, scenes: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """The slice of the index touching the given scenes.
+
+        Includes every entity named in the scenes and all world rules, which
+        apply everywhere.
+        """
+        text = json.dumps(list(scenes), default=str)
+        return {
+            entity_type: {
+                entity: facts for entity, facts in entities.items()
+                if entity_type == "world_rule" or entity in text
+            }
+            for entity_type, entities in self.facts.items()
+        }
+
+    def forget_scenes(self, scene_ids: Iterable[str]) -> None:
+        """Drop the facts, analysis entries and metrics of scenes that are removed or re-checked.
+
+        An analysis entry is dropped once none of the scenes it was found
+        in remain; entries from a check of no particular scenes are kept.
+        """
+        scene_ids = {str(scene_id) for scene_id in scene_ids}
+        if not scene_ids:
+            return
+        for entities in self.facts.values():
+            for entity in list(entities):
+                entities[entity] = [
+                    fact for fact in entities[entity] if fact.get("scene_id") not in scene_ids
+                ]
+                if not entities[entity]:
+                    del entities[entity]
+
+        analysis = dict(self.analysis)
+        for section in ANALYSIS_KEYS:
+            entries = []
+            for entry in analysis.get(section, []):
+                found_in = entry.get("scene_ids")
+                if found_in:
+                    remaining = [scene_id for scene_id in found_in if scene_id not in scene_ids]
+                    if not remaining:
+                        continue
+                    entry = {**entry, "scene_ids": remaining}
+                entries.append(entry)
+            if section in analysis:
+                analysis[section] = entries
+        self.analysis = analysis
+
+        if any(scene_id in self.scene_metrics for scene_id in scene_ids):
+            for scene_id in scene_ids:
+                self.scene_metrics.pop(scene_id, None)
+            self.metrics = self._mean_metrics()
+
+    def add_facts(self, facts: Iterable[Dict[str, Any]]) -> None:
+        """Record newly established facts."""
+        for fact in facts:
+            entity_type = fact.get("entity_type")
+            if entity_type not in ENTITY_TYPES or not fact.get("entity"):
+                logger.warning("continuity_fact_skipped", fact=fact)
+                continue
+            self.facts.setdefault(entity_type, {}).setdefault(fact["entity"], []).append({
+                "fact": fact.get("fact"),
+                "scene_id": fact.get("scene_id")
+            })
+
+    def mark_checked(
+        self,
+        scenes: Iterable[Dict[str, Any]],
+        dialogues: Dict[str, Dict[str, Any]]
+    ) -> None:
+        for scene in scenes:
+            self.scene_hashes[str(scene.get("id"))] = self.scene_hash(
+                scene, dialogues.get(scene.get("id"))
+            )
+
+    def _mean_metrics(self) -> Dict[str, float]:
+        totals: Dict[str, List[float]] = {}
+        for metrics in self.scene_metrics.values():
+            for metric, value in metrics.items():
+                totals.setdefault(metric, []).append(value)
+        return {metric: sum(values) / len(values) for metric, values in totals.items()}
+
+    def update_metrics(
+        self, new_metrics: Dict[str, float], scene_ids: Iterable[str]
+    ) -> Dict[str, float]:
+        """Record metrics for the re-checked ``scene_ids`` and average them over every scene.
+
+        A check covering no scenes (the story before any are written) sets
+        the metrics directly.
+        """
+        scene_ids = [str(scene_id) for scene_id in scene_ids]
+        values = {metric: float(value) for metric, value in new_metrics.items()}
+        if not scene_ids:
+            self.metrics = values
+            return self.metrics
+        for scene_id in scene_ids:
+            self.scene_metrics[scene_id] = values
+        self.metrics = self._mean_metrics()
+        return self.metrics
+
+    def merge_analysis(
+        self, new_analysis: Dict[str, Any], scene_ids: Iterable[str] = ()
+    ) -> Dict[str, Any]:
+        """Merge a partial analysis into the stored one, newer entries winning.
+
+        New entries are tagged with the ``scene_ids`` that were checked; an
+        entry replacing an older one keeps the older entry's scenes as well.
+        """
+        scene_ids = [str(scene_id) for scene_id in scene_ids]
+        merged = dict(self.analysis)
+        for section, key in ANALYSIS_KEYS.items():
+            entries = {
+                str(entry.get(key)): entry for entry in self.analysis.get(section, [])
+            }
+            for entry in new_analysis.get(section, []):
+                previous = entries.get(str(entry.get(key)), {}).get("scene_ids") or []
+                found_in = previous + [scene_id for scene_id in scene_ids if scene_id not in previous]
+                entries[str(entry.get(key))] = {**entry, "scene_ids": found_in}
+            merged[section] = list(entries.values())
+        self.analysis = merged
+        return merged
+
+
+async def load_continuity_index(mongo_manager: Any, project_id: str) -> ContinuityIndex:
+    """Load a project's continuity index from MongoDB."""
+    collection = await mongo_manager.get_collection("continuity_index")
+    document = await collection.find_one({"project_id": project_id})
+    return ContinuityIndex.from_dict(document)
+
+
+async def save_continuity_index(
+    mongo_manager: Any, project_id: str, index: ContinuityIndex
+) -> None:
+    """Persist a project's continuity index to MongoDB."""
+    collection = await mongo_manager.get_collection("continuity_index")
+    await collection.replace_one(
+        {"project_id": project_id},
+        {"project_id": project_id, **index.to_dict()},
+        upsert=True
+    )
@@ -1,5 +1,6 @@
 from typing import Dict, Any
 from .base import BaseAgent
+from .prompt_format import to_prompt
 
 CREATIVE_DIRECTOR_PROMPT = """You are the Creative Director responsible for the artistic vision and narrative quality.
 Analyze the current story state and provide creative direction.
@@ -26,6 +27,12 @@ Your output must be valid JSON with the following structure:
 """
 
 class CreativeDirectorAgent(BaseAgent):
+    reads = ('title', 'genre', 'vision', 'outline')
+    writes = (
+        'creative_direction', 'character_guidelines', 'pacing',
+        'creative_quality_score'
+    )
+
     def __init__(self, model_name: str = "claude-3-opus-20240229"):
         super().__init__(model_name, CREATIVE_DIRECTOR_PROMPT)
     
@@ -34,19 +41,18 @@ class CreativeDirectorAgent(BaseAgent):
             input_text = f"""
             Title: {state.get('title')}
             Genre: {state.get('genre')}
-            Current Vision: {state.get('vision', 'Not set')}
-            Outline: {state.get('outline', [])}
+            Current Vision: {to_prompt(state.get('vision', 'Not set'))}
+            Outline: {to_prompt(state.get('outline', []))}
             """
             
-            chain = self.prompt | self.llm | self.output_parser
-            result = await chain.ainvoke({"input": input_text})
+            result = await self._ainvoke_chain(input_text)
             
-            state.update({
+            delta = {
                 "creative_direction": result["creative_vision"],
                 "character_guidelines": result["character_guidelines"],
                 "pacing": result["pacing_recommendations"],
                 "creative_quality_score": result["creative_score"]
-            })
+            }
             
             self.logger.info(
                 "creative_direction_complete",
@@ -54,7 +60,7 @@ class CreativeDirectorAgent(BaseAgent):
                 creative_score=result["creative_score"]
             )
             
-            return state
+            return delta
             
         except Exception as e:
             self.logger.error("creative_direction_failed", error=str(e))
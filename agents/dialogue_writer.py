@@ -1,7 +1,12 @@
-from typing import Dict, Any, List
-from .base import BaseAgent
+from numbers import Number
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from state import apply_delta
+from workflows.invalidation import recompute_feedback, recompute_scope
+from workflows.pipeline import Stage
+from .base import BaseAgent, build_prompt, gather_bounded
+from .prompt_format import to_prompt
 
-DIALOGUE_WRITER_PROMPT = """You are the Dialogue Writer responsible for creating natural, 
+DIALOGUE_WRITER_PROMPT = """You are the Dialogue Writer responsible for creating natural,
 character-specific dialogue that advances the story and reveals character depth.
 
 Your output must be valid JSON with the following structure:
@@ -28,35 +33,233 @@ Your output must be valid JSON with the following structure:
     }
 }"""
 
+SCENE_DIALOGUE_PROMPT = """You are the Dialogue Writer responsible for creating natural,
+character-specific dialogue for a single scene. Use only the scene's participants and
+keep each speaker true to their voice profile.
+
+Your output must be valid JSON with the following structure:
+{
+    "scene_dialogue": {
+        "scene_id": "scene_identifier",
+        "exchanges": [
+            {
+                "speaker": "Character name",
+                "line": "Spoken dialogue",
+                "subtext": "Hidden meaning or emotion",
+                "delivery": "How the line is delivered"
+            }
+        ],
+        "tension_points": ["Moments of heightened tension"],
+        "character_dynamics": ["Relationship developments"]
+    },
+    "dialogue_metrics": {
+        "naturalness_score": 0.0,
+        "character_voice_consistency": 0.0,
+        "subtext_effectiveness": 0.0
+    }
+}"""
+
+# Character fields that shape how a character speaks
+VOICE_PROFILE_FIELDS = ("name", "role", "personality", "voice", "voice_profile", "speech_patterns")
+
 class DialogueWriter(BaseAgent):
-    def __init__(self, model_name: str = "claude-3-opus-20240229"):
+    reads = ('characters', 'scenes', 'plot_structure')
+    writes = ('scene_dialogues', 'dialogue_metrics', 'dialogue_complete')
+    item_scoped = True
+
+    def __init__(
+        self,
+        model_name: str = "claude-3-opus-20240229",
+        per_scene: bool = True,
+        max_concurrency: int = 4
+    ):
         super().__init__(model_name, DIALOGUE_WRITER_PROMPT)
-    
+        self.scene_prompt = build_prompt(SCENE_DIALOGUE_PROMPT)
+        self.per_scene = per_scene
+        self.max_concurrency = max_concurrency
+
     async def invoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            input_text = f"""
-            Characters: {state.get('characters', [])}
-            Scenes: {state.get('scenes', [])}
-            Plot Points: {state.get('plot_structure', {})}
-            """
-            
-            chain = self.prompt | self.llm | self.output_parser
-            result = await chain.ainvoke({"input": input_text})
-            
-            state.update({
+            if self.per_scene:
+                result = await self._write_per_scene(state)
+            else:
+                input_text = f"""
+                Characters: {to_prompt(state.get('characters', []))}
+                Scenes: {to_prompt(state.get('scenes', []))}
+                Plot Points: {to_prompt(state.get('plot_structure', {}))}
+                """
+                result = await self._ainvoke_chain(input_text)
+
+            delta = {
                 'scene_dialogues': result['scene_dialogues'],
                 'dialogue_metrics': result['dialogue_metrics'],
                 'dialogue_complete': True
-            })
-            
+            }
+
             self.logger.info(
                 "dialogue_writing_complete",
                 scene_count=len(result['scene_dialogues']),
                 metrics=result['dialogue_metrics']
             )
-            
-            return state
-            
+
+            return delta
+
         except Exception as e:
             self.logger.error("dialogue_writing_failed", error=str(e))
-            raise
\ No newline at end of file
+            raise
+
+    async def stream(
+        self,
+        items: AsyncIterator[Dict[str, Any]],
+        state: Dict[str, Any],
+        buffer: int = 1
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Write dialogue for scene items as they arrive, ``max_concurrency`` at once.
+
+        Yields each item with its ``scene_dialogue`` and ``dialogue_metrics``
+        added, in arrival order. Once every item has been written, the new
+        dialogues are merged into ``state["scene_dialogues"]`` by scene id:
+        a rewritten scene's dialogue is replaced in place, and dialogue of
+        scenes that were not streamed is kept.
+        """
+        try:
+            characters = {
+                character.get('name'): character for character in state.get('characters', [])
+            }
+            feedback = recompute_feedback(state)
+
+            async def write(item: Dict[str, Any]) -> Dict[str, Any]:
+                result = await self._write_scene(item['scene'], characters, feedback)
+                return {**item, **result}
+
+            results = []
+            async for item in Stage('dialogue', write, self.max_concurrency, buffer)(items):
+                results.append(item)
+                yield item
+
+            dialogues, kept = self._merge_dialogues(
+                state.get('scene_dialogues', []),
+                [result['scene_dialogue'] for result in results]
+            )
+            metrics = self._aggregate_metrics(results + [
+                {'scene_dialogue': dialogue, 'dialogue_metrics': state.get('dialogue_metrics', {})}
+                for dialogue in kept
+            ])
+            apply_delta(state, {
+                'scene_dialogues': dialogues,
+                'dialogue_metrics': metrics,
+                'dialogue_complete': True
+            })
+            self.logger.info(
+                "dialogue_writing_complete", scene_count=len(results), metrics=metrics
+            )
+
+        except Exception as e:
+            self.logger.error("dialogue_writing_failed", error=str(e))
+            raise
+
+    async def _write_per_scene(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Write each scene's dialogue in its own call and merge the results.
+
+        In a feedback re-run, scenes outside the scope keep their dialogue.
+        """
+        scenes = state['scenes']
+        characters = {
+            character.get('name'): character for character in state.get('characters', [])
+        }
+        scope = recompute_scope(state)
+        feedback = recompute_feedback(state)
+        existing = {
+            dialogue.get('scene_id'): dialogue for dialogue in state.get('scene_dialogues', [])
+        }
+
+        async def write(scene: Dict[str, Any]) -> Dict[str, Any]:
+            if scope is not None and str(scene.get('id')) not in scope and scene.get('id') in existing:
+                return {
+                    'scene_dialogue': existing[scene.get('id')],
+                    'dialogue_metrics': state.get('dialogue_metrics', {})
+                }
+            return await self._write_scene(scene, characters, feedback)
+
+        results = await gather_bounded(
+            [write(scene) for scene in scenes],
+            self.max_concurrency
+        )
+        return {
+            'scene_dialogues': [result['scene_dialogue'] for result in results],
+            'dialogue_metrics': self._aggregate_metrics(results)
+        }
+
+    async def _write_scene(
+        self,
+        scene: Dict[str, Any],
+        characters: Dict[str, Dict[str, Any]],
+        feedback: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Write the dialogue for one scene from its participants and beats."""
+        voices = [
+            {
+                field: characters[name][field]
+                for field in VOICE_PROFILE_FIELDS if field in characters[name]
+            }
+            for name in self._participant_names(scene) if name in characters
+        ]
+        input_text = f"""
+            Participants: {to_prompt(voices)}
+            Scene: {to_prompt(scene)}
+            """
+        if feedback:
+            input_text += f"Reviewer Feedback: {feedback}\n"
+
+        result = await self._ainvoke_chain(input_text, prompt=self.scene_prompt)
+        # The model may echo a template id; the dialogue belongs to the scene it was written for
+        result['scene_dialogue']['scene_id'] = scene.get('id')
+        return result
+
+    @staticmethod
+    def _merge_dialogues(
+        existing: List[Dict[str, Any]],
+        written: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Existing dialogues with ``written`` ones replacing those of the same scene.
+
+        Dialogues of new scenes are appended. Also returns the existing
+        dialogues that were kept unchanged.
+        """
+        written_by_scene = {dialogue.get('scene_id'): dialogue for dialogue in written}
+        merged, kept = [], []
+        for dialogue in existing:
+            scene_id = dialogue.get('scene_id')
+            if scene_id in written_by_scene:
+                merged.append(written_by_scene.pop(scene_id))
+            else:
+                merged.append(dialogue)
+                kept.append(dialogue)
+        appended = [dialogue for dialogue in written if dialogue.get('scene_id') in written_by_scene]
+        return merged + appended, kept
+
+    @staticmethod
+    def _participant_names(scene: Dict[str, Any]) -> List[str]:
+        """Participant names, whether listed as names or as participant records."""
+        return [
+            participant.get('character') if isinstance(participant, dict) else participant
+            for participant in scene.get('participants', [])
+        ]
+
+    @staticmethod
+    def _aggregate_metrics(results: List[Dict[str, Any]]) -> Dict[str, float]:
+        """Average per-scene metrics, weighting each scene by its exchange count.
+
+        Values that are not numbers are skipped.
+        """
+        totals: Dict[str, float] = {}
+        weights: Dict[str, float] = {}
+        for result in results:
+            weight = max(1, len(result['scene_dialogue'].get('exchanges', [])))
+            for metric, value in result.get('dialogue_metrics', {}).items():
+                # Model output may hold null or "n/a" instead of a score
+                if not isinstance(value, Number) or isinstance(value, bool):
+                    continue
+                totals[metric] = totals.get(metric, 0.0) + float(value) * weight
+                weights[metric] = weights.get(metric, 0.0) + weight
+        return {metric: totals[metric] / weights[metric] for metric in totals}
\ No newline at end of file
@@ -1,31 +1,40 @@
 from typing import Dict, Any
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
-from langchain_anthropic import ChatAnthropic
 import structlog
+from prompt_registry import get_prompt_registry
+from utils import lazy, lazy_attributes
 
 logger = structlog.get_logger(__name__)
 
+__getattr__ = lazy_attributes(__name__, {"ChatAnthropic": "langchain_anthropic:ChatAnthropic"})
+
+EXECUTIVE_DIRECTOR_PROMPT = """You are the Executive Director of a novel writing system.
+Analyze the story requirements and provide strategic direction.
+Your output must be valid JSON with the following structure:
+{
+    "vision": "Overall vision for the story",
+    "outline": ["Key plot points"],
+    "themes": ["Main themes to explore"],
+    "target_audience": "Intended readership",
+    "recommendations": ["Strategic recommendations"],
+    "quality_metrics": {"coherence": 0.0, "engagement": 0.0}
+}"""
+
 class ExecutiveDirectorAgent:
     """Agent responsible for high-level story direction and coordination."""
+
+    reads = ('title', 'genre', 'length', 'current_phase')
+    writes = (
+        'vision', 'outline', 'themes', 'target_audience', 'quality_metrics',
+        'executive_feedback'
+    )
     
     def __init__(self, model_name: str = "claude-3-opus-20240229"):
-        self.llm = ChatAnthropic(model=model_name)
+        self.llm = lazy(__name__, "ChatAnthropic")(model=model_name)
         self.output_parser = JsonOutputParser()
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are the Executive Director of a novel writing system.
-            Analyze the story requirements and provide strategic direction.
-            Your output must be valid JSON with the following structure:
-            {
-                "vision": "Overall vision for the story",
-                "outline": ["Key plot points"],
-                "themes": ["Main themes to explore"],
-                "target_audience": "Intended readership",
-                "recommendations": ["Strategic recommendations"],
-                "quality_metrics": {"coherence": 0.0, "engagement": 0.0}
-            }"""),
-            ("human", "{input}")
-        ])
+        compiled = get_prompt_registry().literal(EXECUTIVE_DIRECTOR_PROMPT, type(self).__name__)
+        self.prompt = compiled.template
+        self.prompt_version = compiled.version
 
     async def invoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Process the current state and provide strategic direction."""
@@ -43,14 +52,14 @@ class ExecutiveDirectorAgent:
             result = await chain.ainvoke({"input": input_text})
             
             # Update state with strategic direction
-            state.update({
+            delta = {
                 "vision": result["vision"],
                 "outline": result["outline"],
                 "themes": result["themes"],
                 "target_audience": result["target_audience"],
                 "quality_metrics": result["quality_metrics"],
                 "executive_feedback": result["recommendations"]
-            })
+            }
             
             logger.info(
                 "executive_director_complete",
@@ -58,7 +67,7 @@ class ExecutiveDirectorAgent:
                 quality_metrics=result["quality_metrics"]
             )
             
-            return state
+            return delta
             
         except Exception as e:
             logger.error("executive_director_error", error=str(e))
@@ -1,48 +1,127 @@
-from typing import Dict, Any
-from langchain.agents import AgentExecutor  # Updated import
-from langchain_core.agents import Tool
-from langchain_anthropic import ChatAnthropic
+import importlib
+import threading
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Type
 import structlog
 from .base import BaseAgent
-from .executive_director import ExecutiveDirectorAgent
-from .creative_director import CreativeDirectorAgent
-from .world_building import WorldBuildingExpert
-from .character_designer import CharacterDesigner
-from .plot_architect import PlotArchitect
-from .scene_composer import SceneComposer
-from .dialogue_writer import DialogueWriter
-from .pacing_editor import PacingEditor
-from .continuity_checker import ContinuityChecker
-from .style_editor import StyleEditor
-from .quality_assessor import QualityAssessor
 
 logger = structlog.get_logger(__name__)
 
+
+class AgentSpec(NamedTuple):
+    """How to build an agent: its module in this package, class and constructor options."""
+
+    module: str
+    class_name: str
+    options: Dict[str, Any] = {}
+
+
+# Modules are imported when an agent of that type is first requested
+AGENT_SPECS: Dict[str, AgentSpec] = {
+    'executive': AgentSpec('executive_director', 'ExecutiveDirectorAgent'),
+    'creative': AgentSpec('creative_director', 'CreativeDirectorAgent'),
+    'world_building': AgentSpec('world_building', 'WorldBuildingExpert'),
+    'character': AgentSpec('character_designer', 'CharacterDesigner'),
+    'plot': AgentSpec('plot_architect', 'PlotArchitect'),
+    'scene': AgentSpec('scene_composer', 'SceneComposer'),
+    'dialogue': AgentSpec('dialogue_writer', 'DialogueWriter'),
+    'pacing': AgentSpec('pacing_editor', 'PacingEditor'),
+    'continuity': AgentSpec('continuity_checker', 'ContinuityChecker'),
+    'style': AgentSpec('style_editor', 'StyleEditor'),
+    'summary': AgentSpec('summarizer', 'StorySummarizer'),
+    'quality': AgentSpec('quality_assessor', 'QualityAssessor')
+}
+
+
+class AgentRegistry(Mapping):
+    """Agent instances by type, each created on first use and then reused.
+
+    Agents keep no per-story state, so one instance of each type serves
+    every request and workflow in the process. Iterating lists every known
+    type; looking one up creates its agent if needed.
+    """
+
+    def __init__(self, specs: Optional[Dict[str, AgentSpec]] = None):
+        self.specs = dict(AGENT_SPECS if specs is None else specs)
+        self._agents: Dict[str, BaseAgent] = {}
+        self._lock = threading.Lock()
+
+    def agent_class(self, agent_type: str) -> Type[BaseAgent]:
+        """Import and return the class implementing an agent type."""
+        spec = self.specs[agent_type]
+        module = importlib.import_module(f".{spec.module}", __package__)
+        return getattr(module, spec.class_name)
+
+    def __getitem__(self, agent_type: str) -> BaseAgent:
+        agent = self._agents.get(agent_type)
+        if agent is None:
+            if agent_type not in self.specs:
+                raise KeyError(agent_type)
+            with self._lock:
+                agent = self._agents.get(agent_type)
+                if agent is None:
+                    agent = self.agent_class(agent_type)(**self.specs[agent_type].options)
+                    self._agents[agent_type] = agent
+                    logger.info("agent_created", agent_type=agent_type)
+        return agent
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.specs)
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+    def __contains__(self, agent_type: object) -> bool:
+        return agent_type in self.specs
+
+    def warm(self, agent_types: Optional[Iterable[str]] = None) -> None:
+        """Create the given agents (all by default) ahead of the first request."""
+        agent_types = list(self.specs if agent_types is None else agent_types)
+        for agent_type in agent_types:
+            self[agent_type]
+        logger.info("agents_warmed", agent_types=agent_types)
+
+
+@lru_cache()
+def get_agent_registry() -> AgentRegistry:
+    """The process-wide agent registry shared by factories and workflow managers."""
+    return AgentRegistry()
+
+
+def prewarm_agents(setting: str, registry: Optional[AgentRegistry] = None) -> None:
+    """Create the agents a ``PREWARM_AGENTS`` setting asks for.
+
+    ``setting`` is ``"all"``, ``"none"`` or a comma-separated list of agent
+    types. Unknown types are logged and skipped rather than failing startup.
+    """
+    registry = registry if registry is not None else get_agent_registry()
+    setting = setting.strip()
+    if setting == "none":
+        return
+    if setting == "all":
+        registry.warm()
+        return
+
+    agent_types: List[str] = [name.strip() for name in setting.split(",") if name.strip()]
+    unknown = [agent_type for agent_type in agent_types if agent_type not in registry]
+    if unknown:
+        logger.warning("prewarm_unknown_agents", agent_types=unknown, known=sorted(registry))
+    registry.warm([agent_type for agent_type in agent_types if agent_type in registry])
+
+
 class AgentFactory:
     """Factory for creating and managing agents."""
-    
-    def __init__(self):
-        self.agents: Dict[str, BaseAgent] = {}
-        self._initialize_agents()
-    
-    def _initialize_agents(self):
-        """Initialize all available agents."""
-        self.agents = {
-            'executive': ExecutiveDirectorAgent(),
-            'creative': CreativeDirectorAgent(),
-            'world_building': WorldBuildingExpert(),
-            'character': CharacterDesigner(),
-            'plot': PlotArchitect(),
-            'scene': SceneComposer(),
-            'dialogue': DialogueWriter(),
-            'pacing': PacingEditor(),
-            'continuity': ContinuityChecker(),
-            'style': StyleEditor(),
-            'quality': QualityAssessor()
-        }
-    
+
+    def __init__(self, registry: Optional[AgentRegistry] = None):
+        self.registry = registry if registry is not None else get_agent_registry()
+
+    @property
+    def agents(self) -> AgentRegistry:
+        return self.registry
+
     def get_agent(self, agent_type: str) -> BaseAgent:
         """Get an agent instance by type."""
-        if agent_type not in self.agents:
+        if agent_type not in self.registry:
             raise ValueError(f"Unknown agent type: {agent_type}")
-        return self.agents[agent_type]
\ No newline at end of file
+        return self.registry[agent_type]
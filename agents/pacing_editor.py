@@ -1,5 +1,9 @@
 from typing import Dict, Any, List
+from editing.ledger import record_pass, select_for_pass
+from indexing.manuscript import Passage, manuscript_passages
+from state import delta_view
 from .base import BaseAgent
+from .prompt_format import to_prompt
 
 PACING_EDITOR_PROMPT = """You are the Pacing Editor responsible for managing story rhythm 
 and tension. Analyze and adjust scene pacing to maintain reader engagement.
@@ -32,29 +36,70 @@ Your output must be valid JSON with the following structure:
         "tension_progression": 0.0,
         "scene_balance": 0.0
     }
-}"""
+}
+
+The tension curve you are given was scored scene by scene; base the analysis on it."""
+
+# Per-scene scoring, sent for many scenes per request through invoke_batched
+SCENE_PACING_INSTRUCTIONS = """You are the Pacing Editor scoring the pacing of single scenes.
+For each scene give "tension_level" (1-10) and "pacing_type" (slow/medium/fast)."""
 
 class PacingEditor(BaseAgent):
-    def __init__(self, model_name: str = "claude-3-opus-20240229"):
+    reads = (
+        'plot_structure', 'scenes', 'manuscript', 'scene_dialogues', 'pacing_markers',
+        'scene_pacing', 'refinement_mode', 'processing_ledger'
+    )
+    writes = (
+        'pacing_analysis', 'pacing_metrics', 'scene_pacing', 'pacing_complete',
+        'refinement_report', 'processing_ledger'
+    )
+
+    def __init__(self, model_name: str = "claude-3-opus-20240229", batch_size: int = 20):
         super().__init__(model_name, PACING_EDITOR_PROMPT)
-    
+        self.batch_size = batch_size
+
     async def invoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
         try:
+            # In incremental mode only scenes with changed prose, or without a
+            # score yet, are scored again
+            view = delta_view(state)
+            paragraphs, selection = select_for_pass(view, 'pacing')
+            passages = manuscript_passages(state)
+            previous = state.get('scene_pacing') or {}
+            scene_pacing = {
+                passage.scene: previous[passage.scene] for passage in passages
+                if selection['incremental'] and passage.scene in previous
+            }
+            changed = {paragraph.scene for paragraph in paragraphs}
+            rescored = [
+                passage for passage in passages
+                if passage.scene in changed or passage.scene not in scene_pacing
+            ]
+            if selection['incremental'] and not rescored and scene_pacing.keys() == previous.keys():
+                self.logger.info("pacing_editing_skipped", skipped=selection['skipped_paragraphs'])
+                return {**view.maps[0], 'pacing_complete': True}
+
+            scene_pacing.update(await self._score_scenes(rescored, state.get('scene_dialogues', [])))
+            record_pass(view, 'pacing')
+            tension_curve = [
+                {'scene_id': passage.scene, 'chapter': passage.chapter, **scene_pacing[passage.scene]}
+                for passage in passages if passage.scene in scene_pacing
+            ]
             input_text = f"""
-            Plot Structure: {state.get('plot_structure', {})}
-            Scenes: {state.get('scenes', [])}
-            Scene Dialogues: {state.get('scene_dialogues', [])}
-            Current Pacing: {state.get('pacing_markers', [])}
+            Plot Structure: {to_prompt(state.get('plot_structure', {}))}
+            Tension Curve: {to_prompt(tension_curve)}
+            Current Pacing: {to_prompt(state.get('pacing_markers', []))}
             """
             
-            chain = self.prompt | self.llm | self.output_parser
-            result = await chain.ainvoke({"input": input_text})
+            result = await self._ainvoke_chain(input_text)
             
-            state.update({
+            delta = {
+                **view.maps[0],
                 'pacing_analysis': result['pacing_analysis'],
                 'pacing_metrics': result['pacing_metrics'],
+                'scene_pacing': scene_pacing,
                 'pacing_complete': True
-            })
+            }
             
             self.logger.info(
                 "pacing_editing_complete",
@@ -62,8 +107,39 @@ class PacingEditor(BaseAgent):
                 tension_score=result['pacing_metrics']['tension_progression']
             )
             
-            return state
+            return delta
             
         except Exception as e:
             self.logger.error("pacing_editing_failed", error=str(e))
-            raise
\ No newline at end of file
+            raise
+
+    async def _score_scenes(
+        self, passages: List[Passage], dialogues: List[Dict[str, Any]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Tension and pacing of each scene, ``batch_size`` scenes per call."""
+        exchanges = {
+            str(dialogue.get('scene_id')): dialogue.get('exchanges', []) for dialogue in dialogues
+        }
+        results = await self.invoke_batched(
+            [
+                {'id': passage.scene, 'text': passage.text, 'dialogue': exchanges.get(passage.scene, [])}
+                for passage in passages
+            ],
+            SCENE_PACING_INSTRUCTIONS,
+            validate=self._valid_score,
+            max_items=self.batch_size
+        )
+        return {
+            scene_id: {
+                'tension_level': float(result['tension_level']),
+                'pacing_type': result.get('pacing_type')
+            }
+            for scene_id, result in results.items()
+        }
+
+    @staticmethod
+    def _valid_score(result: Dict[str, Any]) -> bool:
+        try:
+            return 1 <= float(result.get('tension_level')) <= 10
+        except (TypeError, ValueError):
+            return False
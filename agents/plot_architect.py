@@ -1,5 +1,6 @@
 from typing import Dict, Any, List
 from .base import BaseAgent
+from .prompt_format import to_prompt
 
 PLOT_ARCHITECT_PROMPT = """You are the Plot Architect responsible for crafting engaging 
 and coherent plot structures. Design the story's plot based on the established elements.
@@ -42,6 +43,12 @@ Your output must be valid JSON with the following structure:
 }"""
 
 class PlotArchitect(BaseAgent):
+    reads = ('title', 'genre', 'characters', 'world_building', 'creative_direction')
+    writes = (
+        'plot_structure', 'subplots', 'pacing_markers', 'plot_coherence_score',
+        'plot_development_complete'
+    )
+
     def __init__(self, model_name: str = "claude-3-opus-20240229"):
         super().__init__(model_name, PLOT_ARCHITECT_PROMPT)
     
@@ -50,21 +57,20 @@ class PlotArchitect(BaseAgent):
             input_text = f"""
             Title: {state.get('title')}
             Genre: {state.get('genre')}
-            Characters: {state.get('characters', [])}
-            World: {state.get('world_building', {})}
-            Creative Direction: {state.get('creative_direction', {})}
+            Characters: {to_prompt(state.get('characters', []))}
+            World: {to_prompt(state.get('world_building', {}))}
+            Creative Direction: {to_prompt(state.get('creative_direction', {}))}
             """
             
-            chain = self.prompt | self.llm | self.output_parser
-            result = await chain.ainvoke({"input": input_text})
+            result = await self._ainvoke_chain(input_text)
             
-            state.update({
+            delta = {
                 "plot_structure": result["plot_structure"],
                 "subplots": result["subplots"],
                 "pacing_markers": result["pacing_markers"],
                 "plot_coherence_score": result["plot_coherence_score"],
                 "plot_development_complete": True
-            })
+            }
             
             self.logger.info(
                 "plot_architecture_complete",
@@ -73,7 +79,7 @@ class PlotArchitect(BaseAgent):
                 coherence_score=result["plot_coherence_score"]
             )
             
-            return state
+            return delta
             
         except Exception as e:
             self.logger.error("plot_architecture_failed", error=str(e))
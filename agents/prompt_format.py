@@ -0,0 +1,126 @@
+import json
+from typing import Any, Dict, List, Optional, Set
+
+from utils import estimate_tokens
+
+# Optional short forms for keys that recur across characters, scenes and world
+# notes; a legend is prepended whenever one is used
+ABBREVIATIONS = {
+    "description": "desc",
+    "characteristics": "traits",
+    "relationships": "rels",
+    "motivation": "motive",
+    "background": "bg",
+    "personality": "persona",
+    "development": "dev",
+    "recommendations": "recs",
+    "recommended_changes": "changes",
+    "character_arcs": "arcs",
+    "world_elements": "elements",
+}
+
+# Lists of dicts with more distinct keys than this are not worth a table
+MAX_TABLE_COLUMNS = 12
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or (isinstance(value, (str, list, tuple, dict)) and not value)
+
+
+def compact(
+    value: Any,
+    strip_empty: bool = True,
+    abbreviations: Optional[Dict[str, str]] = None,
+    used: Optional[Set[str]] = None
+) -> Any:
+    """A copy of ``value`` without empty fields and, optionally, with keys abbreviated.
+
+    Zero and ``False`` are kept; only ``None`` and empty strings, lists and
+    dicts are dropped. Keys that were abbreviated are added to ``used``.
+    """
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            item = compact(item, strip_empty, abbreviations, used)
+            if strip_empty and _is_empty(item):
+                continue
+            if abbreviations and key in abbreviations:
+                if used is not None:
+                    used.add(key)
+                key = abbreviations[key]
+            result[key] = item
+        return result
+    if isinstance(value, (list, tuple)):
+        items = [compact(item, strip_empty, abbreviations, used) for item in value]
+        return [item for item in items if not (strip_empty and _is_empty(item))]
+    return value
+
+
+def minify(value: Any) -> str:
+    """JSON without whitespace; non-ASCII text is kept as is."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _cell(value: Any) -> str:
+    if isinstance(value, str) and "|" not in value and "\n" not in value:
+        return value
+    return minify(value)
+
+
+def _table(rows: List[Dict[str, Any]]) -> Optional[str]:
+    """A list of dicts as a header line and one ``|``-separated line per row."""
+    columns: List[str] = []
+    for row in rows:
+        columns.extend(key for key in row if key not in columns)
+    if len(columns) > MAX_TABLE_COLUMNS:
+        return None
+    lines = ["|".join(map(str, columns))]
+    lines.extend("|".join(_cell(row[column]) if column in row else "" for column in columns) for row in rows)
+    return "\n".join(lines)
+
+
+def _render(value: Any, depth: int) -> str:
+    if isinstance(value, str):
+        return value
+    candidates = [minify(value)]
+    if depth > 1:
+        return candidates[0]
+    if isinstance(value, list) and len(value) > 1 and all(isinstance(item, dict) for item in value):
+        table = _table(value)
+        if table is not None:
+            candidates.append(table)
+    elif isinstance(value, dict) and value and depth == 0:
+        lines = []
+        for key, item in value.items():
+            rendered = _render(item, depth + 1)
+            if "\n" in rendered:
+                lines.append(f"{key}:\n  " + rendered.replace("\n", "\n  "))
+            else:
+                lines.append(f"{key}: {rendered}")
+        candidates.append("\n".join(lines))
+    return min(candidates, key=len)
+
+
+def to_prompt(value: Any, strip_empty: bool = True, abbreviate: bool = False) -> str:
+    """Render structured state compactly for a prompt.
+
+    Lists of similar dicts (scenes, characters) become a table with the
+    keys written once; top-level dicts become ``key: value`` lines; anything
+    else is minified JSON, whichever form is shortest. Empty fields are
+    dropped unless ``strip_empty`` is false, and ``abbreviate`` shortens
+    common keys (see ``ABBREVIATIONS``) with a legend.
+    """
+    used: Set[str] = set()
+    value = compact(value, strip_empty, ABBREVIATIONS if abbreviate else None, used)
+    text = _render(value, 0)
+    if used:
+        legend = ",".join(f"{ABBREVIATIONS[key]}={key}" for key in sorted(used))
+        text = f"(keys: {legend})\n{text}"
+    return text
+
+
+def compare_tokens(value: Any, **options: Any) -> Dict[str, int]:
+    """Estimated tokens of ``value`` as a Python repr versus ``to_prompt``."""
+    before = estimate_tokens(str(value))
+    after = estimate_tokens(to_prompt(value, **options))
+    return {"repr": before, "prompt": after, "saved": before - after}
@@ -4,13 +4,25 @@ from langchain.agents.structured_chat.base import StructuredChatAgent
 from langchain_core.agents import AgentExecutor, Tool
 from langsmith.run_helpers import traceable
 
+from indexing.manuscript import (manuscript_passages, scene_chapters,
+                                 split_paragraphs)
 from tools.quality_assessment import (analyze_story_structure,
                                       assess_narrative_coherence,
                                       evaluate_character_arcs)
+from workflows.map_reduce import MapReduceExecutor, make_reducer
+
+
+def _join_feedback(values: List[Any], weights: List[float]) -> str:
+    """Keep each chunk's feedback, in manuscript order."""
+    return "\n\n".join(value for value in values if value)
+
+
+# Scores are averaged by chunk size; feedback is kept per chunk
+reduce_assessment = make_reducer({"output": _join_feedback})
 
 
 @traceable(name="Quality Assessment Director")
-def quality_assessment_director_agent(state: StoryState) -> Dict:
+async def quality_assessment_director_agent(state: StoryState) -> Dict:
     """Quality Assessment Director agent responsible for story evaluation."""
     tools = [
         Tool(
@@ -39,20 +51,32 @@ def quality_assessment_director_agent(state: StoryState) -> Dict:
         agent=agent, tools=tools, verbose=True
     )
 
-    # Execute analysis
-    result = agent_executor.invoke(
-        {
-            "input": {
-                "title": state["title"],
-                "manuscript": state["manuscript"],
-                "criteria": ["structure", "characters", "coherence"],
+    # Execute analysis over the manuscript chunk by chunk
+    async def assess_chunk(text, overlap, chunk):
+        return await agent_executor.ainvoke(
+            {
+                "input": {
+                    "title": state["title"],
+                    "chapters": chunk.chapters,
+                    "preceding_text": overlap,
+                    "manuscript": text,
+                    "criteria": ["structure", "characters", "coherence"],
+                }
             }
-        }
+        )
+
+    passages = manuscript_passages(state)
+    result = await MapReduceExecutor().run(
+        [paragraph for passage in passages for paragraph in split_paragraphs(passage)],
+        assess_chunk,
+        reduce_assessment,
+        scene_chapters(passages),
+        annotate=False
     )
 
     # Format response
     return {
-        "feedback": result["output"],
+        "feedback": result.get("output", ""),
         "scores": {
             "structure": result.get("structure_score", 0.0),
             "characters": result.get("character_score", 0.0),
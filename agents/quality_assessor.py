@@ -1,5 +1,7 @@
 from typing import Dict, Any, List
+from indexing.summary_tree import SummaryTree
 from .base import BaseAgent
+from .prompt_format import to_prompt
 
 QUALITY_ASSESSOR_PROMPT = """You are the Quality Assessor responsible for evaluating the 
 overall story quality and providing actionable improvement suggestions.
@@ -36,28 +38,48 @@ Your output must be valid JSON with the following structure:
     }
 }"""
 
+# Retrieves the passages that bear most on the assessed dimensions
+QUALITY_CONTEXT_QUERY = """protagonist antagonist motivation conflict goal arc climax
+resolution turning point stakes tension dialogue voice pacing setting world rules theme"""
+
 class QualityAssessor(BaseAgent):
+    reads = (
+        'project_id', 'title', 'genre', 'characters', 'world_building',
+        'plot_structure', 'scenes', 'manuscript', 'summary_tree',
+        'composition_quality_score', 'dialogue_metrics', 'consistency_metrics',
+        'plot_coherence_score', 'character_development_score', 'style_metrics'
+    )
+    writes = ('quality_assessment', 'final_quality_check_complete')
+
     def __init__(self, model_name: str = "claude-3-opus-20240229"):
         super().__init__(model_name, QUALITY_ASSESSOR_PROMPT)
     
     async def invoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
         try:
+            context = self.retrieve_context(state, QUALITY_CONTEXT_QUERY, k=12, max_tokens=3000)
             input_text = f"""
-            Complete Story State: {state}
-            Quality Metrics: {{
-                "plot_coherence": {state.get('plot_coherence_score', 0.0)},
-                "character_depth": {state.get('character_development_score', 0.0)},
-                "style_quality": {state.get('style_metrics', {}).get('overall_style_score', 0.0)}
-            }}
+            Title: {state.get('title')}
+            Genre: {state.get('genre')}
+            Book Summary: {SummaryTree.from_dict(state.get('summary_tree')).summary('book')}
+            Relevant Story Context: {context}
+            Component Metrics: {to_prompt({
+                "composition": state.get('composition_quality_score', 0.0),
+                "dialogue": state.get('dialogue_metrics', {}),
+                "consistency": state.get('consistency_metrics', {})
+            }, strip_empty=False)}
+            Quality Metrics: {to_prompt({
+                "plot_coherence": state.get('plot_coherence_score', 0.0),
+                "character_depth": state.get('character_development_score', 0.0),
+                "style_quality": state.get('style_metrics', {}).get('overall_style_score', 0.0)
+            }, strip_empty=False)}
             """
             
-            chain = self.prompt | self.llm | self.output_parser
-            result = await chain.ainvoke({"input": input_text})
+            result = await self._ainvoke_chain(input_text)
             
-            state.update({
+            delta = {
                 'quality_assessment': result['quality_assessment'],
                 'final_quality_check_complete': True
-            })
+            }
             
             self.logger.info(
                 "quality_assessment_complete",
@@ -67,7 +89,7 @@ class QualityAssessor(BaseAgent):
                 )
             )
             
-            return state
+            return delta
             
         except Exception as e:
             self.logger.error("quality_assessment_failed", error=str(e))
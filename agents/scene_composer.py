@@ -1,9 +1,13 @@
-from typing import Dict, Any, List
-from .base import BaseAgent
+import json
+from typing import Dict, Any, AsyncIterator, List, Set, Tuple
+from state import apply_delta
+from workflows.pipeline import Stage
+from .base import BaseAgent, build_prompt, gather_bounded
+from .prompt_format import to_prompt
 
-SCENE_COMPOSER_PROMPT = """You are the Scene Composer responsible for creating vivid, 
-engaging scenes that bring the story to life. Craft detailed scene compositions based on 
-the plot structure and character interactions.
+SCENE_COMPOSER_PROMPT = """You are the Scene Composer responsible for creating vivid,
+engaging scenes that bring the story to life. Craft detailed scene compositions for the
+part of the plot structure you are given, based on its plot points and character interactions.
 
 Your output must be valid JSON with the following structure:
 {
@@ -33,6 +37,15 @@ Your output must be valid JSON with the following structure:
             "tension_level": "1-10 scale value"
         }
     ],
+    "composition_quality_score": 0.0
+}"""
+
+SCENE_TRANSITIONS_PROMPT = """You are the Scene Composer planning how consecutive scenes
+connect. You are given the scenes in story order, each with its setting and how it opens
+and closes.
+
+Your output must be valid JSON with the following structure:
+{
     "scene_transitions": [
         {
             "from_scene": "source_scene_id",
@@ -40,47 +53,199 @@ Your output must be valid JSON with the following structure:
             "transition_type": "cut/fade/parallel",
             "transition_notes": "Specific transition guidance"
         }
-    ],
-    "composition_quality_score": 0.0
+    ]
 }"""
 
 class SceneComposer(BaseAgent):
-    def __init__(self, model_name: str = "claude-3-opus-20240229"):
+    reads = ('title', 'plot_structure', 'characters', 'world_building', 'scenes')
+    writes = (
+        'scenes', 'scene_transitions', 'composition_quality_score',
+        'scene_composition_complete'
+    )
+
+    def __init__(self, model_name: str = "claude-3-opus-20240229", max_concurrency: int = 3):
         super().__init__(model_name, SCENE_COMPOSER_PROMPT)
-    
+        self.transitions_prompt = build_prompt(SCENE_TRANSITIONS_PROMPT)
+        self.max_concurrency = max_concurrency
+
     async def invoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            input_text = f"""
-            Title: {state.get('title')}
-            Plot Structure: {state.get('plot_structure', {})}
-            Characters: {state.get('characters', [])}
-            World: {state.get('world_building', {})}
-            Current Scene Count: {len(state.get('scenes', []))}
-            """
-            
-            chain = self.prompt | self.llm | self.output_parser
-            result = await chain.ainvoke({"input": input_text})
-            
-            # Update state with new scenes
-            existing_scenes = state.get('scenes', [])
-            new_scenes = result['scenes']
-            
-            state.update({
-                'scenes': existing_scenes + new_scenes,
-                'scene_transitions': result['scene_transitions'],
-                'composition_quality_score': result['composition_quality_score'],
+            sections = self._split_plot_structure(state['plot_structure'])
+            section_results = await gather_bounded(
+                [self._compose_section(state, name, section) for name, section in sections],
+                self.max_concurrency
+            )
+
+            # Stitch the sections back together in story order
+            new_scenes = self._stitch_scenes(
+                [name for name, _ in sections],
+                [result['scenes'] for result in section_results]
+            )
+            scene_transitions = await self._compose_transitions(new_scenes)
+            quality_scores = [
+                float(result['composition_quality_score']) for result in section_results
+            ]
+            quality_score = sum(quality_scores) / len(quality_scores)
+
+            # The state reducer replaces scenes whose id is already present, so
+            # composing the book again rewrites it in place rather than appending
+            delta = {
+                'scenes': new_scenes,
+                'scene_transitions': scene_transitions,
+                'composition_quality_score': quality_score,
+                'scene_composition_complete': True
+            }
+
+            self.logger.info(
+                "scene_composition_complete",
+                title=state.get('title'),
+                section_count=len(sections),
+                new_scene_count=len(new_scenes),
+                quality_score=quality_score
+            )
+
+            return delta
+
+        except Exception as e:
+            self.logger.error("scene_composition_failed", error=str(e))
+            raise
+
+    async def stream(self, state: Dict[str, Any], buffer: int = 1) -> AsyncIterator[Dict[str, Any]]:
+        """Yield composed scenes in story order, each act's as soon as it is composed.
+
+        Acts are composed up to ``max_concurrency`` at once. Each item holds
+        the scene and its act's composition score. Once every scene has been
+        taken, the state is updated as ``invoke`` would.
+        """
+        try:
+            async def compose(section: Tuple[str, Any]) -> Tuple[str, Dict[str, Any]]:
+                name, plot = section
+                return name, await self._compose_section(state, name, plot)
+
+            sections = self._split_plot_structure(state['plot_structure'])
+            seen_ids: Set[Any] = set()
+            new_scenes, quality_scores = [], []
+            async for name, result in Stage('scene', compose, self.max_concurrency, buffer)(sections):
+                quality_scores.append(float(result['composition_quality_score']))
+                for scene in result['scenes']:
+                    scene = self._unique_scene(name, scene, seen_ids)
+                    new_scenes.append(scene)
+                    yield {'scene': scene, 'composition_quality_score': quality_scores[-1]}
+
+            quality_score = sum(quality_scores) / len(quality_scores)
+            apply_delta(state, {
+                'scenes': new_scenes,
+                'scene_transitions': await self._compose_transitions(new_scenes),
+                'composition_quality_score': quality_score,
                 'scene_composition_complete': True
             })
-            
             self.logger.info(
                 "scene_composition_complete",
                 title=state.get('title'),
+                section_count=len(sections),
                 new_scene_count=len(new_scenes),
-                quality_score=result['composition_quality_score']
+                quality_score=quality_score
             )
-            
-            return state
-            
+
         except Exception as e:
             self.logger.error("scene_composition_failed", error=str(e))
-            raise
\ No newline at end of file
+            raise
+
+    @staticmethod
+    def _split_plot_structure(plot_structure: Dict[str, Any]) -> List[Tuple[str, Any]]:
+        """Split the plot structure into independently composable acts."""
+        sections = [
+            (name, section) for name, section in plot_structure.items()
+            if isinstance(section, (dict, list)) and section
+        ]
+        return sections or [("plot", plot_structure)]
+
+    @staticmethod
+    def _relevant_characters(
+        characters: List[Dict[str, Any]], section_text: str
+    ) -> List[Dict[str, Any]]:
+        """Characters named in the section, plus the protagonists."""
+        relevant = [
+            character for character in characters
+            if character.get('name') and (
+                character['name'] in section_text
+                or 'protagonist' in str(character.get('role', '')).lower()
+            )
+        ]
+        return relevant or characters
+
+    @staticmethod
+    def _relevant_world(world: Dict[str, Any], section_text: str) -> Dict[str, Any]:
+        """The setting and rules, plus world elements named in the section."""
+        elements = world.get('elements')
+        if not isinstance(elements, list):
+            return world
+
+        relevant_elements = [
+            element for element in elements
+            if not isinstance(element, dict) or str(element.get('name', '')) in section_text
+        ]
+        return {**world, 'elements': relevant_elements}
+
+    async def _compose_section(
+        self, state: Dict[str, Any], name: str, section: Any
+    ) -> Dict[str, Any]:
+        """Compose the scenes for a single act of the plot structure."""
+        section_text = json.dumps(section, default=str)
+        input_text = f"""
+            Title: {state.get('title')}
+            Act: {name}
+            Plot Structure: {to_prompt(section)}
+            Characters: {to_prompt(self._relevant_characters(state.get('characters', []), section_text))}
+            World: {to_prompt(self._relevant_world(state.get('world_building', {}), section_text))}
+            Current Scene Count: {len(state.get('scenes', []))}
+            """
+
+        result = await self._ainvoke_chain(input_text)
+        self.logger.info("scene_section_complete", section=name, scene_count=len(result['scenes']))
+        return result
+
+    @staticmethod
+    def _stitch_scenes(
+        section_names: List[str],
+        section_scenes: List[List[Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """Concatenate per-act scenes, keeping scene ids unique across acts.
+
+        Ids are only made unique within this composition: a scene keeping
+        the id of an existing scene replaces it in the state.
+        """
+        seen_ids: Set[Any] = set()
+        return [
+            SceneComposer._unique_scene(name, scene, seen_ids)
+            for name, scenes in zip(section_names, section_scenes)
+            for scene in scenes
+        ]
+
+    @staticmethod
+    def _unique_scene(name: str, scene: Dict[str, Any], seen_ids: Set[Any]) -> Dict[str, Any]:
+        """The scene, with its id prefixed by its act if already taken."""
+        if scene.get('id') in seen_ids:
+            scene = {**scene, 'id': f"{name}_{scene.get('id')}"}
+        seen_ids.add(scene.get('id'))
+        return scene
+
+    async def _compose_transitions(self, scenes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Plan transitions from a compact outline of the stitched scenes."""
+        if len(scenes) < 2:
+            return []
+
+        outline = [
+            {
+                'id': scene.get('id'),
+                'title': scene.get('title'),
+                'location': scene.get('setting', {}).get('location'),
+                'opening': scene.get('action', {}).get('opening'),
+                'closing': scene.get('action', {}).get('closing')
+            }
+            for scene in scenes
+        ]
+        result = await self._ainvoke_chain(
+            f"Scenes: {to_prompt(outline)}", prompt=self.transitions_prompt
+        )
+        return result['scene_transitions']
\ No newline at end of file
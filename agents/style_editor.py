@@ -1,9 +1,20 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, List
+from editing.ledger import record_pass, select_for_pass
+from editing.patches import EDIT_FORMAT, apply_edits, apply_edits_to_state
+from indexing.bm25 import chunk_scene, format_chunks
+from indexing.manuscript import Passage, annotate_paragraphs, prose_field, split_paragraphs
+from state import apply_delta, delta_view
+from workflows.invalidation import recompute_feedback, recompute_scope
+from workflows.map_reduce import deep_merge
+from workflows.pipeline import Stage
 from .base import BaseAgent
+from .prompt_format import to_prompt
 
 STYLE_EDITOR_PROMPT = """You are the Style Editor responsible for maintaining consistent 
 writing quality and tone. Polish prose and ensure stylistic coherence.
 
+""" + EDIT_FORMAT + """
+
 Your output must be valid JSON with the following structure:
 {
     "style_analysis": {
@@ -18,8 +29,7 @@ Your output must be valid JSON with the following structure:
             "suggested_revisions": [
                 {
                     "scene_id": "scene_identifier",
-                    "original": "Original text",
-                    "revised": "Improved version",
+                    "paragraph_id": "paragraph_id of the edit",
                     "reasoning": "Why this improves style"
                 }
             ]
@@ -30,6 +40,9 @@ Your output must be valid JSON with the following structure:
             "fixes": ["How to maintain voice"]
         }
     },
+    "edits": [
+        {"op": "replace", "id": "paragraph_id", "text": "Revised paragraph"}
+    ],
     "style_metrics": {
         "tone_consistency": 0.0,
         "prose_quality": 0.0,
@@ -38,30 +51,189 @@ Your output must be valid JSON with the following structure:
     }
 }"""
 
+# Scene outlines retrieved for analysis before any prose is written
+CONTEXT_CHUNKS = 12
+CONTEXT_TOKENS = 3000
+STYLE_CONTEXT_QUERY = """tone voice mood atmosphere imagery description dialogue
+narration perspective rhythm emotion"""
+
 class StyleEditor(BaseAgent):
-    def __init__(self, model_name: str = "claude-3-opus-20240229"):
+    reads = (
+        'creative_direction', 'characters', 'world_building', 'plot_structure',
+        'scenes', 'manuscript', 'scene_dialogues', 'style_guidelines',
+        'refinement_mode', 'processing_ledger'
+    )
+    writes = (
+        'style_analysis', 'style_metrics', 'style_edit_report',
+        'style_editing_complete', 'scenes', 'manuscript', 'refinement_report',
+        'processing_ledger'
+    )
+    item_scoped = True
+
+    def __init__(self, model_name: str = "claude-3-opus-20240229", max_concurrency: int = 4):
         super().__init__(model_name, STYLE_EDITOR_PROMPT)
+        self.max_concurrency = max_concurrency
+
+    def _input_text(self, state: Dict[str, Any], story_text: str, dialogues: Any) -> str:
+        input_text = f"""
+            Creative Direction: {to_prompt(state.get('creative_direction', {}))}
+            {story_text}
+            Dialogue: {to_prompt(dialogues)}
+            Target Style: {to_prompt(state.get('style_guidelines', {}))}
+            """
+        feedback = recompute_feedback(state)
+        if feedback:
+            input_text += f"Reviewer Feedback: {feedback}\n"
+        return input_text
     
     async def invoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            input_text = f"""
-            Creative Direction: {state.get('creative_direction', {})}
-            Scenes: {state.get('scenes', [])}
-            Dialogue: {state.get('scene_dialogues', [])}
-            Target Style: {state.get('style_guidelines', {})}
-            """
+            # Written prose is edited in place; scene outlines are only analysed.
+            # The editing helpers write to a view whose writes join the delta.
+            view = delta_view(state)
+            paragraphs, selection = select_for_pass(view, 'style')
+            scope = recompute_scope(state)
+            if scope is not None:
+                # A feedback re-run only revises the affected scenes
+                paragraphs = [paragraph for paragraph in paragraphs if paragraph.scene in scope]
+            if selection['incremental'] and not paragraphs and selection['skipped_paragraphs']:
+                self.logger.info("style_editing_skipped", skipped=selection['skipped_paragraphs'])
+                return {**view.maps[0], 'style_editing_complete': True}
+
+            if paragraphs:
+                story_text = f"Prose: {annotate_paragraphs(paragraphs)}"
+                scene_ids = {paragraph.scene for paragraph in paragraphs}
+            else:
+                # Outlines are only analysed, so the most telling ones stand for the rest
+                chunks = self.retrieve_chunks(
+                    state, self._style_query(state), k=CONTEXT_CHUNKS, max_tokens=CONTEXT_TOKENS
+                )
+                story_text = f"Scenes: {format_chunks(chunks)}"
+                scene_ids = {chunk_scene(chunk) for chunk in chunks}
+            dialogues = [
+                dialogue for dialogue in state.get('scene_dialogues', [])
+                if str(dialogue.get('scene_id')) in scene_ids
+            ]
+            input_text = self._input_text(state, story_text, dialogues)
             
-            chain = self.prompt | self.llm | self.output_parser
-            result = await chain.ainvoke({"input": input_text})
+            result = await self._ainvoke_chain(input_text)
+            edit_report = apply_edits_to_state(view, result.get('edits', []))
+            record_pass(view, 'style')
             
-            state.update({
+            delta = {
+                **view.maps[0],
+                **self._edited_fields(view, edit_report['scenes_changed']),
                 'style_analysis': result['style_analysis'],
                 'style_metrics': result['style_metrics'],
+                'style_edit_report': edit_report,
                 'style_editing_complete': True
-            })
+            }
             
-            return state
+            self.logger.info(
+                "style_editing_complete",
+                edits_applied=edit_report['applied'],
+                edit_conflicts=len(edit_report['conflicts'])
+            )
             
+            return delta
+            
+        except Exception as e:
+            self.logger.error("style_editing_failed", error=str(e))
+            raise
+
+    async def stream(
+        self,
+        items: AsyncIterator[Dict[str, Any]],
+        state: Dict[str, Any],
+        buffer: int = 1
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Style scene items as they arrive, ``max_concurrency`` at once.
+
+        Each scene's prose is edited in place and the item is yielded with
+        its ``style`` result added. Once every item has been styled, the
+        state is updated as ``invoke`` would, with analyses merged and
+        metrics averaged across scenes.
+        """
+        try:
+            async def style(item: Dict[str, Any]) -> Dict[str, Any]:
+                return {**item, 'style': await self._style_scene(state, item)}
+
+            results = []
+            async for item in Stage('style', style, self.max_concurrency, buffer)(items):
+                results.append(item['style'])
+                yield item
+
+            weights = [1.0] * len(results)
+            edit_report = {
+                'applied': sum(result['applied'] for result in results),
+                'conflicts': [conflict for result in results for conflict in result['conflicts']],
+                'scenes_changed': [scene for result in results for scene in result['scenes_changed']]
+            }
+            record_pass(state, 'style')
+            apply_delta(state, {
+                'style_analysis': deep_merge([result['style_analysis'] for result in results], weights),
+                'style_metrics': deep_merge([result['style_metrics'] for result in results], weights),
+                'style_edit_report': edit_report,
+                'style_editing_complete': True
+            })
+            self.logger.info(
+                "style_editing_complete",
+                edits_applied=edit_report['applied'],
+                edit_conflicts=len(edit_report['conflicts'])
+            )
+
         except Exception as e:
             self.logger.error("style_editing_failed", error=str(e))
-            raise
\ No newline at end of file
+            raise
+
+    @staticmethod
+    def _style_query(state: Dict[str, Any]) -> str:
+        """Search terms for the scenes that show the story's tone and voice best."""
+        return " ".join([
+            STYLE_CONTEXT_QUERY,
+            to_prompt(state.get('creative_direction', {})),
+            to_prompt(state.get('style_guidelines', {}))
+        ])
+
+    @staticmethod
+    def _edited_fields(view: Dict[str, Any], scenes_changed: List[str]) -> Dict[str, Any]:
+        """The manuscript and scenes whose prose was edited in place.
+
+        Plain-text manuscripts are rewritten into the view already; the
+        replaced scenes are merged into the state's scenes by id.
+        """
+        if not scenes_changed:
+            return {}
+        changed = set(scenes_changed)
+        fields: Dict[str, Any] = {
+            'scenes': [
+                scene for scene in view.get('scenes', []) if str(scene.get('id')) in changed
+            ]
+        }
+        if isinstance(view.get('manuscript'), dict):
+            fields['manuscript'] = view['manuscript']
+        return fields
+
+    async def _style_scene(self, state: Dict[str, Any], item: Dict[str, Any]) -> Dict[str, Any]:
+        """Style one scene, editing its prose in place when it has any."""
+        scene = item['scene']
+        field = prose_field(scene)
+        paragraphs = split_paragraphs(Passage('', str(scene.get('id')), scene[field])) if field else []
+        if paragraphs:
+            story_text = f"Prose: {annotate_paragraphs(paragraphs)}"
+        else:
+            story_text = f"Scenes: {to_prompt([scene])}"
+
+        result = await self._ainvoke_chain(
+            self._input_text(state, story_text, [item.get('scene_dialogue', {})])
+        )
+        edits = apply_edits(paragraphs, result.get('edits', []))
+        if edits.applied:
+            scene[field] = "\n\n".join(paragraph.text for paragraph in edits.paragraphs)
+        return {
+            'style_analysis': result['style_analysis'],
+            'style_metrics': result['style_metrics'],
+            'applied': len(edits.applied),
+            'conflicts': edits.conflicts,
+            'scenes_changed': [str(scene.get('id'))] if edits.applied else []
+        }
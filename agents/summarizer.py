@@ -0,0 +1,60 @@
+from typing import Dict, Any, List
+from indexing.manuscript import manuscript_passages
+from indexing.summary_tree import SummaryTree
+from .base import BaseAgent, gather_bounded
+from .prompt_format import to_prompt
+
+SUMMARIZER_PROMPT = """You are the Story Summarizer responsible for keeping a running
+summary of the manuscript. Summarize the section you are given from its parts, which are
+either the scene text or the summaries of the section's scenes, chapters or acts.
+Keep plot events, character changes, revealed facts and open threads; drop description.
+
+Your output must be valid JSON with the following structure:
+{
+    "summary": "Summary of the section in at most 200 words"
+}"""
+
+class StorySummarizer(BaseAgent):
+    reads = ('manuscript', 'scenes', 'summary_tree')
+    writes = ('summary_tree', 'summaries_complete')
+    item_scoped = True
+
+    def __init__(self, model_name: str = "claude-3-opus-20240229", max_concurrency: int = 4):
+        super().__init__(model_name, SUMMARIZER_PROMPT)
+        self.max_concurrency = max_concurrency
+
+    async def invoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            tree = SummaryTree.from_dict(state.get('summary_tree'))
+            regenerated = await tree.refresh(
+                manuscript_passages(state),
+                self._summarize,
+                lambda aws: gather_bounded(aws, self.max_concurrency)
+            )
+
+            delta = {
+                'summary_tree': tree.to_dict(),
+                'summaries_complete': True
+            }
+
+            self.logger.info(
+                "summarization_complete",
+                regenerated=len(regenerated),
+                node_count=len(tree.nodes)
+            )
+
+            return delta
+
+        except Exception as e:
+            self.logger.error("summarization_failed", error=str(e))
+            raise
+
+    async def _summarize(self, level: str, node_id: str, parts: List[str]) -> str:
+        input_text = f"""
+            Level: {level}
+            Section: {node_id}
+            Parts: {to_prompt(parts)}
+            """
+
+        result = await self._ainvoke_chain(input_text)
+        return result['summary']
@@ -1,5 +1,6 @@
 from typing import Dict, Any
 from .base import BaseAgent
+from .prompt_format import to_prompt
 
 WORLD_BUILDING_PROMPT = """You are the World Building Expert responsible for creating rich, 
 consistent story environments. Analyze the current story requirements and develop the world.
@@ -26,6 +27,9 @@ Your output must be valid JSON with the following structure:
 """
 
 class WorldBuildingExpert(BaseAgent):
+    reads = ('title', 'genre', 'creative_direction', 'setting')
+    writes = ('world_building', 'world_consistency_score')
+
     def __init__(self, model_name: str = "claude-3-opus-20240229"):
         super().__init__(model_name, WORLD_BUILDING_PROMPT)
     
@@ -34,21 +38,20 @@ class WorldBuildingExpert(BaseAgent):
             input_text = f"""
             Story Title: {state.get('title')}
             Genre: {state.get('genre')}
-            Creative Direction: {state.get('creative_direction', {})}
-            Current Setting: {state.get('setting', 'Not established')}
+            Creative Direction: {to_prompt(state.get('creative_direction', {}))}
+            Current Setting: {to_prompt(state.get('setting', 'Not established'))}
             """
             
-            chain = self.prompt | self.llm | self.output_parser
-            result = await chain.ainvoke({"input": input_text})
+            result = await self._ainvoke_chain(input_text)
             
-            state.update({
+            delta = {
                 "world_building": {
                     "setting": result["setting"],
                     "elements": result["world_elements"],
                     "rules": result["rules"]
                 },
                 "world_consistency_score": result["consistency_score"]
-            })
+            }
             
             self.logger.info(
                 "world_building_complete",
@@ -56,7 +59,7 @@ class WorldBuildingExpert(BaseAgent):
                 consistency_score=result["consistency_score"]
             )
             
-            return state
+            return delta
             
         except Exception as e:
             self.logger.error("world_building_failed", error=str(e))
@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import json
+import os
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+ARTIFACT_REF = "$artifact"
+
+# Blob header bytes: zlib-compressed or raw JSON
+COMPRESSED = b"z"
+RAW = b"j"
+
+
+def is_ref(value: Any) -> bool:
+    return isinstance(value, dict) and len(value) == 1 and ARTIFACT_REF in value
+
+
+def encode(value: Any) -> bytes:
+    return json.dumps(
+        value, sort_keys=True, separators=(",", ":"), default=str, ensure_ascii=False
+    ).encode()
+
+
+class ArtifactStore(ABC):
+    """Content-addressed store for agent outputs.
+
+    Values are serialized to canonical JSON and stored once under the
+    sha256 of that JSON, so identical outputs are deduplicated. Reads are
+    synchronous, so a field can be resolved on first access from plain
+    ``state[...]`` lookups, and recently read artifacts are cached.
+    """
+
+    def __init__(self, compress: bool = True, cache_size: int = 256):
+        self.compress = compress
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+
+    @abstractmethod
+    def _read(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def _write(self, key: str, blob: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def _exists(self, key: str) -> bool:
+        ...
+
+    def put(self, value: Any) -> Dict[str, str]:
+        """Store a value and return a reference to it."""
+        data = encode(value)
+        key = hashlib.sha256(data).hexdigest()
+        if key not in self._cache and not self._exists(key):
+            blob = COMPRESSED + zlib.compress(data) if self.compress else RAW + data
+            self._write(key, blob)
+            logger.debug("artifact_stored", key=key, size=len(data), stored=len(blob))
+        return {ARTIFACT_REF: key}
+
+    def get(self, ref: Dict[str, str]) -> Any:
+        """Resolve a reference to its value."""
+        key = ref[ARTIFACT_REF]
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        blob = self._read(key)
+        if blob is None:
+            raise KeyError(f"Unknown artifact: {key}")
+        data = zlib.decompress(blob[1:]) if blob[:1] == COMPRESSED else blob[1:]
+        value = json.loads(data)
+
+        self._cache[key] = value
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return value
+
+
+class FilesystemArtifactStore(ArtifactStore):
+    """Artifacts as files under ``root``, fanned out by the first two hash characters."""
+
+    def __init__(self, root: str = ".artifacts", **kwargs: Any):
+        super().__init__(**kwargs)
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:])
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as artifact:
+                return artifact.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, blob: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a reader never sees a partial artifact
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as artifact:
+            artifact.write(blob)
+        os.replace(temporary, path)
+
+    def _exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+
+class MongoArtifactStore(ArtifactStore):
+    """Artifacts as documents keyed by hash in a (synchronous) pymongo collection."""
+
+    def __init__(self, collection: Any, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.collection = collection
+
+    def _read(self, key: str) -> Optional[bytes]:
+        document = self.collection.find_one({"_id": key})
+        return bytes(document["data"]) if document else None
+
+    def _write(self, key: str, blob: bytes) -> None:
+        self.collection.update_one(
+            {"_id": key}, {"$setOnInsert": {"data": blob}}, upsert=True
+        )
+
+    def _exists(self, key: str) -> bool:
+        return self.collection.count_documents({"_id": key}, limit=1) > 0
+
+
+class ArtifactState(dict):
+    """A state dict whose large fields live in an artifact store.
+
+    Fields holding references are resolved when first read through
+    ``state[key]``, ``get``, ``items`` or ``values``; ``externalize`` moves
+    large fields back into the store, and ``aexternalize`` does so from
+    async code without blocking the event loop.
+    """
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, store: Optional[ArtifactStore] = None):
+        super().__init__(data or {})
+        self.store = store or get_artifact_store()
+
+    def _resolve(self, key: str) -> Any:
+        value = super().__getitem__(key)
+        if is_ref(value):
+            value = self.store.get(value)
+            super().__setitem__(key, value)
+        return value
+
+    def __getitem__(self, key: str) -> Any:
+        return self._resolve(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._resolve(key) if key in self else default
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            super().__setitem__(key, default)
+        return self._resolve(key)
+
+    def pop(self, key: str, *default: Any) -> Any:
+        if key not in self:
+            return super().pop(key, *default)
+        value = self._resolve(key)
+        super().pop(key)
+        return value
+
+    def items(self) -> Iterator[Tuple[str, Any]]:  # type: ignore[override]
+        return ((key, self._resolve(key)) for key in list(self.keys()))
+
+    def values(self) -> Iterator[Any]:  # type: ignore[override]
+        return (self._resolve(key) for key in list(self.keys()))
+
+    def copy(self) -> "ArtifactState":
+        return ArtifactState(dict(super().items()), self.store)
+
+    def externalize(self, min_bytes: int = 512) -> "ArtifactState":
+        """Replace every field larger than ``min_bytes`` of JSON with a reference."""
+        for key, value in list(super().items()):
+            if is_ref(value) or not isinstance(value, (dict, list, str)):
+                continue
+            if len(encode(value)) >= min_bytes:
+                super().__setitem__(key, self.store.put(value))
+        return self
+
+    def _store_large(
+        self, fields: List[Tuple[str, Any]], min_bytes: int
+    ) -> List[Tuple[str, Any, Dict[str, str]]]:
+        return [
+            (key, value, self.store.put(value))
+            for key, value in fields if len(encode(value)) >= min_bytes
+        ]
+
+    async def aexternalize(self, min_bytes: int = 512) -> "ArtifactState":
+        """``externalize`` without blocking the event loop.
+
+        Encoding and store writes run in a worker thread. A field that is
+        reassigned meanwhile keeps its new value, to be externalized next time.
+        """
+        fields = [
+            (key, value) for key, value in list(super().items())
+            if not is_ref(value) and isinstance(value, (dict, list, str))
+        ]
+        if not fields:
+            return self
+        for key, value, ref in await asyncio.to_thread(self._store_large, fields, min_bytes):
+            if key in self and super().__getitem__(key) is value:
+                super().__setitem__(key, ref)
+        return self
+
+    def snapshot(self, min_bytes: int = 512) -> Dict[str, Any]:
+        """A plain dict of the state with large fields as references."""
+        self.externalize(min_bytes)
+        return {key: super(ArtifactState, self).__getitem__(key) for key in self}
+
+
+def dehydrate(state: Dict[str, Any], store: Optional[ArtifactStore] = None, min_bytes: int = 512) -> Dict[str, Any]:
+    """A plain, reference-holding copy of any state dict."""
+    if not isinstance(state, ArtifactState):
+        state = ArtifactState(state, store)
+    return state.snapshot(min_bytes)
+
+
+@lru_cache()
+def get_artifact_store() -> ArtifactStore:
+    """The process-wide artifact store.
+
+    ``ARTIFACT_STORE_URL`` selects the backend: a ``mongodb://`` URL stores
+    artifacts in the ``artifacts`` collection of the configured database;
+    anything else is a directory (default ``.artifacts``).
+    """
+    url = os.getenv("ARTIFACT_STORE_URL", ".artifacts")
+    compress = os.getenv("ARTIFACT_STORE_COMPRESS", "true").lower() != "false"
+    if url.startswith(("mongodb://", "mongodb+srv://")):
+        from pymongo import MongoClient
+
+        from config import get_settings
+
+        database = MongoClient(url)[get_settings().MONGODB_DB]
+        return MongoArtifactStore(database["artifacts"], compress=compress)
+    return FilesystemArtifactStore(url.removeprefix("file://"), compress=compress)
@@ -0,0 +1,134 @@
+"""Cold import time of the modules API and job workers load at startup.
+
+Each module is imported in a fresh interpreter under ``python -X importtime``.
+The run fails if a module exceeds its budget or pulls in a provider SDK,
+which should only be imported when the first model is created. Modules
+listed in ``KNOWN_BROKEN`` are skipped while they fail to import, and held
+to their budget again as soon as they import.
+
+Run from the repository root:
+
+    python -m benchmarks.import_time
+"""
+import os
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Optional
+
+# Cumulative import time budgets in milliseconds
+IMPORT_BUDGETS = {
+    "config": 150,
+    "state": 500,
+    "prompt_registry": 400,
+    "agents.base": 2000,
+    "agents.factory": 2000,
+    "workflows.manager": 2500,
+    # Entry points: agent functions for the job workers, and the API
+    "agents": 2500,
+    "main": 3000,
+}
+
+# Modules that cannot be imported from this tree yet, and why
+SHADOWED = "agents.py and workflows.py shadow the agents/ and workflows/ packages"
+KNOWN_BROKEN = {
+    "agents.base": SHADOWED,
+    "agents.factory": SHADOWED,
+    "workflows.manager": SHADOWED,
+    "agents": "agents.py imports MongoDBManager, which mongodb.py does not define",
+    "main": "main.py imports AgentFactory from agents.py and .middleware relatively",
+}
+
+# Packages that must not be imported by the modules above
+LAZY_PACKAGES = (
+    "langchain_anthropic",
+    "langchain_openai",
+    "langchain_ollama",
+    "langchain_aws",
+    "langchain_mongodb",
+    "langgraph_sdk",
+    "pydantic_settings",
+)
+
+
+class ImportProfile(NamedTuple):
+    module: str
+    # Cumulative import time of the module, or None if the import failed
+    milliseconds: Optional[float]
+    # Every module imported along the way, with its cumulative time in ms
+    imported: Dict[str, float]
+    # The modules ``module`` imported directly, with their cumulative time in ms
+    direct: Dict[str, float]
+    error: str = ""
+
+
+def profile_import(module: str) -> ImportProfile:
+    """Import ``module`` in a fresh interpreter and parse ``-X importtime``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    imported: Dict[str, float] = {}
+    direct: Dict[str, float] = {}
+    errors: List[str] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Nesting is shown by two spaces per level, and children are listed
+        # before their parent
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        imported[name] = int(cumulative) / 1000
+        if depth == 1:
+            direct[name] = imported[name]
+        elif depth == 0 and name != module:
+            direct = {}
+    if result.returncode != 0:
+        return ImportProfile(module, None, imported, direct, errors[-1] if errors else "import failed")
+    return ImportProfile(module, imported.get(module), imported, direct)
+
+
+def eager_packages(profile: ImportProfile) -> List[str]:
+    """The lazily loaded packages that ``profile.module`` imported anyway."""
+    return sorted(
+        package for package in LAZY_PACKAGES
+        if any(name == package or name.startswith(package + ".") for name in profile.imported)
+    )
+
+
+def main(repeat: int = 3) -> int:
+    failures = 0
+    print(f"{'module':20} {'import':>10} {'budget':>10}  slowest dependencies")
+    for module, budget in IMPORT_BUDGETS.items():
+        # The fastest of a few runs, to discount a cold disk cache
+        profiles = [profile_import(module) for _ in range(repeat)]
+        profile = min(profiles, key=lambda p: p.milliseconds if p.milliseconds is not None else float("inf"))
+        if profile.milliseconds is None and module in KNOWN_BROKEN:
+            print(f"{module:20} {'skipped':>10} {budget:>7} ms  known broken: {KNOWN_BROKEN[module]}")
+            continue
+        if profile.milliseconds is None:
+            print(f"{module:20} {'failed':>10} {budget:>7} ms  {profile.error}")
+            failures += 1
+            continue
+
+        slowest = sorted(profile.direct.items(), key=lambda item: -item[1])[:3]
+        status = "" if profile.milliseconds <= budget else "  OVER BUDGET"
+        print(
+            f"{module:20} {profile.milliseconds:>7.0f} ms {budget:>7} ms  "
+            + ", ".join(f"{name} {ms:.0f} ms" for name, ms in slowest)
+            + status
+        )
+        eager = eager_packages(profile)
+        if eager:
+            print(f"{'':20} imports {', '.join(eager)} at import time")
+        failures += bool(status or eager)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Per-call cost of serializing a ProjectState for an agent prompt.
+
+Run from the repository root:
+
+    python -m benchmarks.state_serialization
+"""
+import json
+import timeit
+
+from state import ProjectState, TeamState
+from utils import estimate_tokens
+
+
+def sample_project() -> ProjectState:
+    """A mid-run project: populated teams, phase history and manuscript notes."""
+    project = ProjectState(
+        project_id="bench",
+        title="The Crystal Key",
+        genre="fantasy",
+        target_audience="adult",
+        word_count_target=90000,
+    )
+    for director in ("creative_director", "content_development_director", "editorial_director"):
+        for team in ("research", "drafting", "review"):
+            project.set_team_state(director, team, TeamState(
+                tasks_pending=[{"task": f"{team} task {n}", "priority": n} for n in range(10)],
+                tasks_completed=[{"task": f"{team} done {n}", "result": "ok " * 20} for n in range(20)],
+                quality_metrics={"score": 0.8, "coverage": 0.7},
+            ))
+    project.manuscript = {
+        "chapters": [{"id": f"ch{n}", "summary": "A chapter summary. " * 15} for n in range(30)]
+    }
+    project.touch()
+    for phase in ("development", "creation", "refinement"):
+        project.update_phase(phase)
+    return project
+
+
+def main(number: int = 200) -> None:
+    project = sample_project()
+    candidates = {
+        "json.dumps(model_dump(), indent=2)": lambda: json.dumps(project.model_dump(), indent=2),
+        "model_dump_json()": project.model_dump_json,
+        "to_json() (memoized)": project.to_json,
+    }
+
+    print(f"{'method':40} {'per call':>12} {'tokens':>8}")
+    for name, serialize in candidates.items():
+        seconds = min(timeit.repeat(serialize, number=number, repeat=5)) / number
+        print(f"{name:40} {seconds * 1e6:>9.1f} us {estimate_tokens(serialize()):>8}")
+
+    # A change anywhere in the state invalidates the cached form
+    def mutate_and_serialize() -> str:
+        project.creative_director.current_focus = "pacing"
+        return project.to_json()
+
+    seconds = min(timeit.repeat(mutate_and_serialize, number=number, repeat=5)) / number
+    print(f"{'to_json() after each change':40} {seconds * 1e6:>9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,6 @@ from typing import Any, Dict, Optional
 from functools import lru_cache
 
 from dotenv import load_dotenv
-from pydantic import Field
-from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # Load environment variables
 load_dotenv()
@@ -23,65 +21,67 @@ def get_env_dict(prefix: str, default_value: Any = None) -> Dict[str, Any]:
     }
 
 
-# Model configurations for agents with environment variable overrides
-MODEL_CONFIGS = {
-    agent_name: {
-        "model": os.getenv(f"{agent_name.upper()}_MODEL", "anthropic/claude-3-opus"),
-        "temperature": float(os.getenv(f"{agent_name.upper()}_TEMP", "0.2")),
-        "max_tokens": int(os.getenv(f"{agent_name.upper()}_MAX_TOKENS", "4000")),
+def _model_configs() -> Dict[str, Dict[str, Any]]:
+    """Model configurations for agents with environment variable overrides."""
+    return {
+        agent_name: {
+            "model": os.getenv(f"{agent_name.upper()}_MODEL", "anthropic/claude-3-opus"),
+            "temperature": float(os.getenv(f"{agent_name.upper()}_TEMP", "0.2")),
+            "max_tokens": int(os.getenv(f"{agent_name.upper()}_MAX_TOKENS", "4000")),
+        }
+        for agent_name in [
+            "executive_director",
+            "human_feedback_manager",
+            "quality_assessment_director",
+            "project_timeline_manager",
+            "creative_director",
+            "structure_architect",
+            "plot_development_specialist",
+            "world_building_expert",
+            "character_psychology_specialist",
+            "character_voice_designer",
+            "character_relationship_mapper",
+            "emotional_arc_designer",
+            "reader_attachment_specialist",
+            "scene_emotion_calibrator",
+            "content_development_director",
+            "domain_knowledge_specialist",
+            "cultural_authenticity_expert",
+            "historical_context_researcher",
+            "chapter_drafters",
+            "scene_construction_specialists",
+            "dialogue_crafters",
+            "continuity_manager",
+            "voice_consistency_monitor",
+            "description_enhancement_specialist",
+            "editorial_director",
+            "structural_editor",
+            "character_arc_evaluator",
+            "thematic_coherence_analyst",
+            "prose_enhancement_specialist",
+            "dialogue_refinement_expert",
+            "rhythm_cadence_optimizer",
+            "grammar_consistency_checker",
+            "fact_verification_specialist",
+            "formatting_standards_expert",
+            "market_alignment_director",
+            "zeitgeist_analyst",
+            "cultural_conversation_mapper",
+            "trend_forecaster",
+            "hook_optimization_expert",
+            "page_turner_designer",
+            "satisfaction_engineer",
+            "positioning_specialist",
+            "title_blurb_optimizer",
+            "differentiation_strategist",
+            "ollama_mistral",
+            "ollama_llama",
+            "ollama_vicuna",
+            "ollama_codellama",
+            "ollama_neural",
+        ]
     }
-    for agent_name in [
-        "executive_director",
-        "human_feedback_manager",
-        "quality_assessment_director",
-        "project_timeline_manager",
-        "creative_director",
-        "structure_architect",
-        "plot_development_specialist",
-        "world_building_expert",
-        "character_psychology_specialist",
-        "character_voice_designer",
-        "character_relationship_mapper",
-        "emotional_arc_designer",
-        "reader_attachment_specialist",
-        "scene_emotion_calibrator",
-        "content_development_director",
-        "domain_knowledge_specialist",
-        "cultural_authenticity_expert",
-        "historical_context_researcher",
-        "chapter_drafters",
-        "scene_construction_specialists",
-        "dialogue_crafters",
-        "continuity_manager",
-        "voice_consistency_monitor",
-        "description_enhancement_specialist",
-        "editorial_director",
-        "structural_editor",
-        "character_arc_evaluator",
-        "thematic_coherence_analyst",
-        "prose_enhancement_specialist",
-        "dialogue_refinement_expert",
-        "rhythm_cadence_optimizer",
-        "grammar_consistency_checker",
-        "fact_verification_specialist",
-        "formatting_standards_expert",
-        "market_alignment_director",
-        "zeitgeist_analyst",
-        "cultural_conversation_mapper",
-        "trend_forecaster",
-        "hook_optimization_expert",
-        "page_turner_designer",
-        "satisfaction_engineer",
-        "positioning_specialist",
-        "title_blurb_optimizer",
-        "differentiation_strategist",
-        "ollama_mistral",
-        "ollama_llama",
-        "ollama_vicuna",
-        "ollama_codellama",
-        "ollama_neural",
-    ]
-}
+
 
 # MongoDB configuration from environment
 MONGODB_CONFIG = {
@@ -1092,40 +1092,67 @@ PROMPT_TEMPLATES = {
 }
 
 
-class Settings(BaseSettings):
-    # MongoDB Configuration
-    MONGODB_URL: str
-    MONGODB_DB: str
-    
-    # LangChain Configuration
-    LANGCHAIN_API_KEY: str
-    DEFAULT_MODEL: str = "claude-3-opus-20240229"
-    
-    # Application Configuration
-    DEBUG: bool = False
-    APP_ENV: str = "development"
-    
-    # Workflow Configuration
-    WORKFLOW_TIMEOUT: int = 600
-    MAX_RETRIES: int = 3
-    
-    def validate(self) -> None:
-        """Validate required configuration."""
-        required = {
-            "MONGODB_URL": self.MONGODB_URL,
-            "MONGODB_DB": self.MONGODB_DB,
-            "LANGCHAIN_API_KEY": self.LANGCHAIN_API_KEY
-        }
-        
-        missing = [k for k, v in required.items() if not v]
-        if missing:
-            raise ValueError(f"Missing required configuration: {', '.join(missing)}")
+@lru_cache()
+def _settings_class() -> type:
+    """The ``Settings`` model; pydantic-settings is imported on first use."""
+    from pydantic_settings import BaseSettings
+
+    class Settings(BaseSettings):
+        # MongoDB Configuration
+        MONGODB_URL: str
+        MONGODB_DB: str
+
+        # LangChain Configuration
+        LANGCHAIN_API_KEY: str
+        DEFAULT_MODEL: str = "claude-3-opus-20240229"
+
+        # Application Configuration
+        DEBUG: bool = False
+        APP_ENV: str = "development"
+
+        # Workflow Configuration
+        WORKFLOW_TIMEOUT: int = 600
+        MAX_RETRIES: int = 3
+
+        def validate(self) -> None:
+            """Validate required configuration."""
+            required = {
+                "MONGODB_URL": self.MONGODB_URL,
+                "MONGODB_DB": self.MONGODB_DB,
+                "LANGCHAIN_API_KEY": self.LANGCHAIN_API_KEY
+            }
+
+            missing = [k for k, v in required.items() if not v]
+            if missing:
+                raise ValueError(f"Missing required configuration: {', '.join(missing)}")
+
+        class Config:
+            env_file = ".env"
+
+    return Settings
+
+
+# Tables and classes built on first access (PEP 562) rather than at import
+_LAZY_ATTRIBUTES = {
+    "MODEL_CONFIGS": _model_configs,
+    "Settings": _settings_class,
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = _LAZY_ATTRIBUTES[name]()
+    return value
+
+
+def get_model_config(agent_name: str) -> Dict[str, Any]:
+    """The model configuration of an agent, or an empty dict."""
+    return __getattr__("MODEL_CONFIGS").get(agent_name, {})
 
-    class Config:
-        env_file = ".env"
 
 @lru_cache()
-def get_settings() -> Settings:
-    settings = Settings()
+def get_settings() -> "Settings":
+    settings = _settings_class()()
     settings.validate()
     return settings
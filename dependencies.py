@@ -28,7 +28,10 @@ async def get_agent_factory(
     """Get agent factory with dependency injection"""
     return AgentFactory(mongodb)
 
-async def get_workflow_manager(
-    agent_factory: AgentFactory = Depends(get_agent_factory)
-) -> WorkflowManager:
-    return WorkflowManager(agent_factory)
\ No newline at end of file
+async def get_workflow_manager() -> WorkflowManager:
+    """Workflow manager backed by the process-wide agent registry.
+
+    Agents are created once per process, so building a manager per request
+    costs next to nothing.
+    """
+    return WorkflowManager()
\ No newline at end of file
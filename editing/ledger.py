@@ -0,0 +1,119 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import structlog
+
+from indexing.manuscript import Paragraph, manuscript_paragraphs
+from utils import content_hash, estimate_tokens
+
+logger = structlog.get_logger(__name__)
+
+
+def paragraph_hash(paragraph: Paragraph) -> str:
+    return content_hash(paragraph.text)
+
+
+class ProcessingLedger:
+    """Which paragraph hashes each refinement pass has already processed.
+
+    Passes are named after what they check ("style", "grammar", ...). A
+    paragraph whose hash a pass has seen does not need that pass again,
+    unless a neighbouring paragraph changed.
+    """
+
+    def __init__(self, passes: Optional[Dict[str, List[str]]] = None):
+        self.passes: Dict[str, Set[str]] = {
+            name: set(hashes) for name, hashes in (passes or {}).items()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "ProcessingLedger":
+        return cls((data or {}).get("passes"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"passes": {name: sorted(hashes) for name, hashes in self.passes.items()}}
+
+    def select(
+        self, pass_name: str, paragraphs: List[Paragraph], window: int = 1
+    ) -> List[Paragraph]:
+        """New or changed paragraphs plus ``window`` neighbours either side in their scene."""
+        processed = self.passes.get(pass_name, set())
+        scenes: Dict[str, List[int]] = {}
+        for position, paragraph in enumerate(paragraphs):
+            scenes.setdefault(paragraph.scene, []).append(position)
+
+        selected: Set[int] = set()
+        for positions in scenes.values():
+            for index, position in enumerate(positions):
+                if paragraph_hash(paragraphs[position]) not in processed:
+                    selected.update(positions[max(0, index - window):index + window + 1])
+        return [paragraphs[position] for position in sorted(selected)]
+
+    def record(
+        self,
+        pass_name: str,
+        paragraphs: List[Paragraph],
+        existing: Optional[List[Paragraph]] = None
+    ) -> None:
+        """Mark ``paragraphs`` as processed by the pass.
+
+        With ``existing``, the paragraphs currently in the manuscript, the
+        hashes of paragraphs since edited away are dropped from every pass.
+        """
+        self.passes.setdefault(pass_name, set()).update(map(paragraph_hash, paragraphs))
+        if existing is not None:
+            current = set(map(paragraph_hash, existing)) | set(map(paragraph_hash, paragraphs))
+            self.passes = {name: hashes & current for name, hashes in self.passes.items()}
+
+
+def _report(
+    pass_name: str, paragraphs: List[Paragraph], selected: List[Paragraph], incremental: bool
+) -> Dict[str, Any]:
+    chosen = {paragraph.id for paragraph in selected}
+    skipped = [paragraph for paragraph in paragraphs if paragraph.id not in chosen]
+    scenes = {paragraph.scene for paragraph in paragraphs}
+    processed_scenes = {paragraph.scene for paragraph in selected}
+    return {
+        "pass": pass_name,
+        "incremental": incremental,
+        "processed_paragraphs": len(selected),
+        "skipped_paragraphs": len(skipped),
+        "processed_tokens": sum(estimate_tokens(paragraph.text) for paragraph in selected),
+        "skipped_tokens": sum(estimate_tokens(paragraph.text) for paragraph in skipped),
+        "processed_scenes": len(processed_scenes),
+        "skipped_scenes": len(scenes - processed_scenes)
+    }
+
+
+def select_for_pass(
+    state: Dict[str, Any],
+    pass_name: str,
+    chapter: Optional[str] = None,
+    window: int = 1
+) -> Tuple[List[Paragraph], Dict[str, Any]]:
+    """The paragraphs a refinement pass should process, and a skipped-vs-processed report.
+
+    Every paragraph is selected unless ``state["refinement_mode"]`` is
+    ``"incremental"``. The report is also kept in
+    ``state["refinement_report"][pass_name]``.
+    """
+    paragraphs = manuscript_paragraphs(state, chapter)
+    incremental = state.get("refinement_mode") == "incremental"
+    selected = paragraphs
+    if incremental:
+        ledger = ProcessingLedger.from_dict(state.get("processing_ledger"))
+        selected = ledger.select(pass_name, paragraphs, window)
+
+    report = _report(pass_name, paragraphs, selected, incremental)
+    state["refinement_report"] = {**(state.get("refinement_report") or {}), pass_name: report}
+    logger.info("refinement_selection", **report)
+    return selected, report
+
+
+def record_pass(state: Dict[str, Any], pass_name: str, chapter: Optional[str] = None) -> None:
+    """Mark the current paragraphs, including the pass's own edits, as processed.
+
+    The ledger only keeps hashes of paragraphs still in the manuscript.
+    """
+    ledger = ProcessingLedger.from_dict(state.get("processing_ledger"))
+    ledger.record(pass_name, manuscript_paragraphs(state, chapter), manuscript_paragraphs(state))
+    state["processing_ledger"] = ledger.to_dict()
@@ -0,0 +1,125 @@
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import structlog
+
+from indexing.manuscript import Paragraph, manuscript_paragraphs, write_scene_texts
+
+logger = structlog.get_logger(__name__)
+
+EDIT_OPS = ("replace", "insert", "delete")
+
+# Shared description of the edit format for agent prompts and tool inputs
+EDIT_FORMAT = """Prose is given as paragraphs tagged with [paragraph_id]. Never return
+rewritten text in full; express every change as an edit operation on paragraph ids:
+    {"op": "replace", "id": "paragraph_id", "text": "Revised paragraph"}
+    {"op": "insert", "after": "paragraph_id", "text": "New paragraph"}
+    {"op": "insert", "before": "paragraph_id", "text": "New paragraph"}
+    {"op": "delete", "id": "paragraph_id"}
+Only include paragraphs that change."""
+
+
+class EditResult(NamedTuple):
+    paragraphs: List[Paragraph]
+    applied: List[Dict[str, Any]]
+    conflicts: List[Dict[str, Any]]
+
+
+def _validate(op: Any, ids: Dict[str, Paragraph]) -> Optional[str]:
+    """Why an op cannot be applied, or None if it can."""
+    if not isinstance(op, dict) or op.get("op") not in EDIT_OPS:
+        return "invalid_op"
+    if op["op"] == "insert":
+        anchor = op.get("after") or op.get("before")
+        if not anchor or not isinstance(op.get("text"), str):
+            return "invalid_op"
+    else:
+        anchor = op.get("id")
+        if not anchor or (op["op"] == "replace" and not isinstance(op.get("text"), str)):
+            return "invalid_op"
+    if anchor not in ids:
+        # Ids are content hashes, so an edited paragraph's old id is gone
+        return "unknown_paragraph"
+    return None
+
+
+def apply_edits(paragraphs: List[Paragraph], ops: List[Dict[str, Any]]) -> EditResult:
+    """Apply anchored edit ops to paragraphs, all against the same original text.
+
+    An op conflicts when it is malformed, when its anchor no longer exists,
+    or when an earlier op already replaced or deleted the same paragraph.
+    Conflicting ops are reported and skipped; the others still apply.
+    """
+    ids = {paragraph.id: paragraph for paragraph in paragraphs}
+    replaced: Dict[str, Optional[str]] = {}
+    before: Dict[str, List[str]] = {}
+    after: Dict[str, List[str]] = {}
+    applied, conflicts = [], []
+
+    for op in ops:
+        reason = _validate(op, ids)
+        if reason is None and op["op"] != "insert" and op["id"] in replaced:
+            reason = "overlapping_edit"
+        if reason is not None:
+            conflicts.append({"op": op, "reason": reason})
+            continue
+
+        if op["op"] == "insert":
+            target = after if op.get("after") else before
+            target.setdefault(op.get("after") or op["before"], []).append(op["text"])
+        else:
+            replaced[op["id"]] = op.get("text") if op["op"] == "replace" else None
+        applied.append(op)
+
+    def new(paragraph: Paragraph, text: str, position: str, number: int) -> Paragraph:
+        return Paragraph(f"{paragraph.id}+{position}{number}", paragraph.scene, text)
+
+    result = []
+    for paragraph in paragraphs:
+        result.extend(
+            new(paragraph, text, "b", number)
+            for number, text in enumerate(before.get(paragraph.id, []))
+        )
+        if paragraph.id not in replaced:
+            result.append(paragraph)
+        elif replaced[paragraph.id] is not None:
+            result.append(paragraph._replace(text=replaced[paragraph.id]))
+        result.extend(
+            new(paragraph, text, "a", number)
+            for number, text in enumerate(after.get(paragraph.id, []))
+        )
+
+    return EditResult(result, applied, conflicts)
+
+
+def apply_edits_to_state(
+    state: Dict[str, Any], ops: List[Dict[str, Any]], chapter: Optional[str] = None
+) -> Dict[str, Any]:
+    """Apply edit ops to the manuscript in ``state`` and report the outcome.
+
+    Only scenes touched by an applied op are rewritten.
+    """
+    paragraphs = manuscript_paragraphs(state, chapter)
+    result = apply_edits(paragraphs, ops or [])
+
+    touched = {
+        paragraph.scene for paragraph in paragraphs
+        if any(paragraph.id in (op.get("id"), op.get("after"), op.get("before")) for op in result.applied)
+    }
+    texts: Dict[str, List[str]] = {scene: [] for scene in touched}
+    for paragraph in result.paragraphs:
+        if paragraph.scene in touched:
+            texts[paragraph.scene].append(paragraph.text)
+    write_scene_texts(state, {scene: "\n\n".join(parts) for scene, parts in texts.items()})
+
+    report = {
+        "applied": len(result.applied),
+        "conflicts": result.conflicts,
+        "scenes_changed": sorted(touched)
+    }
+    logger.info(
+        "edits_applied",
+        applied=report["applied"],
+        conflicts=len(result.conflicts),
+        scenes_changed=len(touched)
+    )
+    return report
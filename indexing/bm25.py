@@ -0,0 +1,244 @@
+import json
+import os
+import re
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import structlog
+from scipy import sparse
+
+from utils import content_hash, estimate_tokens
+
+from .manuscript import manuscript_passages
+
+logger = structlog.get_logger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i in is it its of on or
+she that the their them they this to was were will with you
+""".split())
+
+
+# State fields ``chunk_state`` reads
+CHUNKED_FIELDS = ("characters", "world_building", "plot_structure", "manuscript", "scenes")
+
+
+class Chunk(NamedTuple):
+    id: str
+    source: str
+    text: str
+
+
+def chunk_scene(chunk: Chunk) -> Optional[str]:
+    """The id of the scene a chunk was cut from, if it is scene prose."""
+    return chunk.id[len("scene:"):].rsplit(":", 1)[0] if chunk.source == "scenes" else None
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower())
+        if token not in STOPWORDS
+    ]
+
+
+def _split_text(text: str, chunk_tokens: int) -> List[str]:
+    """Split prose into chunks of roughly ``chunk_tokens`` on paragraph boundaries."""
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for paragraph in (part for part in re.split(r"\n\s*\n", text) if part.strip()):
+        paragraph_tokens = estimate_tokens(paragraph)
+        if current and size + paragraph_tokens > chunk_tokens:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += paragraph_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _dump(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value, default=str, ensure_ascii=False)
+
+
+def chunk_state(state: Dict[str, Any], chunk_tokens: int = 300) -> List[Chunk]:
+    """Split the story bible and the written scenes into retrievable chunks.
+
+    Characters, world elements and acts are one chunk each; scene prose is
+    split on paragraph boundaries.
+    """
+    chunks = []
+    for number, character in enumerate(state.get("characters", [])):
+        chunks.append(Chunk(
+            f"character:{character.get('name', number)}", "characters", _dump(character)
+        ))
+
+    world = state.get("world_building", {})
+    if world.get("setting"):
+        chunks.append(Chunk("world:setting", "world_building", _dump(world["setting"])))
+    for number, element in enumerate(world.get("elements", [])):
+        name = element.get("name", number) if isinstance(element, dict) else number
+        chunks.append(Chunk(f"world:{name}", "world_building", _dump(element)))
+    if world.get("rules"):
+        chunks.append(Chunk("world:rules", "world_building", _dump(world["rules"])))
+
+    for act, section in state.get("plot_structure", {}).items():
+        chunks.append(Chunk(f"plot:{act}", "plot_structure", f"{act}: {_dump(section)}"))
+
+    for passage in manuscript_passages(state):
+        for number, text in enumerate(_split_text(passage.text, chunk_tokens)):
+            chunks.append(Chunk(f"scene:{passage.scene}:{number}", "scenes", text))
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over text chunks, backed by a sparse term-frequency matrix.
+
+    Chunks are tokenized once and re-tokenized only when their text changes.
+    The matrix is rebuilt lazily on the next search after an update.
+    ``source_hash`` is the hash of the state the chunks were last taken from.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.chunks: Dict[str, Chunk] = {}
+        self.chunk_hashes: Dict[str, str] = {}
+        self.term_counts: Dict[str, Counter] = {}
+        self.source_hash: Optional[str] = None
+        self._matrix: Optional[sparse.csc_matrix] = None
+        self._vocabulary: Dict[str, int] = {}
+        self._row_ids: List[str] = []
+        self._idf: Optional[np.ndarray] = None
+
+    def update(self, chunks: Iterable[Chunk]) -> int:
+        """Replace the indexed chunks, re-tokenizing only new or changed ones.
+
+        Returns the number of chunks that were (re)tokenized.
+        """
+        chunks = list(chunks)
+        current = {chunk.id for chunk in chunks}
+        removed = [chunk_id for chunk_id in self.chunks if chunk_id not in current]
+        for chunk_id in removed:
+            del self.chunks[chunk_id], self.chunk_hashes[chunk_id], self.term_counts[chunk_id]
+
+        changed = 0
+        for chunk in chunks:
+            chunk_hash = content_hash(chunk.text)
+            if self.chunk_hashes.get(chunk.id) != chunk_hash:
+                self.term_counts[chunk.id] = Counter(tokenize(chunk.text))
+                self.chunk_hashes[chunk.id] = chunk_hash
+                changed += 1
+            self.chunks[chunk.id] = chunk
+
+        if changed or removed:
+            self._matrix = None
+        logger.info("bm25_index_updated", changed=changed, removed=len(removed), chunks=len(chunks))
+        return changed
+
+    def _build(self) -> None:
+        self._row_ids = list(self.chunks)
+        self._vocabulary = {}
+        rows, cols, values = [], [], []
+        for row, chunk_id in enumerate(self._row_ids):
+            for term, count in self.term_counts[chunk_id].items():
+                rows.append(row)
+                cols.append(self._vocabulary.setdefault(term, len(self._vocabulary)))
+                values.append(count)
+
+        tf = sparse.csr_matrix(
+            (np.array(values, dtype=np.float64), (rows, cols)),
+            shape=(len(self._row_ids), len(self._vocabulary))
+        )
+        lengths = np.asarray(tf.sum(axis=1)).ravel()
+        average = lengths.mean() if len(lengths) and lengths.mean() > 0 else 1.0
+
+        # Saturate term frequencies once so a search is a column slice and a sum
+        norms = self.k1 * (1 - self.b + self.b * lengths / average)
+        saturated = tf.tocoo()
+        saturated.data = saturated.data * (self.k1 + 1) / (saturated.data + norms[saturated.row])
+        self._matrix = saturated.tocsc()
+
+        document_frequency = np.diff(self._matrix.indptr)
+        count = len(self._row_ids)
+        self._idf = np.log(1 + (count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[Chunk, float]]:
+        """The ``k`` best-scoring chunks for the query, best first."""
+        if self._matrix is None:
+            self._build()
+        columns = [
+            self._vocabulary[term] for term in set(tokenize(query)) if term in self._vocabulary
+        ]
+        if not columns or not self._row_ids:
+            return []
+
+        scores = self._matrix[:, columns] @ self._idf[columns]
+        best = np.argsort(-scores, kind="stable")[:k]
+        return [
+            (self.chunks[self._row_ids[row]], float(scores[row]))
+            for row in best if scores[row] > 0
+        ]
+
+    def retrieve(
+        self,
+        query: str,
+        k: int = 8,
+        max_tokens: int = 1500,
+        exclude_scenes: Iterable[str] = ()
+    ) -> List[Chunk]:
+        """The best chunks for the query that together fit in ``max_tokens``.
+
+        Prose of the scenes in ``exclude_scenes`` is left out, for callers
+        that put those scenes in the prompt already.
+        """
+        excluded = set(exclude_scenes)
+        candidates = [
+            chunk for chunk, _ in self.search(query, len(self.chunks) if excluded else k)
+            if chunk_scene(chunk) not in excluded
+        ][:k]
+        selected, used = [], 0
+        for chunk in candidates:
+            tokens = estimate_tokens(chunk.text)
+            if used + tokens > max_tokens:
+                continue
+            selected.append(chunk)
+            used += tokens
+        return selected
+
+
+# Indexes of the most recently used projects, least recently used first
+MAX_PROJECT_INDEXES = int(os.getenv("BM25_MAX_PROJECTS", "32"))
+_project_indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+
+
+def project_index(state: Dict[str, Any]) -> BM25Index:
+    """The project's retrieval index, brought up to date with ``state``.
+
+    Indexes are kept for the ``MAX_PROJECT_INDEXES`` most recently used
+    projects. A state without a ``project_id`` gets an index of its own
+    that is not kept, as it cannot be told apart from other projects.
+    The state is only re-chunked when a field it is chunked from changed.
+    """
+    project_id = state.get("project_id")
+    if not project_id:
+        index = BM25Index()
+    else:
+        key = str(project_id)
+        index = _project_indexes.pop(key, None) or BM25Index()
+        _project_indexes[key] = index
+        while len(_project_indexes) > MAX_PROJECT_INDEXES:
+            evicted, _ = _project_indexes.popitem(last=False)
+            logger.debug("bm25_index_evicted", project_id=evicted)
+    source_hash = content_hash({field: state.get(field) for field in CHUNKED_FIELDS})
+    if index.source_hash != source_hash:
+        index.update(chunk_state(state))
+        index.source_hash = source_hash
+    return index
+
+
+def format_chunks(chunks: List[Chunk]) -> str:
+    return "\n\n".join(f"[{chunk.id}]\n{chunk.text}" for chunk in chunks)
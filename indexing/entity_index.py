@@ -0,0 +1,275 @@
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import structlog
+
+from utils import content_hash
+
+from .manuscript import Passage, manuscript_passages
+
+logger = structlog.get_logger(__name__)
+
+# world_building keys whose named entries are indexed, and the entity type they hold
+WORLD_ENTITY_KEYS = {
+    "locations": "location",
+    "elements": "object",
+    "objects": "object",
+    "items": "object",
+    "artifacts": "object",
+}
+
+
+class Mention(NamedTuple):
+    entity: str
+    chapter: str
+    scene: str
+    offset: int
+
+
+def _fold(char: str) -> str:
+    """Lower-case a character without changing its length."""
+    lowered = char.lower()
+    return lowered if len(lowered) == 1 else char
+
+
+class AhoCorasick:
+    """Multi-pattern matcher finding every pattern in one pass over the text.
+
+    Matching is case-insensitive and only whole words count, so "Ann" does not
+    match inside "Annual". Overlapping matches resolve to the longest one.
+    """
+
+    def __init__(self, patterns: Dict[str, str]):
+        # State 0 is the root; each state has its transitions, failure link and outputs
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.outputs: List[List[Tuple[int, str]]] = [[]]
+
+        for pattern, value in patterns.items():
+            self._add(pattern, value)
+        self._link()
+
+    def _add(self, pattern: str, value: str) -> None:
+        state = 0
+        for char in map(_fold, pattern):
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.outputs[state].append((len(pattern), value))
+
+    def _link(self) -> None:
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                if self.fail[child] == child:
+                    self.fail[child] = 0
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+
+    def find(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield ``(start, end, value)`` for each whole-word, non-overlapping match."""
+        matches = []
+        state = 0
+        for position, char in enumerate(map(_fold, text)):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for length, value in self.outputs[state]:
+                start, end = position - length + 1, position + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (
+                    end == len(text) or not text[end].isalnum()
+                ):
+                    matches.append((start, end, value))
+
+        last_end = 0
+        for start, end, value in sorted(matches, key=lambda match: (match[0], -match[1])):
+            if start >= last_end:
+                last_end = end
+                yield start, end, value
+
+
+def entities_from_state(state: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Named characters, locations and objects with their aliases."""
+    entities: Dict[str, Dict[str, Any]] = {}
+
+    def add(entry: Any, entity_type: str) -> None:
+        if isinstance(entry, str):
+            entry = {"name": entry}
+        if not isinstance(entry, dict) or not entry.get("name"):
+            return
+        aliases = [
+            alias for field in ("aliases", "nicknames")
+            for alias in entry.get(field, []) if isinstance(alias, str) and alias
+        ]
+        entities.setdefault(str(entry["name"]), {"type": entity_type, "aliases": []})[
+            "aliases"
+        ].extend(aliases)
+
+    for character in state.get("characters", []):
+        add(character, "character")
+
+    world = state.get("world_building", {})
+    location = world.get("setting", {}).get("location")
+    if location:
+        add(location, "location")
+    for key, entity_type in WORLD_ENTITY_KEYS.items():
+        for entry in world.get(key, []) if isinstance(world.get(key), list) else []:
+            add(entry, entity_type)
+
+    return entities
+
+
+class EntityIndex:
+    """Inverted index of where each named entity is mentioned in the manuscript.
+
+    Postings map entity -> scene -> character offsets. ``update`` only rescans
+    scenes whose text changed since the last update, so the index can be
+    refreshed after every scene is added.
+    """
+
+    def __init__(
+        self,
+        entities: Dict[str, Dict[str, Any]],
+        postings: Optional[Dict[str, Dict[str, List[int]]]] = None,
+        scene_chapters: Optional[Dict[str, str]] = None,
+        scene_hashes: Optional[Dict[str, str]] = None
+    ):
+        self.entities = entities
+        self.postings = postings or {}
+        self.scene_chapters = scene_chapters or {}
+        self.scene_hashes = scene_hashes or {}
+        self.texts: Dict[str, str] = {}
+        self.matcher = AhoCorasick({
+            pattern: name
+            for name, entity in entities.items()
+            for pattern in [name, *entity.get("aliases", [])]
+        })
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], entities: Dict[str, Dict[str, Any]]) -> "EntityIndex":
+        """Restore an index, starting over if the set of entities has changed."""
+        data = data or {}
+        if data.get("entities_hash") != content_hash(entities):
+            return cls(entities)
+        return cls(
+            entities,
+            postings=data.get("postings"),
+            scene_chapters=data.get("scene_chapters"),
+            scene_hashes=data.get("scene_hashes")
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "entities_hash": content_hash(self.entities),
+            "postings": self.postings,
+            "scene_chapters": self.scene_chapters,
+            "scene_hashes": self.scene_hashes
+        }
+
+    def update(self, passages: Iterable[Passage]) -> List[str]:
+        """Index new or changed passages and drop scenes no longer present.
+
+        Returns the ids of the scenes that were rescanned.
+        """
+        passages = list(passages)
+        current = {passage.scene for passage in passages}
+        for scene in [scene for scene in self.scene_hashes if scene not in current]:
+            self.remove_scene(scene)
+
+        rescanned = []
+        for passage in passages:
+            self.texts[passage.scene] = passage.text
+            text_hash = content_hash(passage.text)
+            if self.scene_hashes.get(passage.scene) == text_hash:
+                self.scene_chapters[passage.scene] = passage.chapter
+                continue
+
+            self.remove_scene(passage.scene)
+            for start, _, entity in self.matcher.find(passage.text):
+                self.postings.setdefault(entity, {}).setdefault(passage.scene, []).append(start)
+            self.scene_chapters[passage.scene] = passage.chapter
+            self.scene_hashes[passage.scene] = text_hash
+            rescanned.append(passage.scene)
+
+        # Keep scenes in story order for co-occurrence results
+        self.scene_hashes = {passage.scene: self.scene_hashes[passage.scene] for passage in passages}
+        logger.info("entity_index_updated", rescanned=len(rescanned), scenes=len(passages))
+        return rescanned
+
+    def remove_scene(self, scene: str) -> None:
+        for entity in list(self.postings):
+            self.postings[entity].pop(scene, None)
+            if not self.postings[entity]:
+                del self.postings[entity]
+        self.scene_chapters.pop(scene, None)
+        self.scene_hashes.pop(scene, None)
+
+    def mentions(self, entity: str) -> List[Mention]:
+        """Every mention of an entity, by its canonical name, in story order."""
+        postings = self.postings.get(entity, {})
+        return [
+            Mention(entity, self.scene_chapters.get(scene, ""), scene, offset)
+            for scene in self.scene_hashes if scene in postings
+            for offset in postings[scene]
+        ]
+
+    def scenes_with(self, *entities: str) -> List[str]:
+        """Scenes in which all the given entities co-occur, in story order."""
+        if not entities:
+            return []
+        scenes = set(self.postings.get(entities[0], {}))
+        for entity in entities[1:]:
+            scenes &= set(self.postings.get(entity, {}))
+        return [scene for scene in self.scene_hashes if scene in scenes]
+
+    def entities_in(self, scenes: Iterable[str]) -> List[str]:
+        """Entities mentioned in any of the given scenes."""
+        scenes = set(scenes)
+        return [
+            entity for entity, entity_scenes in self.postings.items()
+            if scenes & set(entity_scenes)
+        ]
+
+    def passages(self, *entities: str, radius: int = 400) -> List[Dict[str, Any]]:
+        """Excerpts around the mentions of the given entities, one per co-occurring scene.
+
+        Only available for scenes passed to ``update`` in this process.
+        """
+        excerpts = []
+        for scene in self.scenes_with(*entities):
+            text = self.texts.get(scene)
+            if text is None:
+                continue
+            offsets = [
+                offset for entity in entities for offset in self.postings[entity][scene]
+            ]
+            start, end = max(0, min(offsets) - radius), min(len(text), max(offsets) + radius)
+            excerpts.append({
+                "chapter": self.scene_chapters.get(scene, ""),
+                "scene": scene,
+                "text": text[start:end]
+            })
+        return excerpts
+
+
+def sync_entity_index(
+    state: Dict[str, Any],
+    passages: Optional[Iterable[Passage]] = None,
+    key: str = "entity_index"
+) -> EntityIndex:
+    """Bring the entity index stored in ``state[key]`` up to date.
+
+    Indexes the manuscript unless other passages are given.
+    """
+    index = EntityIndex.from_dict(state.get(key), entities_from_state(state))
+    index.update(manuscript_passages(state) if passages is None else passages)
+    state[key] = index.to_dict()
+    return index
@@ -0,0 +1,193 @@
+import json
+import re
+from collections import Counter
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from utils import content_hash
+
+CHAPTER_HEADING = re.compile(r"^\s*(?:chapter|CHAPTER|Chapter)\b.*$", re.MULTILINE)
+SCENE_BREAK = re.compile(r"^\s*(?:\*\s*){3,}$|^\s*#\s*$", re.MULTILINE)
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+PROSE_FIELDS = ("text", "content", "prose")
+
+
+class Passage(NamedTuple):
+    """One scene of the manuscript, the unit every index is built over."""
+
+    chapter: str
+    scene: str
+    text: str
+    act: str = ""
+
+
+class Paragraph(NamedTuple):
+    """One paragraph of prose, addressed by an id derived from its content."""
+
+    id: str
+    scene: str
+    text: str
+
+
+def prose_field(scene: Dict[str, Any]) -> Optional[str]:
+    """The field holding a scene's prose, if it has been written."""
+    return next((field for field in PROSE_FIELDS if isinstance(scene.get(field), str)), None)
+
+
+def scene_text(scene: Dict[str, Any]) -> str:
+    """The prose of a scene, or its composed outline when no prose exists yet."""
+    field = prose_field(scene)
+    return scene[field] if field else json.dumps(scene, default=str, ensure_ascii=False)
+
+
+def scene_passages(scenes: List[Dict[str, Any]]) -> List[Passage]:
+    """Composed scenes as passages, grouped into chapters by their act."""
+    return [
+        Passage(
+            str(scene.get("act", "")),
+            str(scene.get("id", f"s{number}")),
+            scene_text(scene),
+            str(scene.get("act", ""))
+        )
+        for number, scene in enumerate(scenes, 1)
+    ]
+
+
+def _split_text(text: str) -> List[Passage]:
+    """Split a plain-text manuscript on chapter headings and scene breaks."""
+    starts = [match.start() for match in CHAPTER_HEADING.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+
+    passages = []
+    for chapter_number, (start, end) in enumerate(zip(starts, starts[1:] + [len(text)]), 1):
+        scenes = [scene for scene in SCENE_BREAK.split(text[start:end]) if scene.strip()]
+        for scene_number, scene in enumerate(scenes, 1):
+            passages.append(Passage(
+                f"ch{chapter_number}", f"ch{chapter_number}_s{scene_number}", scene
+            ))
+    return passages
+
+
+def _structured_scenes(manuscript: Dict[str, Any]) -> Iterator[Tuple[str, str, str, Dict[str, Any]]]:
+    """(chapter id, scene id, act, scene) for each scene of a structured manuscript."""
+    for chapter_number, chapter in enumerate(manuscript["chapters"], 1):
+        chapter_id = str(chapter.get("id", f"ch{chapter_number}"))
+        for scene_number, scene in enumerate(chapter.get("scenes", []), 1):
+            yield (
+                chapter_id,
+                str(scene.get("id", f"{chapter_id}_s{scene_number}")),
+                str(chapter.get("act", "")),
+                scene
+            )
+
+
+def manuscript_passages(state: Dict[str, Any]) -> List[Passage]:
+    """The manuscript in story order as (chapter, scene, text) passages.
+
+    Accepts a structured manuscript (``{"chapters": [{"id", "scenes": [...]}]}``),
+    a plain-text manuscript, or, before any prose is drafted, the composed
+    ``scenes`` grouped by their act.
+    """
+    manuscript: Optional[Any] = state.get("manuscript")
+
+    if isinstance(manuscript, dict) and manuscript.get("chapters"):
+        return [
+            Passage(chapter_id, scene_id, scene_text(scene), act)
+            for chapter_id, scene_id, act, scene in _structured_scenes(manuscript)
+        ]
+
+    if isinstance(manuscript, str) and manuscript.strip():
+        return _split_text(manuscript)
+
+    return scene_passages(state.get("scenes", []))
+
+
+def scene_chapters(passages: List[Passage]) -> Dict[str, str]:
+    """The chapter each scene belongs to."""
+    return {passage.scene: passage.chapter for passage in passages}
+
+
+def chapter_text(passages: List[Passage], chapter: str) -> str:
+    """The full text of one chapter."""
+    return "\n\n".join(passage.text for passage in passages if passage.chapter == chapter)
+
+
+def split_paragraphs(passage: Passage) -> List[Paragraph]:
+    """Split a scene into paragraphs with ids stable under edits elsewhere.
+
+    Ids are the scene id plus a short hash of the paragraph, so an id stops
+    existing as soon as its paragraph is changed.
+    """
+    seen: Counter = Counter()
+    paragraphs = []
+    for text in PARAGRAPH_BREAK.split(passage.text):
+        text = text.strip()
+        if not text:
+            continue
+        digest = content_hash(text)[:8]
+        paragraph_id = f"{passage.scene}.{digest}"
+        if seen[digest]:
+            paragraph_id = f"{paragraph_id}-{seen[digest]}"
+        seen[digest] += 1
+        paragraphs.append(Paragraph(paragraph_id, passage.scene, text))
+    return paragraphs
+
+
+def _prose_passages(state: Dict[str, Any]) -> List[Passage]:
+    """Passages holding written prose, leaving out scene outlines."""
+    manuscript = state.get("manuscript")
+    if (isinstance(manuscript, dict) and manuscript.get("chapters")) or (
+        isinstance(manuscript, str) and manuscript.strip()
+    ):
+        return manuscript_passages(state)
+    return [
+        passage for passage, scene in zip(
+            scene_passages(state.get("scenes", [])), state.get("scenes", [])
+        )
+        if prose_field(scene)
+    ]
+
+
+def manuscript_paragraphs(state: Dict[str, Any], chapter: Optional[str] = None) -> List[Paragraph]:
+    """The manuscript's prose as id-addressed paragraphs, optionally for one chapter."""
+    return [
+        paragraph
+        for passage in _prose_passages(state)
+        if chapter is None or passage.chapter == chapter
+        for paragraph in split_paragraphs(passage)
+    ]
+
+
+def annotate_paragraphs(paragraphs: List[Paragraph]) -> str:
+    """Render paragraphs tagged with their ids for edit-producing prompts."""
+    return "\n\n".join(f"[{paragraph.id}] {paragraph.text}" for paragraph in paragraphs)
+
+
+def write_scene_texts(state: Dict[str, Any], texts: Dict[str, str]) -> None:
+    """Store new prose for the given scenes back into the manuscript in ``state``.
+
+    Keeps the manuscript in the form it was in: structured chapters, plain
+    text, or prose on the composed scenes.
+    """
+    manuscript = state.get("manuscript")
+
+    if isinstance(manuscript, dict) and manuscript.get("chapters"):
+        for _, scene_id, _, scene in _structured_scenes(manuscript):
+            if scene_id in texts:
+                scene[prose_field(scene) or "text"] = texts[scene_id]
+
+    elif isinstance(manuscript, str) and manuscript.strip():
+        chapters: Dict[str, List[str]] = {}
+        for passage in _split_text(manuscript):
+            chapters.setdefault(passage.chapter, []).append(
+                texts.get(passage.scene, passage.text).strip()
+            )
+        state["manuscript"] = "\n\n".join(
+            "\n\n* * *\n\n".join(scene for scene in scenes if scene)
+            for scenes in chapters.values()
+        )
+
+    else:
+        for passage, scene in zip(scene_passages(state.get("scenes", [])), state.get("scenes", [])):
+            if passage.scene in texts and prose_field(scene):
+                scene[prose_field(scene)] = texts[passage.scene]
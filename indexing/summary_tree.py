@@ -0,0 +1,162 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import structlog
+
+from utils import content_hash, estimate_tokens
+
+from .manuscript import Passage, chapter_text, manuscript_passages
+
+logger = structlog.get_logger(__name__)
+
+# (level, node id, child summaries or scene text) -> summary
+Summarize = Callable[[str, str, List[str]], Awaitable[str]]
+
+
+class SummaryTree:
+    """Rolling summaries of the manuscript: scene -> chapter -> act -> book.
+
+    Each node records a hash of what it was summarized from (the scene text,
+    or its children's hashes), so ``refresh`` regenerates only the nodes
+    under which something changed. Scenes short enough to read in full are
+    kept verbatim instead of summarized.
+    """
+
+    def __init__(self, nodes: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.nodes = nodes or {}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "SummaryTree":
+        return cls((data or {}).get("nodes"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"nodes": self.nodes}
+
+    @staticmethod
+    def _structure(passages: List[Passage]) -> List[Tuple[str, str, List[str], Optional[str]]]:
+        """Desired nodes bottom-up as (level, node id, children, scene text)."""
+        chapters: Dict[str, List[str]] = {}
+        acts: Dict[str, List[str]] = {}
+        nodes = []
+        for passage in passages:
+            node_id = f"scene:{passage.scene}"
+            nodes.append(("scene", node_id, [], passage.text))
+            chapters.setdefault(passage.chapter, []).append(node_id)
+            if passage.chapter not in acts.setdefault(passage.act, []):
+                acts[passage.act].append(passage.chapter)
+
+        for chapter, scenes in chapters.items():
+            nodes.append(("chapter", f"chapter:{chapter}", scenes, None))
+
+        # A book without acts rolls chapters straight up into the book summary
+        if len(acts) > 1:
+            for act, act_chapters in acts.items():
+                nodes.append((
+                    "act", f"act:{act}", [f"chapter:{chapter}" for chapter in act_chapters], None
+                ))
+            book_children = [f"act:{act}" for act in acts]
+        else:
+            book_children = [f"chapter:{chapter}" for chapter in chapters]
+        if book_children:
+            nodes.append(("book", "book", book_children, None))
+        return nodes
+
+    async def refresh(
+        self,
+        passages: List[Passage],
+        summarize: Summarize,
+        gather: Callable[[List[Awaitable[Any]]], Awaitable[List[Any]]],
+        verbatim_tokens: int = 150
+    ) -> List[str]:
+        """Bring the summaries up to date with the manuscript.
+
+        Nodes of one level are summarized together through ``gather`` before
+        moving up a level. Returns the ids of the regenerated nodes.
+        """
+        structure = self._structure(passages)
+        wanted = {node_id for _, node_id, _, _ in structure}
+        for node_id in [node_id for node_id in self.nodes if node_id not in wanted]:
+            del self.nodes[node_id]
+
+        regenerated = []
+        for level in ("scene", "chapter", "act", "book"):
+            stale = []
+            for node_level, node_id, children, text in structure:
+                if node_level != level:
+                    continue
+                node_hash = content_hash(
+                    text if text is not None else [self.nodes[child]["hash"] for child in children]
+                )
+                if self.nodes.get(node_id, {}).get("hash") == node_hash:
+                    continue
+                if text is not None and estimate_tokens(text) <= verbatim_tokens:
+                    self.nodes[node_id] = {
+                        "level": level, "children": [], "hash": node_hash, "summary": text
+                    }
+                    continue
+                parts = [text] if text is not None else [
+                    self.nodes[child]["summary"] for child in children
+                ]
+                stale.append((node_id, children, node_hash, parts))
+
+            summaries = await gather([
+                summarize(level, node_id, parts) for node_id, _, _, parts in stale
+            ])
+            for (node_id, children, node_hash, _), summary in zip(stale, summaries):
+                self.nodes[node_id] = {
+                    "level": level, "children": children, "hash": node_hash, "summary": summary
+                }
+                regenerated.append(node_id)
+
+        logger.info("summary_tree_refreshed", regenerated=len(regenerated), nodes=len(self.nodes))
+        return regenerated
+
+    def summary(self, node_id: str) -> Optional[str]:
+        return self.nodes.get(node_id, {}).get("summary")
+
+    def context_for_chapter(
+        self,
+        passages: List[Passage],
+        chapter: str,
+        previous_chapters: int = 1,
+        chapter_body: Optional[str] = None,
+        include_chapter: bool = True
+    ) -> str:
+        """Book summary, act and preceding chapter summaries, and the chapter in full.
+
+        Keeps per-call context roughly constant however long the manuscript
+        grows. ``chapter_body`` replaces the chapter's plain text, e.g. with
+        its id-tagged paragraphs; without ``include_chapter`` only the
+        summaries are given.
+        """
+        chapters = list(dict.fromkeys(passage.chapter for passage in passages))
+        if chapter not in chapters:
+            raise KeyError(f"Unknown chapter: {chapter}")
+        act = next(passage.act for passage in passages if passage.chapter == chapter)
+        preceding = chapters[max(0, chapters.index(chapter) - previous_chapters):chapters.index(chapter)]
+
+        sections = [("Book Summary", self.summary("book"))]
+        sections.append((f"Act Summary ({act})", self.summary(f"act:{act}")))
+        sections.extend(
+            (f"Previous Chapter Summary ({name})", self.summary(f"chapter:{name}"))
+            for name in preceding
+        )
+        if include_chapter:
+            sections.append((f"Chapter {chapter}", chapter_body or chapter_text(passages, chapter)))
+        return "\n\n".join(f"{title}:\n{body}" for title, body in sections if body)
+
+
+def summary_context(state: Dict[str, Any], chapter: Optional[str] = None) -> str:
+    """The summaries framing work on part of ``chapter``, without its text.
+
+    Agents mapped over manuscript chunks get the book, act and previous
+    chapter summaries with each chunk. Without a known chapter only the
+    book summary is given, and without a summary tree nothing.
+    """
+    tree = SummaryTree.from_dict(state.get("summary_tree"))
+    if not tree.nodes:
+        return ""
+    try:
+        return tree.context_for_chapter(manuscript_passages(state), chapter, include_chapter=False)
+    except KeyError:
+        book = tree.summary("book")
+        return f"Book Summary:\n{book}" if book else ""
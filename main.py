@@ -1,5 +1,6 @@
 import json
 import logging
+import os
 import uuid
 from typing import Any, Dict, List, Optional
 
@@ -8,10 +9,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field, ValidationError
 
 from agents import AgentFactory
+from agents.factory import prewarm_agents
 from mongodb import MongoDBManager
+from prompt_registry import get_prompt_registry
 from state import NovelSystemState, ProjectState
 from utils import current_timestamp, generate_id
 from workflows import get_phase_workflow, create_initialization_graph, create_development_graph
+from workflows.manager import WorkflowManager
 from .middleware.auth import AuthMiddleware
 from middleware.rate_limit import RateLimitMiddleware
 from config import settings
@@ -27,6 +31,11 @@ graph_app = LangGraphAPI()
 async def startup_event():
     try:
         logger.info("application_starting")
+        # Compile and validate every prompt template before serving requests
+        get_prompt_registry().load()
+        # Create the shared agents now rather than on the first story request;
+        # PREWARM_AGENTS is "all" (default), "none" or a comma-separated list
+        prewarm_agents(os.getenv("PREWARM_AGENTS", "all"))
         # Initialize LangGraph with explicit configuration
         config: Dict[str, Any] = {
             "initialization": {
@@ -89,6 +98,25 @@ class FeedbackRequest(BaseModel):
     content: str
     type: str = "general"
     quality_scores: Optional[Dict[str, int]] = None
+    # Characters, places, chapters or scenes the feedback is about, by name or id
+    targets: Optional[Dict[str, List[str]]] = None
+    # Re-run the affected agents and scenes in the background
+    recompute: bool = False
+
+
+def _feedback_item(request: FeedbackRequest) -> Dict[str, Any]:
+    return {
+        "content": request.content,
+        "type": request.type,
+        "targets": request.targets,
+    }
+
+
+async def _recompute_from_feedback(
+    project_id: str, project: Dict[str, Any], feedback: Dict[str, Any], plan: Dict[str, Any]
+) -> None:
+    state = await workflow_manager.apply_feedback(project, feedback, plan)
+    mongo_manager.save_state(project_id, dict(state))
 
 
 @app.post("/projects", response_model=Dict)
@@ -114,7 +142,7 @@ async def create_project(request: ProjectRequest) -> Dict:
         )
 
         # Save to MongoDB
-        mongo_manager.save_state(project_id, project_state.dict())
+        mongo_manager.save_state(project_id, project_state.model_dump(mode="json"))
 
         logger.info(f"Project created with ID: {project_id}")
 
@@ -178,18 +206,52 @@ async def run_task(
 
 
 @app.post("/projects/{project_id}/feedback", response_model=Dict)
-async def add_feedback(project_id: str, request: FeedbackRequest) -> Dict:
-    """Add human feedback to a project."""
+async def add_feedback(
+    project_id: str, request: FeedbackRequest, background_tasks: BackgroundTasks
+) -> Dict:
+    """Add human feedback to a project.
+
+    With ``recompute`` set, only the agents and scenes the feedback affects
+    are re-run, in the background.
+    """
     try:
         feedback = {
             "project_id": project_id,
             "content": request.content,
             "type": request.type,
             "quality_scores": request.quality_scores,
+            "targets": request.targets,
             "timestamp": current_timestamp(),
         }
         mongo_manager.save_feedback(feedback)
-        return {"status": "feedback_added", "feedback_id": str(feedback.get("_id"))}
+        response = {"status": "feedback_added", "feedback_id": str(feedback.get("_id"))}
+
+        if request.recompute:
+            project = mongo_manager.load_state(project_id)
+            if not project:
+                raise HTTPException(status_code=404, detail="Project not found")
+            item = _feedback_item(request)
+            plan = workflow_manager.plan_feedback(project, item)
+            background_tasks.add_task(_recompute_from_feedback, project_id, project, item, plan)
+            response.update({"status": "recomputing", "plan": plan})
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/projects/{project_id}/feedback/plan", response_model=Dict)
+async def plan_feedback(project_id: str, request: FeedbackRequest) -> Dict:
+    """Dry run: the agents and scenes a feedback item would recompute, and the estimated token cost."""
+    try:
+        project = mongo_manager.load_state(project_id)
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+        plan = workflow_manager.plan_feedback(dict(project), _feedback_item(request))
+        return {"project_id": project_id, "dry_run": True, **plan}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -258,8 +320,8 @@ async def execute_graph(graph_name: str, input_data: dict):
     result = await graph.ainvoke(input_data)
     return result
 
-# Initialize workflow manager
-workflow_manager = WorkflowManager(AgentFactory())
+# Initialize workflow manager; its agents come from the shared registry
+workflow_manager = WorkflowManager()
 
 @app.post("/story/create")
 async def create_story(request: dict):
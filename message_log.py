@@ -0,0 +1,215 @@
+import asyncio
+import fcntl
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# Message ids kept in the state; older messages are only in the log
+MESSAGE_WINDOW = int(os.getenv("MESSAGE_WINDOW", "20"))
+
+# Project ids become directory names of the segment log
+PROJECT_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]*")
+
+
+def keep_recent(current: Optional[List[str]], new: Optional[List[str]]) -> List[str]:
+    """Reducer for the ring buffer of message ids: the last ``MESSAGE_WINDOW`` ids."""
+    ids = list(current or []) + list(new or [])
+    return ids[-MESSAGE_WINDOW:]
+
+
+class MessageLog(ABC):
+    """Append-only log of agent messages, per project.
+
+    Messages are written once and never rewritten, so the state only needs
+    to carry the ids of the latest few. Reads are synchronous, like the
+    artifact store, so agent functions can load history on demand.
+    """
+
+    @abstractmethod
+    def append(self, project_id: str, message: Dict[str, Any]) -> str:
+        """Store a message and return its id."""
+
+    @abstractmethod
+    def get(self, project_id: str, ids: List[str]) -> List[Dict[str, Any]]:
+        """The messages with the given ids, in the order of ``ids``."""
+
+    @abstractmethod
+    def history(self, project_id: str) -> Iterator[Dict[str, Any]]:
+        """Every message of a project, oldest first."""
+
+
+class SegmentMessageLog(MessageLog):
+    """Messages as JSON lines in fixed-size segment files under ``root/<project>``.
+
+    A message id is its position in the project's log, so a message is
+    found by reading a single segment. Appends hold an exclusive lock on
+    the project's directory and find the next position on disk, so several
+    workers can share one log.
+    """
+
+    def __init__(self, root: str = ".messages", segment_size: int = 1000):
+        self.root = root
+        self.segment_size = segment_size
+
+    def _directory(self, project_id: str) -> str:
+        if not PROJECT_ID_PATTERN.fullmatch(project_id):
+            raise ValueError(f"Invalid project id for the message log: {project_id!r}")
+        return os.path.join(self.root, project_id)
+
+    def _path(self, project_id: str, segment: int) -> str:
+        return os.path.join(self._directory(project_id), f"{segment:08d}.jsonl")
+
+    def _read_segment(self, project_id: str, segment: int) -> List[Dict[str, Any]]:
+        try:
+            with open(self._path(project_id, segment), encoding="utf-8") as lines:
+                return [json.loads(line) for line in lines if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _segments(self, project_id: str) -> List[int]:
+        try:
+            names = os.listdir(self._directory(project_id))
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-6]) for name in names if name.endswith(".jsonl"))
+
+    def _next_position(self, project_id: str) -> int:
+        """The position after the last message on disk; call with the project locked."""
+        segments = self._segments(project_id)
+        last = segments[-1] if segments else 0
+        try:
+            with open(self._path(project_id, last), "rb") as segment:
+                count = segment.read().count(b"\n")
+        except FileNotFoundError:
+            count = 0
+        return last * self.segment_size + count
+
+    def append(self, project_id: str, message: Dict[str, Any]) -> str:
+        directory = self._directory(project_id)
+        os.makedirs(directory, exist_ok=True)
+        lock = os.open(directory, os.O_RDONLY)
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            position = self._next_position(project_id)
+            path = self._path(project_id, position // self.segment_size)
+            with open(path, "a", encoding="utf-8") as segment:
+                segment.write(json.dumps(message, default=str, ensure_ascii=False) + "\n")
+        finally:
+            # Closing the descriptor releases the lock
+            os.close(lock)
+        return str(position)
+
+    def get(self, project_id: str, ids: List[str]) -> List[Dict[str, Any]]:
+        segments: Dict[int, List[Dict[str, Any]]] = {}
+        messages = []
+        for message_id in ids:
+            segment, offset = divmod(int(message_id), self.segment_size)
+            if segment not in segments:
+                segments[segment] = self._read_segment(project_id, segment)
+            if offset < len(segments[segment]):
+                messages.append(segments[segment][offset])
+        return messages
+
+    def history(self, project_id: str) -> Iterator[Dict[str, Any]]:
+        for segment in self._segments(project_id):
+            yield from self._read_segment(project_id, segment)
+
+
+class MongoMessageLog(MessageLog):
+    """Messages as documents in a (synchronous) pymongo collection."""
+
+    def __init__(self, collection: Any):
+        self.collection = collection
+
+    def append(self, project_id: str, message: Dict[str, Any]) -> str:
+        result = self.collection.insert_one({"project_id": project_id, "message": message})
+        return str(result.inserted_id)
+
+    def get(self, project_id: str, ids: List[str]) -> List[Dict[str, Any]]:
+        from bson import ObjectId
+
+        documents = {
+            str(document["_id"]): document["message"]
+            for document in self.collection.find(
+                {"project_id": project_id, "_id": {"$in": [ObjectId(message_id) for message_id in ids]}}
+            )
+        }
+        return [documents[message_id] for message_id in ids if message_id in documents]
+
+    def history(self, project_id: str) -> Iterator[Dict[str, Any]]:
+        for document in self.collection.find({"project_id": project_id}).sort("_id", 1):
+            yield document["message"]
+
+
+@lru_cache()
+def get_message_log() -> MessageLog:
+    """The process-wide message log.
+
+    ``MESSAGE_LOG_URL`` selects the backend: a ``mongodb://`` URL keeps
+    messages in the ``messages`` collection of the configured database;
+    anything else is a directory of segment files (default ``.messages``).
+    """
+    url = os.getenv("MESSAGE_LOG_URL", ".messages")
+    if url.startswith(("mongodb://", "mongodb+srv://")):
+        from pymongo import MongoClient
+
+        from config import get_settings
+
+        database = MongoClient(url)[get_settings().MONGODB_DB]
+        return MongoMessageLog(database["messages"])
+    return SegmentMessageLog(url.removeprefix("file://"))
+
+
+def _project_id(state: Dict[str, Any]) -> str:
+    project = state.get("project")
+    return str(state.get("project_id") or getattr(project, "project_id", None) or "default")
+
+
+def log_message(
+    state: Dict[str, Any], message: Dict[str, Any], log: Optional[MessageLog] = None
+) -> Dict[str, List[str]]:
+    """Append a message to the log and return the state delta recording its id."""
+    message_id = (log or get_message_log()).append(_project_id(state), message)
+    return {"message_ids": [message_id]}
+
+
+async def alog_message(
+    state: Dict[str, Any], message: Dict[str, Any], log: Optional[MessageLog] = None
+) -> Dict[str, List[str]]:
+    """``log_message`` without blocking the event loop; the append runs in a worker thread."""
+    return await asyncio.to_thread(log_message, state, message, log)
+
+
+class MessageHistory:
+    """Lazy access to a project's messages for agents that need them.
+
+    Nothing is read until asked for: ``recent()`` loads the messages whose
+    ids are in the state, ``arecent()`` does so from async code without
+    blocking the event loop, and iterating streams the whole log.
+    """
+
+    def __init__(self, log: MessageLog, project_id: str, ids: List[str]):
+        self.log = log
+        self.project_id = project_id
+        self.ids = ids
+
+    def recent(self) -> List[Dict[str, Any]]:
+        return self.log.get(self.project_id, self.ids)
+
+    async def arecent(self) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.recent)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.log.history(self.project_id)
+
+
+def message_history(state: Dict[str, Any], log: Optional[MessageLog] = None) -> MessageHistory:
+    """The message history of the project ``state`` belongs to."""
+    return MessageHistory(log or get_message_log(), _project_id(state), list(state.get("message_ids") or []))
@@ -14,6 +14,12 @@ agent_duration = Histogram(
     ['agent_type']
 )
 
+llm_calls_coalesced = Counter(
+    'llm_calls_coalesced_total',
+    'Number of LLM calls served by an identical in-flight request',
+    ['scope']
+)
+
 class MetricsCollector:
     @classmethod
     def track_phase(cls, phase_name: str, status: str):
@@ -21,4 +27,8 @@ class MetricsCollector:
 
     @classmethod
     def track_agent_duration(cls, agent_type: str, duration: float):
-        agent_duration.labels(agent_type=agent_type).observe(duration)
\ No newline at end of file
+        agent_duration.labels(agent_type=agent_type).observe(duration)
+
+    @classmethod
+    def track_coalesced_call(cls, scope: str):
+        llm_calls_coalesced.labels(scope=scope).inc()
\ No newline at end of file
@@ -0,0 +1,162 @@
+import hashlib
+import inspect
+import re
+import string
+from functools import lru_cache
+from typing import (TYPE_CHECKING, Callable, Dict, FrozenSet, Iterable, Mapping,
+                    NamedTuple, Optional)
+
+import structlog
+
+from utils import estimate_tokens
+
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
+
+logger = structlog.get_logger(__name__)
+
+# Variables the agent functions in agents.py fill in
+PROMPT_VARIABLES = frozenset({"project_state", "current_phase", "task", "input"})
+
+DEFAULT_PROMPT = "You are an AI assistant."
+
+
+class CompiledPrompt(NamedTuple):
+    """A prompt template compiled once and shared by every agent that uses it."""
+
+    name: str
+    text: str
+    template: "ChatPromptTemplate"
+    variables: FrozenSet[str]
+    # Estimated tokens of the static text, before variables are filled in
+    tokens: int
+    # Hash of the normalized text; changes whenever the prompt does
+    version: str
+
+
+def normalize_whitespace(text: str) -> str:
+    """Strip the indentation left by triple-quoted strings and redundant blank lines.
+
+    Relative indentation, such as that of JSON examples, is kept.
+    """
+    lines = [line.rstrip() for line in inspect.cleandoc(text).splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def template_variables(text: str) -> FrozenSet[str]:
+    """The ``{variables}`` used by a format-string template.
+
+    Raises:
+        ValueError: If the template has unbalanced braces.
+    """
+    return frozenset(
+        field for _, field, _, _ in string.Formatter().parse(text) if field is not None
+    )
+
+
+def compile_prompt(
+    name: str,
+    text: str,
+    variables: Optional[Iterable[str]] = PROMPT_VARIABLES,
+    literal: bool = False
+) -> CompiledPrompt:
+    """Normalize, validate and compile a system prompt followed by a ``{input}`` message.
+
+    A ``literal`` prompt is used verbatim, so the JSON examples in agent
+    prompts need no escaping; otherwise its ``{variables}`` must all be
+    among ``variables``.
+
+    Raises:
+        ValueError: If the template is malformed or uses unknown variables.
+    """
+    from langchain_core.messages import SystemMessage
+    from langchain_core.prompts import (ChatPromptTemplate,
+                                        HumanMessagePromptTemplate,
+                                        SystemMessagePromptTemplate)
+
+    text = normalize_whitespace(text)
+    if literal:
+        used: FrozenSet[str] = frozenset({"input"})
+        system = SystemMessage(content=text)
+    else:
+        try:
+            used = template_variables(text) | {"input"}
+        except ValueError as e:
+            raise ValueError(f"Malformed prompt template {name!r}: {e}") from e
+        unknown = used - set(variables or ())
+        if variables is not None and unknown:
+            raise ValueError(f"Prompt template {name!r} uses unknown variables: {sorted(unknown)}")
+        system = SystemMessagePromptTemplate.from_template(text)
+
+    template = ChatPromptTemplate.from_messages([
+        system, HumanMessagePromptTemplate.from_template("{input}")
+    ])
+    return CompiledPrompt(
+        name=name,
+        text=text,
+        template=template,
+        variables=used,
+        tokens=estimate_tokens(text),
+        version=hashlib.sha256(text.encode("utf-8")).hexdigest()[:16],
+    )
+
+
+def _agent_prompt_tables() -> Dict[str, str]:
+    """The named agent templates; the specialized prompts override the basic ones."""
+    from config import PROMPT_TEMPLATES
+    from prompts import AGENT_PROMPTS
+
+    return {**PROMPT_TEMPLATES, **AGENT_PROMPTS}
+
+
+class PromptRegistry:
+    """Compiled prompt templates, built once per process.
+
+    Named templates come from ``loader`` and are compiled together on the
+    first lookup, or at startup through ``load()``, so a malformed template
+    fails fast. Agent system prompts are compiled on first use through
+    ``literal()`` and shared by every instance of the agent.
+    """
+
+    def __init__(self, loader: Callable[[], Mapping[str, str]] = _agent_prompt_tables):
+        self.loader = loader
+        self._prompts: Optional[Dict[str, CompiledPrompt]] = None
+        self._literal: Dict[str, CompiledPrompt] = {}
+
+    def load(self) -> Dict[str, CompiledPrompt]:
+        if self._prompts is None:
+            prompts = {
+                name: compile_prompt(name, text)
+                for name, text in {"default": DEFAULT_PROMPT, **self.loader()}.items()
+            }
+            self._prompts = prompts
+            logger.info(
+                "prompt_registry_loaded",
+                prompt_count=len(prompts),
+                total_tokens=sum(prompt.tokens for prompt in prompts.values())
+            )
+        return self._prompts
+
+    def get(self, name: str) -> CompiledPrompt:
+        """The named template, or the default prompt for an unknown name."""
+        prompts = self.load()
+        return prompts.get(name) or prompts["default"]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.load()
+
+    def literal(self, text: str, name: Optional[str] = None) -> CompiledPrompt:
+        """A system prompt taken verbatim, compiled once per distinct text."""
+        prompt = self._literal.get(text)
+        if prompt is None:
+            prompt = self._literal[text] = compile_prompt(name or "literal", text, literal=True)
+        return prompt
+
+    def token_counts(self) -> Dict[str, int]:
+        return {name: prompt.tokens for name, prompt in self.load().items()}
+
+
+@lru_cache()
+def get_prompt_registry() -> PromptRegistry:
+    """The process-wide prompt registry."""
+    return PromptRegistry()
@@ -13,7 +13,7 @@ async def create_new_story(
     workflow_manager: WorkflowManager = Depends(get_workflow_manager)
 ) -> Dict[str, Any]:
     """Create a new story using the workflow manager."""
-    result = await workflow_manager.create_story(request.dict())
+    result = await workflow_manager.create_story(request.model_dump())
     
     if result["status"] != "success":
         raise HTTPException(
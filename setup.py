@@ -26,9 +26,13 @@ setup(
         "httpx>=0.26.0",
         "pydantic>=2.0.0",
         "python-dotenv>=1.0.0",
+        "redis>=5.0.0",  # Cross-process single-flight
         "structlog>=24.1.0",
         "tenacity>=8.2.0",  # Added for retries
         "asyncio>=3.4.3",  # Added for async support
+        # Retrieval
+        "numpy>=1.26.0",
+        "scipy>=1.11.0",
         # Testing
         "pytest>=8.0.0",
         "pytest-asyncio>=0.23.0",
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import json
+import os
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence
+
+import structlog
+
+from monitoring.metrics import MetricsCollector
+
+logger = structlog.get_logger(__name__)
+
+
+def request_key(messages: Sequence[Any], params: Dict[str, Any]) -> str:
+    """Build a stable key from a rendered prompt and the model parameters.
+
+    Args:
+        messages: Rendered chat messages (LangChain messages or plain strings).
+        params: Model parameters that influence the response.
+
+    Returns:
+        A hex digest identifying the request.
+    """
+    rendered = [
+        [getattr(message, "type", "text"), getattr(message, "content", message)]
+        for message in messages
+    ]
+    payload = json.dumps(
+        {"messages": rendered, "params": params},
+        sort_keys=True,
+        default=str,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into a single execution.
+
+    Within a process, callers sharing a key await the same in-flight call.
+    When a Redis URL is given, a lock and a result channel extend this to
+    every process sharing the Redis instance.
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        namespace: str = "singleflight",
+        lock_ttl: int = 600,
+        result_ttl: int = 60,
+    ):
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+        # Callers still waiting for each in-flight call
+        self._waiters: Dict[str, int] = {}
+        self.namespace = namespace
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.redis = None
+
+        if redis_url:
+            from redis import asyncio as aioredis
+
+            self.redis = aioredis.from_url(redis_url)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fn`` once for all concurrent callers sharing ``key``.
+
+        The call runs in its own task, which every caller awaits through
+        ``asyncio.shield``: a cancelled caller stops waiting without
+        cancelling the others, and the call is only cancelled once no
+        caller is left waiting for it.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            MetricsCollector.track_coalesced_call("process")
+            logger.debug("singleflight_coalesced", key=key, scope="process")
+        else:
+            task = asyncio.ensure_future(self._execute(key, fn))
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if self._inflight.get(key) is task:
+                self._waiters[key] -= 1
+                if not self._waiters[key] and not task.done():
+                    self._forget(key, task)
+                    task.cancel()
+
+    def _forget(self, key: str, task: "asyncio.Future[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            del self._waiters[key]
+        # Mark the exception as retrieved when nobody else was waiting
+        if task.done() and not task.cancelled():
+            task.exception()
+
+    async def _execute(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if self.redis is None:
+            return await fn()
+
+        lock_key = f"{self.namespace}:lock:{key}"
+        try:
+            acquired = await self.redis.set(lock_key, "1", nx=True, ex=self.lock_ttl)
+        except Exception as e:
+            logger.error("singleflight_error", operation="lock", error=str(e))
+            return await fn()
+
+        if acquired:
+            return await self._lead(key, lock_key, fn)
+        return await self._follow(key, fn)
+
+    async def _lead(
+        self, key: str, lock_key: str, fn: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Execute the call and publish its outcome to the other processes."""
+        outcome: Dict[str, Any] = {"ok": False}
+        try:
+            result = await fn()
+            outcome = {"ok": True, "result": result}
+            return result
+        finally:
+            await self._publish(key, outcome)
+            try:
+                await self.redis.delete(lock_key)
+            except Exception as e:
+                logger.error("singleflight_error", operation="unlock", error=str(e))
+
+    async def _follow(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Wait for the process holding the lock and reuse its result."""
+        result_key = f"{self.namespace}:result:{key}"
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.subscribe(result_key)
+            # The leader may have finished between the lock attempt and subscribing.
+            payload = await self.redis.get(result_key)
+            if payload is None:
+                payload = await asyncio.wait_for(
+                    self._next_message(pubsub), timeout=self.lock_ttl
+                )
+            outcome = json.loads(payload)
+        except Exception as e:
+            logger.warning("singleflight_follow_failed", key=key, error=str(e))
+            outcome = {"ok": False}
+        finally:
+            try:
+                await pubsub.unsubscribe(result_key)
+                await pubsub.close()
+            except Exception:
+                pass
+
+        if not outcome.get("ok"):
+            return await fn()
+
+        MetricsCollector.track_coalesced_call("redis")
+        logger.debug("singleflight_coalesced", key=key, scope="redis")
+        return outcome["result"]
+
+    @staticmethod
+    async def _next_message(pubsub: Any) -> Any:
+        async for message in pubsub.listen():
+            if message.get("type") == "message":
+                return message["data"]
+
+    async def _publish(self, key: str, outcome: Dict[str, Any]) -> None:
+        result_key = f"{self.namespace}:result:{key}"
+        try:
+            payload = json.dumps(outcome, default=str)
+            await self.redis.set(result_key, payload, ex=self.result_ttl)
+            await self.redis.publish(result_key, payload)
+        except Exception as e:
+            logger.error("singleflight_error", operation="publish", error=str(e))
+
+
+@lru_cache()
+def get_single_flight() -> SingleFlight:
+    """Get the process-wide single-flight group.
+
+    Cross-process coalescing is enabled when ``SINGLEFLIGHT_REDIS_URL`` is set.
+    """
+    return SingleFlight(redis_url=os.getenv("SINGLEFLIGHT_REDIS_URL"))
@@ -1,10 +1,71 @@
+import operator
+from collections import ChainMap
 from datetime import datetime
-from typing import Dict, List, Optional, TypedDict, Union
-
-from pydantic import BaseModel, Field
-
-
-class TeamState(BaseModel):
+from functools import lru_cache
+from typing import (Annotated, Any, Callable, Dict, List, MutableMapping,
+                    Optional, Tuple, TypedDict, Union, get_args, get_origin,
+                    get_type_hints)
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from message_log import keep_recent
+
+
+class SerializedState(BaseModel):
+    """A state model whose compact JSON is memoized until it changes.
+
+    Assigning a field of the state, or of any state nested in it, invalidates
+    the cached JSON. Lists and dicts changed in place need ``touch()``.
+    """
+
+    _version: int = PrivateAttr(0)
+    _json: Optional[Tuple[Tuple, str]] = PrivateAttr(None)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if not name.startswith("_"):
+            self._version += 1
+
+    def touch(self) -> None:
+        """Mark the state as changed after mutating one of its fields in place."""
+        self._version += 1
+
+    def _versions(self) -> Tuple:
+        # Fields and private attributes are read from their dicts, skipping
+        # pydantic's slower attribute lookup; this runs on every to_json()
+        versions: List[Any] = [self.__pydantic_private__["_version"]]
+        for name, is_mapping in _nested_state_fields(type(self)):
+            value = self.__dict__[name]
+            for state in (value.values() if is_mapping else (value,)):
+                versions.append(id(state))
+                versions.append(state._versions())
+        return tuple(versions)
+
+    def to_json(self) -> str:
+        """Compact JSON of the state for prompts and storage, reused until the state changes."""
+        versions = self._versions()
+        cached = self.__pydantic_private__["_json"]
+        if cached is None or cached[0] != versions:
+            cached = self._json = (versions, self.model_dump_json())
+        return cached[1]
+
+
+@lru_cache()
+def _nested_state_fields(model: type) -> Tuple[Tuple[str, bool], ...]:
+    """Fields holding a nested state, and whether they map names to states."""
+    fields = []
+    for name, field in model.model_fields.items():
+        annotation = field.annotation
+        if isinstance(annotation, type) and issubclass(annotation, SerializedState):
+            fields.append((name, False))
+        elif get_origin(annotation) is dict and len(get_args(annotation)) == 2:
+            value_type = get_args(annotation)[1]
+            if isinstance(value_type, type) and issubclass(value_type, SerializedState):
+                fields.append((name, True))
+    return tuple(fields)
+
+
+class TeamState(SerializedState):
     """State for a specific team."""
 
     tasks_pending: List[Dict] = Field(default_factory=list)
@@ -13,7 +74,7 @@ class TeamState(BaseModel):
     quality_metrics: Dict = Field(default_factory=dict)
 
 
-class DirectorState(BaseModel):
+class DirectorState(SerializedState):
     """State for a director-level agent."""
 
     teams: Dict[str, TeamState] = Field(default_factory=dict)
@@ -22,7 +83,7 @@ class DirectorState(BaseModel):
     quality_metrics: Dict = Field(default_factory=dict)
 
 
-class ProjectState(BaseModel):
+class ProjectState(SerializedState):
     """Global state for the entire project."""
 
     # Basic project information
@@ -59,6 +120,7 @@ class ProjectState(BaseModel):
             {"phase": self.current_phase, "timestamp": str(datetime.now())}
         )
         self.current_phase = new_phase
+        self.touch()
 
     def get_team_state(self, director: str, team: str) -> TeamState:
         """Get the state for a specific team under a director."""
@@ -69,14 +131,85 @@ class ProjectState(BaseModel):
         """Set the state for a specific team under a director."""
         director_state = getattr(self, director)
         director_state.teams[team] = state
-
-
-# Define the state record that gets passed between agents
+        director_state.touch()
+
+
+def append_scenes(current: Optional[List[Dict]], new: Optional[List[Dict]]) -> List[Dict]:
+    """Append new scenes; a scene whose id is already present replaces it in place."""
+    scenes = list(current or [])
+    positions = {
+        scene.get("id"): position for position, scene in enumerate(scenes)
+        if isinstance(scene, dict) and scene.get("id") is not None
+    }
+    for scene in new or []:
+        scene_id = scene.get("id") if isinstance(scene, dict) else None
+        if scene_id is not None and scene_id in positions:
+            scenes[positions[scene_id]] = scene
+            continue
+        if scene_id is not None:
+            positions[scene_id] = len(scenes)
+        scenes.append(scene)
+    return scenes
+
+
+# Define the state record that gets passed between agents. Nodes return only
+# the fields they change; the annotated reducers say how each is merged, and
+# every other field is last-write-wins.
 class NovelSystemState(TypedDict):
     """State record for the novel writing system."""
 
     project: ProjectState
     current_input: Dict
     current_output: Dict
-    messages: List[Dict]
-    errors: List[Dict]
+    # Ids of the latest messages; the messages themselves are in the message log
+    message_ids: Annotated[List[str], keep_recent]
+    errors: Annotated[List[Dict], operator.add]
+
+
+class StoryState(TypedDict, total=False):
+    """The dict state the story workflow's agents read and return deltas of."""
+
+    project_id: str
+    title: str
+    genre: str
+    manuscript: Any
+    scenes: Annotated[List[Dict], append_scenes]
+    scene_dialogues: List[Dict]
+    message_ids: Annotated[List[str], keep_recent]
+    errors: Annotated[List[Dict], operator.add]
+    feedback: Annotated[List[str], operator.add]
+
+
+@lru_cache()
+def state_reducers(schema: type = StoryState) -> Dict[str, Callable[[Any, Any], Any]]:
+    """The reducer of every annotated field of a state schema."""
+    return {
+        field: hint.__metadata__[0]
+        for field, hint in get_type_hints(schema, include_extras=True).items()
+        if getattr(hint, "__metadata__", None)
+    }
+
+
+def apply_delta(
+    state: MutableMapping[str, Any],
+    delta: Optional[Dict[str, Any]],
+    schema: type = StoryState
+) -> MutableMapping[str, Any]:
+    """Merge the fields a node returned into ``state``, as LangGraph would.
+
+    Only the fields in ``delta`` are touched. A node that still updates the
+    state itself and returns it is left as is.
+    """
+    if delta is None or delta is state:
+        return state
+    reducers = state_reducers(schema)
+    for field, value in delta.items():
+        if field in reducers and field in state:
+            value = reducers[field](state[field], value)
+        state[field] = value
+    return state
+
+
+def delta_view(state: MutableMapping[str, Any]) -> ChainMap:
+    """A view of ``state`` whose writes are kept apart; ``view.maps[0]`` is the delta."""
+    return ChainMap({}, state)
@@ -40,7 +40,7 @@ def agent_factory() -> AgentFactory:
 
 @pytest.fixture
 def workflow_manager(agent_factory: AgentFactory) -> WorkflowManager:
-    return WorkflowManager(agent_factory)
+    return WorkflowManager(agents=agent_factory.registry)
 
 
 @pytest.fixture
@@ -0,0 +1,55 @@
+"""Local stand-in for the Anthropic Message Batches API used in tests."""
+
+import json
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+
+
+def create_batch_server(
+    respond: Callable[[Dict[str, Any]], str],
+    polls_until_done: int = 1,
+    fail_ids: Optional[set] = None,
+) -> FastAPI:
+    """Create an app answering batch requests with ``respond(params)``.
+
+    Each batch reports ``in_progress`` for ``polls_until_done`` status polls
+    before it ends. Requests whose custom id is in ``fail_ids`` are errored.
+    """
+    app = FastAPI()
+    app.state.batches = {}
+    fail_ids = fail_ids or set()
+
+    @app.post("/v1/messages/batches")
+    async def create_batch(body: Dict[str, Any]) -> Dict[str, Any]:
+        batch_id = f"msgbatch_{len(app.state.batches) + 1:04d}"
+        app.state.batches[batch_id] = {"requests": body["requests"], "polls": 0}
+        return {"id": batch_id, "processing_status": "in_progress"}
+
+    @app.get("/v1/messages/batches/{batch_id}")
+    async def get_batch(batch_id: str) -> Dict[str, Any]:
+        batch = app.state.batches.get(batch_id)
+        if batch is None:
+            raise HTTPException(status_code=404)
+        batch["polls"] += 1
+        done = batch["polls"] > polls_until_done
+        return {"id": batch_id, "processing_status": "ended" if done else "in_progress"}
+
+    @app.get("/v1/messages/batches/{batch_id}/results")
+    async def get_results(batch_id: str) -> PlainTextResponse:
+        lines = []
+        for request in app.state.batches[batch_id]["requests"]:
+            if request["custom_id"] in fail_ids:
+                result = {"type": "errored", "error": {"type": "overloaded_error"}}
+            else:
+                result = {
+                    "type": "succeeded",
+                    "message": {
+                        "content": [{"type": "text", "text": respond(request["params"])}]
+                    },
+                }
+            lines.append(json.dumps({"custom_id": request["custom_id"], "result": result}))
+        return PlainTextResponse("\n".join(lines))
+
+    return app
@@ -0,0 +1,45 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from agents.factory import (AgentFactory, AgentRegistry, get_agent_registry,
+                            prewarm_agents)
+from workflows.manager import WorkflowManager
+
+
+def test_agents_are_created_once_on_first_use():
+    registry = AgentRegistry()
+    manager = WorkflowManager(agents=registry)
+    factory = AgentFactory(registry)
+
+    assert set(manager.agents) >= {"executive", "scene", "quality"}
+    assert registry._agents == {}
+
+    with patch("agents.base.ChatAnthropic", MagicMock()) as chat_model:
+        plot = factory.get_agent("plot")
+        assert manager.agents["plot"] is plot
+        registry.warm(["plot", "scene"])
+
+    assert set(registry._agents) == {"plot", "scene"}
+    assert chat_model.call_count == 2
+
+
+def test_factories_and_managers_share_the_process_registry():
+    assert AgentFactory().registry is get_agent_registry()
+    assert WorkflowManager().agents is get_agent_registry()
+
+    with pytest.raises(ValueError):
+        AgentFactory().get_agent("narrator")
+    with pytest.raises(KeyError):
+        AgentRegistry()["narrator"]
+
+
+def test_prewarm_setting_is_trimmed_and_skips_unknown_types():
+    registry = AgentRegistry()
+
+    with patch("agents.base.ChatAnthropic", MagicMock()):
+        prewarm_agents(" plot , narrator,,scene ", registry)
+
+    assert set(registry._agents) == {"plot", "scene"}
+
+    prewarm_agents("none", registry)
+    assert set(registry._agents) == {"plot", "scene"}
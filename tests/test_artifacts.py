@@ -0,0 +1,73 @@
+import json
+import os
+
+import pytest
+from artifacts import ArtifactState, FilesystemArtifactStore, dehydrate, is_ref
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FilesystemArtifactStore(str(tmp_path))
+
+
+def stored_files(store):
+    return [name for _, _, names in os.walk(store.root) for name in names]
+
+
+def test_identical_values_are_stored_once_and_compressed(store):
+    scenes = [{"id": f"scene_{n}", "content": "The fog rolled in. " * 50} for n in range(5)]
+
+    first = store.put(scenes)
+    second = store.put(json.loads(json.dumps(scenes)))
+
+    assert first == second and is_ref(first)
+    assert len(stored_files(store)) == 1
+    key = first["$artifact"]
+    assert os.path.getsize(os.path.join(store.root, key[:2], key[2:])) < len(json.dumps(scenes)) / 10
+    assert store.get(first) == scenes
+
+
+def test_state_holds_references_resolved_on_read(store):
+    state = ArtifactState({"title": "Fog", "scenes": [{"content": "x" * 1000}]}, store)
+
+    snapshot = state.snapshot()
+
+    assert snapshot["title"] == "Fog"
+    assert is_ref(snapshot["scenes"])
+    assert len(json.dumps(snapshot)) < 150
+
+    restored = ArtifactState(snapshot, store)
+    assert is_ref(dict.__getitem__(restored, "scenes"))
+    assert restored.get("scenes")[0]["content"] == "x" * 1000
+    assert not is_ref(dict.__getitem__(restored, "scenes"))
+
+
+def test_updates_are_externalized_again(store):
+    state = ArtifactState(dehydrate({"scenes": ["a" * 600]}, store), store)
+    state["scenes"].append("b" * 600)
+    state.update({"style_analysis": {"notes": "c" * 600}})
+
+    snapshot = state.snapshot()
+    restored = ArtifactState(snapshot, store)
+
+    assert restored["scenes"] == ["a" * 600, "b" * 600]
+    assert dict(restored.items())["style_analysis"] == {"notes": "c" * 600}
+    assert len(stored_files(store)) == 3
+
+
+@pytest.mark.asyncio
+async def test_async_externalize_keeps_fields_reassigned_meanwhile(store, monkeypatch):
+    state = ArtifactState({"scenes": ["a" * 600], "manuscript": "b" * 600}, store)
+    store_large = state._store_large
+
+    def reassign_while_storing(fields, min_bytes):
+        refs = store_large(fields, min_bytes)
+        dict.__setitem__(state, "manuscript", "c" * 600)
+        return refs
+
+    monkeypatch.setattr(state, "_store_large", reassign_while_storing)
+    await state.aexternalize()
+
+    assert is_ref(dict.__getitem__(state, "scenes"))
+    assert dict.__getitem__(state, "manuscript") == "c" * 600
+    assert state["scenes"] == ["a" * 600]
@@ -0,0 +1,96 @@
+from typing import Any, Dict
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from agents.base import BaseAgent, pack_batches
+
+
+class ScoringAgent(BaseAgent):
+    async def invoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return state
+
+
+@pytest.fixture
+def agent():
+    with patch("agents.base.ChatAnthropic", MagicMock()):
+        yield ScoringAgent(system_prompt="You score scenes.")
+
+
+@pytest.fixture
+def scenes():
+    return [{"id": f"scene_{i:03d}", "content": "The room was dark."} for i in range(5)]
+
+
+def test_pack_batches_respects_item_limit(scenes):
+    batches = pack_batches(scenes, str, max_items=2, token_budget=10_000)
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_pack_batches_respects_token_budget(scenes):
+    batches = pack_batches(scenes, lambda item: "x" * 400, max_items=10, token_budget=250)
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_pack_batches_keeps_oversized_items_alone():
+    items = [{"id": "big"}, {"id": "small"}]
+    render = lambda item: "x" * (4000 if item["id"] == "big" else 4)
+
+    batches = pack_batches(items, render, max_items=10, token_budget=100)
+
+    assert [[item["id"] for item in batch] for batch in batches] == [["big"], ["small"]]
+
+
+@pytest.mark.asyncio
+async def test_invoke_batched_demultiplexes_results(agent, scenes):
+    async def respond(input_text, **kwargs):
+        return {
+            "results": [
+                {"id": scene["id"], "tension_level": 5}
+                for scene in scenes
+                if scene["id"] in input_text
+            ]
+        }
+
+    agent._ainvoke_chain = AsyncMock(side_effect=respond)
+    results = await agent.invoke_batched(scenes, "Rate scene tension.", max_items=3)
+
+    assert set(results) == {scene["id"] for scene in scenes}
+    assert agent._ainvoke_chain.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_invoke_batched_retries_only_failed_items(agent, scenes):
+    seen = []
+
+    async def respond(input_text, **kwargs):
+        seen.append(input_text)
+        ids = [scene["id"] for scene in scenes if scene["id"] in input_text]
+        results = [{"id": scene_id, "tension_level": 5} for scene_id in ids]
+        if len(seen) == 1:
+            results[0]["tension_level"] = None
+        return {"results": results}
+
+    agent._ainvoke_chain = AsyncMock(side_effect=respond)
+    results = await agent.invoke_batched(
+        scenes,
+        "Rate scene tension.",
+        validate=lambda result: isinstance(result.get("tension_level"), int),
+    )
+
+    assert len(results) == len(scenes)
+    assert len(seen) == 2
+    assert "scene_000" in seen[1]
+    assert "scene_001" not in seen[1]
+
+
+@pytest.mark.asyncio
+async def test_invoke_batched_drops_items_that_keep_failing(agent, scenes):
+    agent._ainvoke_chain = AsyncMock(return_value={"results": []})
+
+    results = await agent.invoke_batched(scenes, "Rate scene tension.", max_retries=1)
+
+    assert results == {}
+    assert agent._ainvoke_chain.await_count == 2
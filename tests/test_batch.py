@@ -0,0 +1,206 @@
+import asyncio
+import json
+from typing import Any, Dict
+
+import httpx
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from fake_batch_server import create_batch_server
+from workflows.batch import (AnthropicBatchProvider, BatchCheckpointStore,
+                             BatchCollector, BatchError, BatchExecutor,
+                             OpenAIBatchProvider, active_batch)
+
+PARAMS = {"model": "claude-3-opus-20240229", "temperature": 0.2, "max_tokens": 1000}
+
+
+def echo(params: Dict[str, Any]) -> str:
+    return json.dumps({"echo": params["messages"][-1]["content"], "system": params.get("system")})
+
+
+def make_provider(app) -> AnthropicBatchProvider:
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://batch.test"
+    )
+    return AnthropicBatchProvider(client=client)
+
+
+def messages(text: str):
+    return [SystemMessage(content="You are a scene scorer."), HumanMessage(content=text)]
+
+
+class RecordingStore(BatchCheckpointStore):
+    def __init__(self):
+        super().__init__()
+        self.saved = []
+
+    async def save(self, run_id: str, checkpoint: Dict[str, Any]) -> None:
+        self.saved.append((run_id, checkpoint))
+        await super().save(run_id, checkpoint)
+
+
+@pytest.mark.asyncio
+async def test_provider_round_trip_against_stand_in_server():
+    app = create_batch_server(echo, polls_until_done=2)
+    provider = make_provider(app)
+
+    batch_id = await provider.submit({
+        "req_1": {"messages": messages("scene one"), "params": PARAMS},
+        "req_2": {"messages": messages("scene two"), "params": PARAMS},
+    })
+
+    assert not await provider.is_complete(batch_id)
+    assert not await provider.is_complete(batch_id)
+    assert await provider.is_complete(batch_id)
+
+    results = await provider.results(batch_id)
+    assert json.loads(results["req_1"]["text"]) == {
+        "echo": "scene one", "system": "You are a scene scorer."
+    }
+    assert json.loads(results["req_2"]["text"])["echo"] == "scene two"
+
+
+@pytest.mark.asyncio
+async def test_openai_batch_without_output_file_reports_each_error():
+    requested = []
+    errors = "\n".join(
+        json.dumps({
+            "custom_id": custom_id,
+            "response": {"status_code": 400, "body": {"error": {"message": f"bad {custom_id}"}}},
+            "error": None,
+        })
+        for custom_id in ("req_1", "req_2")
+    )
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+        if request.url.path == "/v1/batches/batch_1":
+            return httpx.Response(200, json={
+                "id": "batch_1", "status": "completed",
+                "output_file_id": None, "error_file_id": "file_err",
+            })
+        if request.url.path == "/v1/files/file_err/content":
+            return httpx.Response(200, text=errors)
+        return httpx.Response(404)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handle), base_url="http://batch.test")
+    results = await OpenAIBatchProvider(client=client).results("batch_1")
+
+    assert "/v1/files/None/content" not in requested
+    assert results["req_1"]["error"]["body"]["error"]["message"] == "bad req_1"
+    assert results["req_2"]["error"]["body"]["error"]["message"] == "bad req_2"
+
+
+@pytest.mark.asyncio
+async def test_collector_sends_concurrent_calls_in_one_batch():
+    app = create_batch_server(echo)
+    submitted = []
+
+    async def on_submit(batch_id: str) -> None:
+        submitted.append(batch_id)
+
+    collector = BatchCollector(
+        make_provider(app), on_submit=on_submit, collect_window=0.01, poll_interval=0
+    )
+    texts = await asyncio.gather(*[
+        collector.dispatch(f"key_{i}", messages(f"scene {i}"), PARAMS) for i in range(3)
+    ])
+
+    assert len(submitted) == 1
+    assert len(app.state.batches) == 1
+    assert [json.loads(text)["echo"] for text in texts] == ["scene 0", "scene 1", "scene 2"]
+
+
+@pytest.mark.asyncio
+async def test_collector_raises_for_failed_requests():
+    app = create_batch_server(echo, fail_ids={"bad"})
+    collector = BatchCollector(make_provider(app), collect_window=0.01, poll_interval=0)
+
+    results = await asyncio.gather(
+        collector.dispatch("good", messages("scene"), PARAMS),
+        collector.dispatch("bad", messages("scene"), PARAMS),
+        return_exceptions=True,
+    )
+
+    assert json.loads(results[0])["echo"] == "scene"
+    assert isinstance(results[1], BatchError)
+
+
+class SlowSubmitProvider(AnthropicBatchProvider):
+    def __init__(self, client):
+        super().__init__(client=client)
+        self.submitting = asyncio.Event()
+
+    async def submit(self, requests):
+        self.submitting.set()
+        await asyncio.sleep(0.05)
+        return await super().submit(requests)
+
+
+@pytest.mark.asyncio
+async def test_call_arriving_during_submit_goes_in_the_next_batch():
+    app = create_batch_server(echo)
+    provider = SlowSubmitProvider(make_provider(app).client)
+    collector = BatchCollector(provider, collect_window=0.01, poll_interval=0)
+
+    first = asyncio.ensure_future(collector.dispatch("first", messages("scene 1"), PARAMS))
+    await provider.submitting.wait()
+    second = await collector.dispatch("second", messages("scene 2"), PARAMS)
+
+    assert json.loads(await first)["echo"] == "scene 1"
+    assert json.loads(second)["echo"] == "scene 2"
+    assert len(app.state.batches) == 2
+
+
+async def scoring_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    collector = active_batch.get()
+    texts = await asyncio.gather(*[
+        collector.dispatch(scene, messages(scene), PARAMS) for scene in state["scenes"]
+    ])
+    state["scores"] = [json.loads(text)["echo"] for text in texts]
+    return state
+
+
+@pytest.mark.asyncio
+async def test_executor_checkpoints_between_submit_and_collect():
+    app = create_batch_server(echo)
+    store = RecordingStore()
+    executor = BatchExecutor(
+        provider=make_provider(app), store=store, collect_window=0.01, poll_interval=0
+    )
+
+    state = await executor.run_node(
+        "project_1",
+        {"phase": "refinement", "agent": "pacing"},
+        scoring_node,
+        {"scenes": ["scene_001", "scene_002"]},
+    )
+
+    assert state["scores"] == ["scene_001", "scene_002"]
+    run_id, checkpoint = store.saved[0]
+    assert run_id == "project_1"
+    assert checkpoint["batch_ids"] == ["msgbatch_0001"]
+    assert checkpoint["node"] == {"phase": "refinement", "agent": "pacing"}
+    assert "scores" not in checkpoint["state"]
+    assert await store.load("project_1") is None
+
+
+@pytest.mark.asyncio
+async def test_executor_resumes_from_submitted_batch_without_resubmitting():
+    app = create_batch_server(echo)
+    provider = make_provider(app)
+    batch_id = await provider.submit({
+        "scene_001": {"messages": messages("scene_001"), "params": PARAMS},
+    })
+
+    executor = BatchExecutor(provider=provider, collect_window=0.01, poll_interval=0)
+    state = await executor.run_node(
+        "project_1",
+        {"phase": "refinement", "agent": "pacing"},
+        scoring_node,
+        {"scenes": ["scene_001"]},
+        batch_ids=[batch_id],
+    )
+
+    assert state["scores"] == ["scene_001"]
+    assert len(app.state.batches) == 1
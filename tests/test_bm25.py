@@ -0,0 +1,98 @@
+from indexing.bm25 import BM25Index, Chunk, chunk_state
+
+
+def test_search_ranks_matching_chunks_first():
+    index = BM25Index()
+    index.update([
+        Chunk("a", "scenes", "Mira sails the harbour at dawn."),
+        Chunk("b", "scenes", "The council debates the harbour tax."),
+        Chunk("c", "scenes", "A quiet dinner in the mountains."),
+    ])
+
+    results = index.search("Mira harbour", k=3)
+
+    assert [chunk.id for chunk, _ in results] == ["a", "b"]
+    assert results[0][1] > results[1][1] > 0
+
+
+def test_only_changed_chunks_are_retokenized():
+    index = BM25Index()
+    index.update([Chunk("a", "scenes", "storm"), Chunk("b", "scenes", "calm")])
+
+    changed = index.update([Chunk("a", "scenes", "storm"), Chunk("b", "scenes", "gale")])
+
+    assert changed == 1
+    assert [chunk.id for chunk, _ in index.search("calm")] == []
+    assert [chunk.id for chunk, _ in index.search("gale")] == ["b"]
+
+
+def test_retrieve_respects_token_budget():
+    index = BM25Index()
+    index.update([
+        Chunk("long", "scenes", "amulet " * 400),
+        Chunk("short", "scenes", "The amulet glows."),
+    ])
+
+    assert [chunk.id for chunk in index.retrieve("amulet", max_tokens=50)] == ["short"]
+
+
+def test_state_is_chunked_into_bible_and_scenes():
+    chunks = chunk_state({
+        "characters": [{"name": "Mira"}],
+        "world_building": {"setting": {"location": "Port Ember"}, "rules": ["No magic at sea"]},
+        "plot_structure": {"act_one": {"setup": "Mira leaves"}},
+        "manuscript": "Paragraph one.\n\nParagraph two.",
+    }, chunk_tokens=4)
+
+    assert [chunk.id for chunk in chunks] == [
+        "character:Mira", "world:setting", "world:rules", "plot:act_one",
+        "scene:ch1_s1:0", "scene:ch1_s1:1",
+    ]
+
+
+def test_project_indexes_are_kept_per_project_and_capped(monkeypatch):
+    from indexing import bm25
+
+    monkeypatch.setattr(bm25, "_project_indexes", bm25.OrderedDict())
+    monkeypatch.setattr(bm25, "MAX_PROJECT_INDEXES", 2)
+
+    first = bm25.project_index({"project_id": "p1", "title": "Tides"})
+    assert bm25.project_index({"project_id": "p1"}) is first
+    assert bm25.project_index({"project_id": "p2", "title": "Tides"}) is not first
+    bm25.project_index({"project_id": "p3"})
+
+    assert list(bm25._project_indexes) == ["p2", "p3"]
+    # Projects without an id are never shared
+    assert bm25.project_index({"title": "Tides"}) is not bm25.project_index({"title": "Tides"})
+    assert len(bm25._project_indexes) == 2
+
+
+def test_retrieve_can_leave_out_scenes():
+    index = BM25Index()
+    index.update([
+        Chunk("scene:s1:0", "scenes", "The amulet glows."),
+        Chunk("scene:s2:0", "scenes", "The amulet stays dark."),
+        Chunk("world:amulet", "world_building", "The amulet answers only to Mira."),
+    ])
+
+    chunks = index.retrieve("amulet", exclude_scenes=["s1"])
+
+    assert "scene:s1:0" not in [chunk.id for chunk in chunks]
+    assert len(chunks) == 2
+
+
+def test_unchanged_state_is_not_rechunked(monkeypatch):
+    from indexing import bm25
+
+    monkeypatch.setattr(bm25, "_project_indexes", bm25.OrderedDict())
+    state = {"project_id": "p1", "manuscript": "Mira sails at dawn."}
+    index = bm25.project_index(state)
+    chunked = []
+    monkeypatch.setattr(bm25, "chunk_state", lambda state: chunked.append(state) or chunk_state(state))
+
+    bm25.project_index({**state, "title": "Tides"})
+    assert chunked == []
+
+    bm25.project_index({**state, "manuscript": "Mira sails at dusk."})
+    assert len(chunked) == 1
+    assert [chunk.id for chunk, _ in index.search("dusk")] == ["scene:ch1_s1:0"]
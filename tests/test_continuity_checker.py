@@ -1,5 +1,8 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
 import pytest
 from agents.continuity_checker import ContinuityChecker
+from state import apply_delta
 
 @pytest.fixture
 def test_state():
@@ -52,4 +55,126 @@ async def test_consistency_metrics(test_state):
 async def test_continuity_checker_error_handling():
     agent = ContinuityChecker()
     with pytest.raises(Exception):
-        await agent.invoke({})
\ No newline at end of file
+        await agent.invoke({})
+
+@pytest.fixture
+def mocked_checker():
+    with patch("agents.base.ChatAnthropic", MagicMock()):
+        agent = ContinuityChecker()
+
+    agent._ainvoke_chain = AsyncMock(return_value={
+        "continuity_analysis": {
+            "plot_threads": [],
+            "character_arcs": [{"character": "Sarah", "arc_progression": [], "consistency_issues": []}],
+            "world_rule_violations": [],
+        },
+        "established_facts": [
+            {"entity_type": "object", "entity": "amulet", "fact": "Glows blue", "scene_id": "scene_001"},
+        ],
+        "consistency_metrics": {"overall_consistency": 0.9},
+    })
+    return agent
+
+
+@pytest.fixture
+def scene_state(test_state):
+    test_state["scenes"] = [
+        {"id": "scene_001", "title": "Discovery", "content": "Sarah finds the amulet."},
+    ]
+    return test_state
+
+
+@pytest.mark.asyncio
+async def test_unchanged_scenes_are_not_rechecked(mocked_checker, scene_state):
+    state = apply_delta(scene_state, await mocked_checker.invoke(scene_state))
+    state = apply_delta(state, await mocked_checker.invoke(state))
+
+    assert mocked_checker._ainvoke_chain.await_count == 1
+    assert state["consistency_metrics"] == {"overall_consistency": 0.9}
+
+
+@pytest.mark.asyncio
+async def test_only_new_scenes_are_checked_against_relevant_facts(mocked_checker, scene_state):
+    state = apply_delta(scene_state, await mocked_checker.invoke(scene_state))
+    state["scenes"].append(
+        {"id": "scene_002", "title": "Trial", "content": "The amulet stays dark."}
+    )
+    mocked_checker._ainvoke_chain.return_value = {
+        "continuity_analysis": {"plot_threads": [], "character_arcs": [], "world_rule_violations": []},
+        "established_facts": [],
+        "consistency_metrics": {"overall_consistency": 0.5},
+    }
+
+    state = apply_delta(state, await mocked_checker.invoke(state))
+
+    second_input = mocked_checker._ainvoke_chain.await_args.args[0]
+    assert "scene_002" in second_input
+    assert "Discovery" not in second_input
+    assert "Glows blue" in second_input
+    # Sarah is not mentioned in the new scene, so her profile is left out
+    assert "Characters: []" in second_input
+
+    # One unchanged scene at 0.9 and one new scene at 0.5
+    assert state["consistency_metrics"]["overall_consistency"] == pytest.approx(0.7)
+    assert state["continuity_analysis"]["character_arcs"][0]["character"] == "Sarah"
+
+
+@pytest.mark.asyncio
+async def test_findings_of_fixed_or_removed_scenes_are_dropped(mocked_checker, scene_state):
+    scene_state["scenes"].append({"id": "scene_002", "title": "Trial", "content": "The amulet stays dark."})
+    mocked_checker._ainvoke_chain.return_value = {
+        "continuity_analysis": {
+            "plot_threads": [],
+            "character_arcs": [],
+            "world_rule_violations": [{"rule": "Amulets glow", "instances": ["It stays dark"]}],
+        },
+        "established_facts": [],
+        "consistency_metrics": {"overall_consistency": 0.4},
+    }
+    state = apply_delta(scene_state, await mocked_checker.invoke(scene_state))
+    assert state["continuity_analysis"]["world_rule_violations"][0]["scene_ids"] == ["scene_001", "scene_002"]
+
+    # The second scene is fixed and re-checked without the violation
+    state["scenes"][1] = {"id": "scene_002", "title": "Trial", "content": "The amulet glows."}
+    mocked_checker._ainvoke_chain.return_value = {
+        "continuity_analysis": {"plot_threads": [], "character_arcs": [], "world_rule_violations": []},
+        "established_facts": [],
+        "consistency_metrics": {"overall_consistency": 1.0},
+    }
+    state = apply_delta(state, await mocked_checker.invoke(state))
+    assert state["continuity_analysis"]["world_rule_violations"][0]["scene_ids"] == ["scene_001"]
+    assert state["consistency_metrics"]["overall_consistency"] == pytest.approx(0.7)
+
+    # Removing the first scene takes its violation and its metrics with it
+    state["scenes"] = state["scenes"][1:]
+    state = apply_delta(state, await mocked_checker.invoke(state))
+    assert state["continuity_analysis"]["world_rule_violations"] == []
+    assert state["consistency_metrics"]["overall_consistency"] == pytest.approx(1.0)
+    assert mocked_checker._ainvoke_chain.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_rechecking_leaves_the_previous_state_unchanged(mocked_checker, scene_state):
+    import copy
+
+    state = apply_delta(scene_state, await mocked_checker.invoke(scene_state))
+    previous = copy.deepcopy(state["continuity_index"])
+    state["scenes"][0] = {"id": "scene_001", "title": "Discovery", "content": "Sarah loses the amulet."}
+
+    await mocked_checker.invoke(state)
+
+    assert state["continuity_index"] == previous
+
+
+@pytest.mark.asyncio
+async def test_later_checks_retrieve_related_context(mocked_checker, scene_state):
+    state = apply_delta(scene_state, await mocked_checker.invoke(scene_state))
+    state["scenes"].append({"id": "scene_002", "title": "Trial", "content": "Sarah raises the amulet."})
+
+    await mocked_checker.invoke(state)
+
+    second_input = mocked_checker._ainvoke_chain.await_args.args[0]
+    # The earlier scene's prose is retrieved in place of the plot structure
+    assert "[scene:scene_001:0]" in second_input
+    assert "[scene:scene_002:0]" not in second_input
+    assert "Plot Structure" not in second_input
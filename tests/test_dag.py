@@ -0,0 +1,129 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+from agents.continuity_checker import ContinuityChecker
+from agents.dialogue_writer import DialogueWriter
+from agents.pacing_editor import PacingEditor
+from agents.style_editor import StyleEditor
+from agents.summarizer import StorySummarizer
+from workflows.dag import DagScheduler, QualityGateError, Task, TaskGraph
+
+
+def tasks_from(agents):
+    return [
+        Task(name, tuple(agent.reads), tuple(agent.writes)) for name, agent in agents.items()
+    ]
+
+
+def test_dependencies_follow_reads_and_writes():
+    graph = TaskGraph(tasks_from({
+        "dialogue": DialogueWriter,
+        "pacing": PacingEditor,
+        "continuity": ContinuityChecker,
+        "style": StyleEditor,
+        "summary": StorySummarizer,
+    }))
+
+    # Pacing and continuity only read the drafted scenes and dialogue
+    assert graph.dependencies["pacing"] == ["dialogue"]
+    assert graph.dependencies["continuity"] == ["dialogue"]
+    # The style editor rewrites scenes the two checkers read, so it waits for both
+    assert set(graph.dependencies["style"]) >= {"pacing", "continuity"}
+    assert ("dialogue", "style") not in graph.edges()
+    assert ("style", "summary") in graph.edges()
+
+
+def test_critical_path_is_the_longest_dependent_chain():
+    graph = TaskGraph([
+        Task("outline", writes=("outline",)),
+        Task("world", reads=("outline",), writes=("world",)),
+        Task("characters", reads=("outline",), writes=("characters",)),
+        Task("plot", reads=("world", "characters"), writes=("plot",)),
+    ])
+
+    path, seconds = graph.critical_path({"outline": 1, "world": 5, "characters": 2, "plot": 1})
+
+    assert path == ["outline", "world", "plot"]
+    assert seconds == 7
+
+
+@pytest.mark.asyncio
+async def test_independent_tasks_run_concurrently_within_the_limits():
+    graph = TaskGraph([
+        Task("outline", writes=("outline",), model="a"),
+        *[Task(f"research_{n}", reads=("outline",), writes=(f"notes_{n}",), model="a") for n in range(3)],
+        Task("characters", reads=("outline",), writes=("characters",), model="b"),
+    ])
+    running, peak = {"a": 0, "b": 0}, {"all": 0, "a": 0}
+
+    async def run_task(task, state, attempt):
+        running[task.model] += 1
+        peak["all"] = max(peak["all"], sum(running.values()))
+        peak["a"] = max(peak["a"], running["a"])
+        await asyncio.sleep(0.05)
+        running[task.model] -= 1
+        for field in task.writes:
+            state[field] = task.name
+
+    state = {}
+    report = await DagScheduler(max_concurrency=3, model_limits={"a": 2}).run(graph, state, run_task)
+
+    assert peak == {"all": 3, "a": 2}
+    assert state["characters"] == "characters" and state["notes_2"] == "research_2"
+    assert report["critical_path"][0] == "outline"
+    assert report["parallelism"] > 1.5
+
+
+@pytest.mark.asyncio
+async def test_failed_quality_gate_reruns_the_task_then_fails_the_run():
+    graph = TaskGraph([
+        Task("draft", writes=("score",), gate={"score": 0.5}, retries=1),
+        Task("polish", reads=("score",), writes=("polished",)),
+    ])
+    scores = iter([0.2, 0.8])
+    attempts = []
+
+    async def run_task(task, state, attempt):
+        attempts.append((task.name, attempt))
+        state[task.writes[0]] = next(scores) if task.name == "draft" else True
+
+    report = await DagScheduler().run(graph, {}, run_task)
+    assert attempts == [("draft", 0), ("draft", 1), ("polish", 0)]
+    assert report["quality_gates"]["draft"]["passed"]
+
+    scores = iter([0.2, 0.3])
+    with pytest.raises(QualityGateError):
+        await DagScheduler().run(graph, {}, run_task)
+
+
+@pytest.mark.asyncio
+async def test_dag_mode_runs_the_checkers_side_by_side():
+    with patch("agents.base.ChatAnthropic", MagicMock()), \
+            patch("agents.executive_director.ChatAnthropic", MagicMock()):
+        from agents.factory import AgentRegistry
+        from workflows.manager import WorkflowManager
+        # A registry of its own, so the mocked agents are not shared with other tests
+        manager = WorkflowManager(agents=AgentRegistry())
+        manager.agents.warm()
+    manager.quality_gates = {}
+
+    running, overlaps = set(), set()
+    for name, agent in manager.agents.items():
+        async def invoke(state, name=name, agent=agent):
+            running.add(name)
+            if len(running) > 1:
+                overlaps.update(running)
+            await asyncio.sleep(0.01)
+            running.discard(name)
+            return {field: f"{name} output" for field in agent.writes}
+        agent.invoke = invoke
+
+    result = await manager.create_story({"title": "T", "genre": "g", "execution_mode": "dag"})
+    story = result["story"]
+
+    assert result["status"] == "success"
+    assert overlaps == {"pacing", "continuity"}
+    assert story["quality_assessment"] == "quality output"
+    assert story["dag_report"]["critical_path"][0] == "executive"
+    assert set(story["task_durations"]) == set(manager.agents)
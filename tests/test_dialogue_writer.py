@@ -1,3 +1,5 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
 import pytest
 from agents.dialogue_writer import DialogueWriter
 
@@ -57,4 +59,97 @@ async def test_character_voice_consistency(test_state):
 async def test_dialogue_writer_error_handling():
     agent = DialogueWriter()
     with pytest.raises(Exception):
-        await agent.invoke({})
\ No newline at end of file
+        await agent.invoke({})
+
+@pytest.fixture
+def mocked_writer():
+    with patch("agents.base.ChatAnthropic", MagicMock()):
+        agent = DialogueWriter(max_concurrency=2)
+
+    async def respond(input_text, prompt=None, **kwargs):
+        scene_id = "scene_001" if "scene_001" in input_text else "scene_002"
+        exchanges = 3 if scene_id == "scene_001" else 1
+        return {
+            "scene_dialogue": {
+                "scene_id": scene_id,
+                "exchanges": [{"speaker": "Emma Chen", "line": "..."}] * exchanges,
+            },
+            "dialogue_metrics": {
+                "naturalness_score": 0.8 if scene_id == "scene_001" else 0.4,
+            },
+        }
+
+    agent._ainvoke_chain = AsyncMock(side_effect=respond)
+    return agent
+
+
+@pytest.mark.asyncio
+async def test_dialogue_is_written_per_scene(mocked_writer, test_state):
+    test_state["scenes"].append(
+        {"id": "scene_002", "title": "Aftermath", "participants": [{"character": "Emma Chen"}]}
+    )
+    result = await mocked_writer.invoke(test_state)
+
+    assert mocked_writer._ainvoke_chain.await_count == 2
+    assert [d["scene_id"] for d in result["scene_dialogues"]] == ["scene_001", "scene_002"]
+
+    # Metrics are aggregated locally, weighted by exchange count
+    assert result["dialogue_metrics"]["naturalness_score"] == pytest.approx(0.7)
+
+
+@pytest.mark.asyncio
+async def test_scene_calls_only_include_participants(mocked_writer, test_state):
+    test_state["scenes"].append(
+        {"id": "scene_002", "title": "Aftermath", "participants": [{"character": "Emma Chen"}]}
+    )
+    await mocked_writer.invoke(test_state)
+
+    second_input = mocked_writer._ainvoke_chain.await_args_list[1].args[0]
+    assert "Emma Chen" in second_input
+    assert "John Smith" not in second_input
+
+
+@pytest.mark.asyncio
+async def test_stream_merges_with_existing_dialogues_by_scene(mocked_writer, test_state):
+    test_state["scene_dialogues"] = [
+        {"scene_id": "scene_000", "exchanges": []},
+        {"scene_id": "scene_001", "exchanges": [], "stale": True},
+    ]
+    test_state["dialogue_metrics"] = {"naturalness_score": 0.1}
+
+    async def items():
+        yield {"scene": test_state["scenes"][0]}
+        yield {"scene": {"id": "scene_002", "participants": ["Emma Chen"]}}
+
+    streamed = [item async for item in mocked_writer.stream(items(), test_state)]
+
+    assert [item["scene_dialogue"]["scene_id"] for item in streamed] == ["scene_001", "scene_002"]
+    dialogues = test_state["scene_dialogues"]
+    assert [d["scene_id"] for d in dialogues] == ["scene_000", "scene_001", "scene_002"]
+    assert "stale" not in dialogues[1]
+    # The kept scene counts with its previous metrics
+    assert test_state["dialogue_metrics"]["naturalness_score"] == pytest.approx(2.9 / 5)
+
+
+@pytest.mark.asyncio
+async def test_dialogue_keeps_the_id_of_its_scene(mocked_writer, test_state):
+    async def respond(input_text, prompt=None, **kwargs):
+        return {
+            "scene_dialogue": {"scene_id": "scene_identifier", "exchanges": []},
+            "dialogue_metrics": {"naturalness_score": 0.5},
+        }
+
+    mocked_writer._ainvoke_chain = AsyncMock(side_effect=respond)
+    test_state["scenes"].append({"id": "scene_002", "participants": ["Emma Chen"]})
+    result = await mocked_writer.invoke(test_state)
+
+    assert [d["scene_id"] for d in result["scene_dialogues"]] == ["scene_001", "scene_002"]
+
+
+def test_metrics_that_are_not_numbers_are_skipped():
+    results = [
+        {"scene_dialogue": {"exchanges": []}, "dialogue_metrics": {"naturalness_score": 0.6, "tension": None}},
+        {"scene_dialogue": {"exchanges": []}, "dialogue_metrics": {"naturalness_score": "n/a", "tension": 0.2}},
+    ]
+
+    assert DialogueWriter._aggregate_metrics(results) == {"naturalness_score": 0.6, "tension": 0.2}
@@ -0,0 +1,81 @@
+from indexing.entity_index import AhoCorasick, EntityIndex, entities_from_state, sync_entity_index
+from indexing.manuscript import Passage, manuscript_passages
+
+
+def test_matcher_finds_whole_words_and_prefers_longest():
+    matcher = AhoCorasick({"ann": "Ann", "ann lee": "Ann Lee", "lee": "Lee"})
+
+    matches = list(matcher.find("Annual report: ANN LEE met Lee and Ann."))
+
+    assert [(start, value) for start, _, value in matches] == [
+        (15, "Ann Lee"), (27, "Lee"), (35, "Ann")
+    ]
+
+
+def test_entities_include_aliases_and_world_elements():
+    entities = entities_from_state({
+        "characters": [{"name": "Sarah Vance", "aliases": ["Sal"]}],
+        "world_building": {
+            "setting": {"location": "Port Ember"},
+            "elements": [{"name": "Sunstone Amulet"}],
+        },
+    })
+
+    assert entities == {
+        "Sarah Vance": {"type": "character", "aliases": ["Sal"]},
+        "Port Ember": {"type": "location", "aliases": []},
+        "Sunstone Amulet": {"type": "object", "aliases": []},
+    }
+
+
+def test_structured_and_plain_manuscripts_split_into_scenes():
+    structured = manuscript_passages({"manuscript": {"chapters": [
+        {"id": "c1", "scenes": [{"id": "a", "text": "One."}, {"id": "b", "text": "Two."}]},
+    ]}})
+    plain = manuscript_passages({
+        "manuscript": "Chapter 1\nOne.\n\n* * *\n\nTwo.\nChapter 2\nThree."
+    })
+
+    assert structured == [Passage("c1", "a", "One."), Passage("c1", "b", "Two.")]
+    assert [(passage.chapter, passage.scene) for passage in plain] == [
+        ("ch1", "ch1_s1"), ("ch1", "ch1_s2"), ("ch2", "ch2_s1")
+    ]
+
+
+def test_co_occurrence_and_incremental_updates():
+    index = EntityIndex({
+        "Sarah": {"type": "character", "aliases": ["Sal"]},
+        "Tom": {"type": "character", "aliases": []},
+    })
+    index.update([
+        Passage("c1", "s1", "Sal waved at Tom."),
+        Passage("c1", "s2", "Sarah slept."),
+    ])
+
+    assert index.scenes_with("Sarah", "Tom") == ["s1"]
+    assert [mention.offset for mention in index.mentions("Sarah")] == [0, 0]
+
+    rescanned = index.update([
+        Passage("c1", "s1", "Sal waved at Tom."),
+        Passage("c1", "s2", "Sarah woke and called Tom."),
+        Passage("c2", "s3", "Tom left."),
+    ])
+
+    assert rescanned == ["s2", "s3"]
+    assert index.scenes_with("Sarah", "Tom") == ["s1", "s2"]
+    assert index.passages("Sarah", "Tom", radius=5)[1] == {
+        "chapter": "c1", "scene": "s2", "text": "Sarah woke and called Tom."
+    }
+
+
+def test_stored_index_is_rebuilt_when_entities_change():
+    state = {
+        "characters": [{"name": "Sarah"}],
+        "scenes": [{"id": "s1", "content": "Sarah meets Tom."}],
+    }
+    sync_entity_index(state)
+
+    state["characters"].append({"name": "Tom"})
+    index = sync_entity_index(state)
+
+    assert index.scenes_with("Sarah", "Tom") == ["s1"]
@@ -0,0 +1,18 @@
+import config
+from benchmarks.import_time import eager_packages, profile_import
+
+
+def test_startup_modules_import_without_provider_sdks():
+    for module in ("config", "agents.factory", "workflows.manager"):
+        profile = profile_import(module)
+
+        assert profile.milliseconds is not None, profile.error
+        assert eager_packages(profile) == []
+    # Agent modules are imported when an agent is first requested
+    assert "agents.plot_architect" not in profile.imported
+
+
+def test_config_tables_are_built_once_on_first_access():
+    assert config.MODEL_CONFIGS is config.MODEL_CONFIGS
+    assert config.get_model_config("creative_director")["model"]
+    assert config.get_model_config("no_such_agent") == {}
@@ -0,0 +1,126 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from agents.character_designer import CharacterDesigner
+from agents.continuity_checker import ContinuityChecker
+from agents.creative_director import CreativeDirectorAgent
+from agents.dialogue_writer import DialogueWriter
+from agents.pacing_editor import PacingEditor
+from agents.plot_architect import PlotArchitect
+from agents.quality_assessor import QualityAssessor
+from agents.scene_composer import SceneComposer
+from agents.style_editor import StyleEditor
+from agents.summarizer import StorySummarizer
+from agents.world_building import WorldBuildingExpert
+from workflows.invalidation import plan_recompute
+
+# The agent classes carry the reads/writes declarations the planner needs
+AGENTS = {
+    "creative": CreativeDirectorAgent,
+    "world_building": WorldBuildingExpert,
+    "character": CharacterDesigner,
+    "plot": PlotArchitect,
+    "scene": SceneComposer,
+    "dialogue": DialogueWriter,
+    "pacing": PacingEditor,
+    "continuity": ContinuityChecker,
+    "style": StyleEditor,
+    "summary": StorySummarizer,
+    "quality": QualityAssessor,
+}
+ORDER = list(AGENTS)
+
+
+@pytest.fixture
+def story():
+    scenes = [
+        ("ch1", "s1", "Mara crossed the bridge at dawn. " * 20),
+        ("ch1", "s2", "Tom waited at the inn alone. " * 20),
+        ("ch2", "s3", "Mara and Tom argued by the fire. " * 20),
+        ("ch2", "s4", "The storm broke over the valley. " * 20),
+    ]
+    chapters = {}
+    for chapter, scene, text in scenes:
+        chapters.setdefault(chapter, []).append({"id": scene, "text": text})
+    return {
+        "characters": [{"name": "Mara"}, {"name": "Tom"}],
+        "plot_structure": {"act_one": {"setup": "A crossing"}},
+        "scenes": [{"id": scene, "title": scene} for _, scene, _ in scenes],
+        "scene_dialogues": [{"scene_id": scene, "exchanges": []} for _, scene, _ in scenes],
+        "manuscript": {"chapters": [
+            {"id": chapter, "scenes": chapter_scenes} for chapter, chapter_scenes in chapters.items()
+        ]},
+    }
+
+
+def nodes(plan):
+    return {node["node"]: node for node in plan["nodes"]}
+
+
+def test_character_feedback_recomputes_only_scenes_using_the_character(story):
+    plan = plan_recompute(
+        story, {"content": "Mara should be more guarded", "type": "character"}, AGENTS, ORDER
+    )
+
+    assert plan["targets"]["entities"] == ["Mara"]
+    assert plan["scenes"] == ["s1", "s3"]
+    # The story structure is kept: no new plot and no freshly composed scenes
+    assert list(nodes(plan)) == [
+        "character", "dialogue", "pacing", "continuity", "style", "summary", "quality"
+    ]
+    assert nodes(plan)["character"]["items"] == ["Mara"]
+    assert nodes(plan)["dialogue"]["items"] == ["s1", "s3"]
+    assert nodes(plan)["pacing"]["items"] == ["*"]
+
+
+def test_chapter_feedback_starts_at_the_prose(story):
+    plan = plan_recompute(
+        story, {"content": "Chapter 2 drags in the middle"}, AGENTS, ORDER
+    )
+
+    assert plan["targets"]["chapters"] == ["ch2"]
+    assert plan["scenes"] == ["s3", "s4"]
+    assert list(nodes(plan)) == ["style", "summary", "quality"]
+
+
+def test_structural_feedback_recomputes_everything_downstream(story):
+    whole = plan_recompute(
+        story, {"content": "The midpoint needs a reversal", "type": "plot"}, AGENTS, ORDER
+    )
+    scoped = plan_recompute(
+        story, {"content": "Tom sounds too formal", "type": "dialogue"}, AGENTS, ORDER
+    )
+
+    assert not whole["localized"]
+    assert list(nodes(whole))[:3] == ["plot", "scene", "dialogue"]
+    assert nodes(whole)["dialogue"]["items"] == ["*"]
+    assert nodes(scoped)["dialogue"]["items"] == ["s2", "s3"]
+    assert nodes(scoped)["dialogue"]["input_tokens"] < nodes(whole)["dialogue"]["input_tokens"]
+    assert whole["estimated_tokens"]["total"] > scoped["estimated_tokens"]["total"] > 0
+
+
+@pytest.mark.asyncio
+async def test_apply_feedback_runs_the_planned_agents_with_a_scene_scope(story):
+    with patch("agents.base.ChatAnthropic", MagicMock()), \
+            patch("agents.executive_director.ChatAnthropic", MagicMock()):
+        from agents.factory import AgentRegistry
+        from workflows.manager import WorkflowManager
+        # A registry of its own, so the mocked agents are not shared with other tests
+        manager = WorkflowManager(agents=AgentRegistry())
+        manager.agents.warm()
+
+    calls = []
+    for name, agent in manager.agents.items():
+        async def invoke(state, name=name):
+            calls.append((name, state["force"], state["recompute_scope"]["scenes"]))
+            return {}
+        agent.invoke = invoke
+
+    state = await manager.apply_feedback(
+        story, {"content": "Chapter 2 drags in the middle", "type": "general"}
+    )
+
+    assert [name for name, _, _ in calls] == ["style", "summary", "quality"]
+    assert all(scope == ["s3", "s4"] for _, _, scope in calls)
+    assert "recompute_scope" not in state and "force" not in state
+    assert state["human_feedback"][-1]["recomputed"] == ["style", "summary", "quality"]
@@ -0,0 +1,62 @@
+from editing.ledger import record_pass, select_for_pass
+
+
+def make_state(third: str = "Three."):
+    return {
+        "refinement_mode": "incremental",
+        "manuscript": {"chapters": [{"id": "c1", "scenes": [
+            {"id": "a", "text": f"One.\n\nTwo.\n\n{third}\n\nFour.\n\nFive."},
+            {"id": "b", "text": "Other scene."},
+        ]}]},
+    }
+
+
+def test_first_incremental_pass_processes_everything():
+    paragraphs, report = select_for_pass(make_state(), "style")
+
+    assert len(paragraphs) == 6
+    assert report["skipped_paragraphs"] == 0
+
+
+def test_only_changed_paragraphs_and_neighbours_are_reprocessed():
+    state = make_state()
+    record_pass(state, "style")
+
+    edited = make_state("Three, revised.")
+    edited["processing_ledger"] = state["processing_ledger"]
+    paragraphs, report = select_for_pass(edited, "style")
+
+    assert [paragraph.text for paragraph in paragraphs] == ["Two.", "Three, revised.", "Four."]
+    assert report["processed_scenes"] == 1 and report["skipped_scenes"] == 1
+    assert report["skipped_paragraphs"] == 3
+    assert edited["refinement_report"]["style"] == report
+
+    # Other passes keep their own ledger
+    assert len(select_for_pass(edited, "grammar")[0]) == 6
+
+
+def test_full_mode_ignores_the_ledger():
+    state = make_state()
+    record_pass(state, "style")
+    state["refinement_mode"] = "full"
+
+    paragraphs, report = select_for_pass(state, "style")
+
+    assert len(paragraphs) == 6 and report["incremental"] is False
+
+
+def test_ledger_forgets_paragraphs_edited_away():
+    state = make_state()
+    record_pass(state, "style")
+    record_pass(state, "grammar")
+
+    for revision in ("Three, revised.", "Three, revised again."):
+        edited = make_state(revision)
+        edited["processing_ledger"] = state["processing_ledger"]
+        record_pass(edited, "style")
+        state = edited
+
+    passes = state["processing_ledger"]["passes"]
+    assert len(passes["style"]) == 6
+    # Passes that did not run since still drop the old paragraph
+    assert len(passes["grammar"]) == 5
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from indexing.manuscript import Paragraph
+from workflows.map_reduce import (MapReduceExecutor, chunk_paragraphs, deep_merge,
+                                  make_reducer, merge_edits)
+
+
+def paragraph(scene, number, words=100):
+    return Paragraph(f"{scene}.p{number}", scene, f"{scene} {number} " + "word " * words)
+
+
+def test_chunks_break_between_scenes_with_overlap():
+    paragraphs = [paragraph("a", n) for n in range(3)] + [paragraph("b", n) for n in range(3)]
+
+    chunks = chunk_paragraphs(paragraphs, {"a": "c1", "b": "c1"}, max_tokens=400, overlap_paragraphs=1)
+
+    assert [chunk.scenes for chunk in chunks] == [["a"], ["b"]]
+    assert chunks[1].overlap == paragraphs[2].text
+    assert chunks[0].overlap == ""
+
+
+def test_oversized_scene_is_split_between_paragraphs():
+    chunks = chunk_paragraphs([paragraph("a", n) for n in range(5)], max_tokens=260)
+
+    assert [len(chunk.paragraphs) for chunk in chunks] == [2, 2, 1]
+
+
+def test_chunks_prefer_chapter_boundaries_once_half_full():
+    paragraphs = [paragraph("a", 0), paragraph("b", 0), paragraph("c", 0)]
+
+    chunks = chunk_paragraphs(paragraphs, {"a": "c1", "b": "c1", "c": "c2"}, max_tokens=400)
+
+    assert [chunk.chapters for chunk in chunks] == [["c1"], ["c2"]]
+
+
+def test_deep_merge_weights_scores_and_concatenates_findings():
+    merged = deep_merge(
+        [{"score": 1.0, "issues": ["x"], "note": "n"}, {"score": 0.0, "issues": ["x", "y"], "note": "n"}],
+        [3.0, 1.0]
+    )
+
+    assert merged == {"score": 0.75, "issues": ["x", "y"], "note": "n"}
+
+
+@pytest.mark.asyncio
+async def test_executor_maps_chunks_concurrently_and_reduces():
+    running, peak = 0, 0
+
+    async def map_chunk(text, overlap, chunk):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {"edits": [{"op": "delete", "id": chunk.paragraphs[0].id}], "score": chunk.index}
+
+    paragraphs = [paragraph(scene, 0) for scene in "abcdef"]
+    result = await MapReduceExecutor(max_concurrency=2, max_tokens=150).run(
+        paragraphs, map_chunk, make_reducer({"edits": merge_edits})
+    )
+
+    assert peak == 2
+    assert [op["id"] for op in result["edits"]] == [f"{scene}.p0" for scene in "abcdef"]
+    assert result["score"] == pytest.approx(2.5)
@@ -0,0 +1,94 @@
+import pytest
+from artifacts import FilesystemArtifactStore, is_ref
+from workflows.memo import MEMO_KEY, run_memoized
+
+
+class FakeAgent:
+    reads = ("outline", "scenes")
+    writes = ("scenes", "scene_count")
+
+    def __init__(self):
+        self.calls = 0
+
+    async def invoke(self, state):
+        self.calls += 1
+        state["scenes"] = list(state.get("scenes") or []) + [f"scene for {state['outline']}"]
+        state["scene_count"] = len(state["scenes"])
+        return state
+
+
+@pytest.mark.asyncio
+async def test_unchanged_inputs_skip_the_node_while_its_outputs_are_in_the_state():
+    agent = FakeAgent()
+    state = await run_memoized("scene", agent, {"outline": "a"}, agent.invoke)
+
+    # Without a store the memo keeps hashes only, not a copy of the outputs
+    assert "values" not in state[MEMO_KEY]["nodes"]["scene"]
+    story = {**state}
+    replayed = await run_memoized("scene", agent, story, agent.invoke)
+    assert agent.calls == 1
+    assert replayed["scenes"] == ["scene for a"]
+    assert replayed["scene_count"] == 1
+
+    # A fresh state with the same inputs has nothing to replay from
+    await run_memoized("scene", agent, {"outline": "a", MEMO_KEY: state[MEMO_KEY]}, agent.invoke)
+    assert agent.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_own_output_does_not_invalidate_the_node():
+    agent = FakeAgent()
+    state = await run_memoized("scene", agent, {"outline": "a"}, agent.invoke)
+    state = await run_memoized("scene", agent, state, agent.invoke)
+
+    assert agent.calls == 1
+    assert state["scenes"] == ["scene for a"]
+
+
+@pytest.mark.asyncio
+async def test_changed_input_or_force_reruns_the_node():
+    agent = FakeAgent()
+    state = await run_memoized("scene", agent, {"outline": "a"}, agent.invoke)
+
+    state["outline"] = "b"
+    state = await run_memoized("scene", agent, state, agent.invoke)
+    assert agent.calls == 2
+
+    # An edited field the node also writes is a changed input
+    state["scenes"] = ["rewritten by hand"]
+    state = await run_memoized("scene", agent, state, agent.invoke)
+    assert agent.calls == 3
+
+    state["force"] = ["scene"]
+    await run_memoized("scene", agent, state, agent.invoke)
+    assert agent.calls == 4
+
+
+@pytest.mark.asyncio
+async def test_memoized_values_are_artifact_references(tmp_path):
+    store = FilesystemArtifactStore(str(tmp_path))
+    agent = FakeAgent()
+    state = await run_memoized("scene", agent, {"outline": "a"}, agent.invoke, store)
+
+    values = state[MEMO_KEY]["nodes"]["scene"]["values"]
+    assert all(is_ref(value) for value in values.values())
+
+    # A fresh state with the same inputs gets the recorded outputs back
+    replayed = await run_memoized(
+        "scene", agent, {"outline": "a", MEMO_KEY: state[MEMO_KEY]}, agent.invoke, store
+    )
+    assert agent.calls == 1
+    assert replayed["scenes"] == ["scene for a"]
+
+
+@pytest.mark.asyncio
+async def test_agents_without_declared_reads_always_run():
+    class Undeclared(FakeAgent):
+        reads = ()
+
+    agent = Undeclared()
+    state = await run_memoized("scene", agent, {"outline": "a"}, agent.invoke)
+    await run_memoized("scene", agent, state, agent.invoke)
+
+    assert agent.calls == 2
+    assert MEMO_KEY not in state
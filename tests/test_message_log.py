@@ -0,0 +1,67 @@
+import os
+
+import pytest
+from message_log import (MESSAGE_WINDOW, SegmentMessageLog, alog_message,
+                         log_message, message_history)
+from state import apply_delta
+
+
+def test_state_keeps_a_bounded_window_of_message_ids(tmp_path):
+    log = SegmentMessageLog(str(tmp_path), segment_size=7)
+    state = {"project_id": "p1", "message_ids": []}
+
+    for number in range(3 * MESSAGE_WINDOW):
+        apply_delta(state, log_message(state, {"role": "writer", "content": f"draft {number}"}, log))
+
+    assert len(state["message_ids"]) == MESSAGE_WINDOW
+    recent = message_history(state, log).recent()
+    assert [message["content"] for message in recent] == [
+        f"draft {number}" for number in range(2 * MESSAGE_WINDOW, 3 * MESSAGE_WINDOW)
+    ]
+    # The full history is still in the log, split across segment files
+    assert len(list(message_history(state, log))) == 3 * MESSAGE_WINDOW
+    assert len(os.listdir(tmp_path / "p1")) == -(-3 * MESSAGE_WINDOW // 7)
+
+
+def test_reopened_log_continues_after_the_last_message(tmp_path):
+    first = SegmentMessageLog(str(tmp_path), segment_size=2)
+    ids = [first.append("p1", {"content": str(number)}) for number in range(3)]
+
+    second = SegmentMessageLog(str(tmp_path), segment_size=2)
+    ids.append(second.append("p1", {"content": "3"}))
+
+    assert ids == ["0", "1", "2", "3"]
+    assert second.get("p1", ["3", "0"]) == [{"content": "3"}, {"content": "0"}]
+    assert list(second.history("p2")) == []
+
+
+def test_logs_sharing_a_directory_never_reuse_an_id(tmp_path):
+    # Two workers, each with its own log over the same files
+    first = SegmentMessageLog(str(tmp_path), segment_size=3)
+    second = SegmentMessageLog(str(tmp_path), segment_size=3)
+
+    ids = [(first if number % 2 else second).append("p1", {"content": str(number)}) for number in range(8)]
+
+    assert ids == [str(number) for number in range(8)]
+    assert [message["content"] for message in first.history("p1")] == [str(number) for number in range(8)]
+
+
+def test_project_ids_cannot_leave_the_log_directory(tmp_path):
+    log = SegmentMessageLog(str(tmp_path))
+
+    for project_id in ("../x", "a/b", "", ".."):
+        with pytest.raises(ValueError):
+            log.append(project_id, {"content": "x"})
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_async_helpers_log_and_read_recent_messages(tmp_path):
+    log = SegmentMessageLog(str(tmp_path))
+    state = {"project_id": "p1", "message_ids": []}
+
+    for number in range(2):
+        apply_delta(state, await alog_message(state, {"content": f"draft {number}"}, log))
+
+    assert state["message_ids"] == ["0", "1"]
+    assert await message_history(state, log).arecent() == [{"content": "draft 0"}, {"content": "draft 1"}]
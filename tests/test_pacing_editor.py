@@ -60,4 +60,73 @@ async def test_pacing_metrics(test_state):
 async def test_pacing_editor_error_handling():
     agent = PacingEditor()
     with pytest.raises(Exception):
-        await agent.invoke({})
\ No newline at end of file
+        await agent.invoke({})
+
+@pytest.mark.asyncio
+async def test_scenes_are_scored_in_batches():
+    import json
+    import math
+    from unittest.mock import AsyncMock, MagicMock, patch
+
+    from agents.base import BATCH_PROMPT
+
+    with patch("agents.base.ChatAnthropic", MagicMock()):
+        agent = PacingEditor(batch_size=2)
+    scenes = [{"id": f"scene_{number}", "text": f"Scene {number}."} for number in range(5)]
+    book_inputs = []
+
+    async def respond(input_text, prompt=None, **kwargs):
+        if prompt is BATCH_PROMPT:
+            items = [json.loads(line) for line in input_text.splitlines()]
+            return {"results": [{"id": item["id"], "tension_level": 5, "pacing_type": "medium"} for item in items]}
+        book_inputs.append(input_text)
+        return {
+            "pacing_analysis": {"tension_curve": [], "scene_adjustments": []},
+            "pacing_metrics": {"rhythm_consistency": 0.5, "tension_progression": 0.5},
+        }
+
+    agent._ainvoke_chain = AsyncMock(side_effect=respond)
+    result = await agent.invoke({"scenes": scenes, "plot_structure": {}})
+
+    # ceil(5 / 2) scoring calls, then one analysis of the tension curve
+    assert agent._ainvoke_chain.await_count == math.ceil(len(scenes) / 2) + 1
+    assert set(result["scene_pacing"]) == {scene["id"] for scene in scenes}
+    assert "Scene 3." not in book_inputs[0]
+
+@pytest.mark.asyncio
+async def test_incremental_mode_only_rescores_edited_scenes():
+    import json
+    from unittest.mock import AsyncMock, MagicMock, patch
+
+    from agents.base import BATCH_PROMPT
+    from state import apply_delta
+
+    with patch("agents.base.ChatAnthropic", MagicMock()):
+        agent = PacingEditor()
+    scored = []
+
+    async def respond(input_text, prompt=None, **kwargs):
+        if prompt is BATCH_PROMPT:
+            items = [json.loads(line) for line in input_text.splitlines()]
+            scored.append([item["id"] for item in items])
+            return {"results": [{"id": item["id"], "tension_level": 5, "pacing_type": "medium"} for item in items]}
+        return {
+            "pacing_analysis": {"tension_curve": [], "scene_adjustments": []},
+            "pacing_metrics": {"rhythm_consistency": 0.5, "tension_progression": 0.5},
+        }
+
+    agent._ainvoke_chain = AsyncMock(side_effect=respond)
+    state = {
+        "refinement_mode": "incremental",
+        "scenes": [{"id": f"scene_{number}", "text": f"Scene {number}."} for number in range(3)],
+    }
+    state = apply_delta(state, await agent.invoke(state))
+    state["scenes"][1] = {"id": "scene_1", "text": "Scene 1, revised."}
+    state = apply_delta(state, await agent.invoke(state))
+    calls = agent._ainvoke_chain.await_count
+    state = apply_delta(state, await agent.invoke(state))
+
+    assert scored == [["scene_0", "scene_1", "scene_2"], ["scene_1"]]
+    # Nothing changed on the third run, so no call was made
+    assert agent._ainvoke_chain.await_count == calls
+    assert set(state["scene_pacing"]) == {"scene_0", "scene_1", "scene_2"}
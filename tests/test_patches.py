@@ -0,0 +1,58 @@
+from editing.patches import apply_edits, apply_edits_to_state
+from indexing.manuscript import Passage, manuscript_paragraphs, split_paragraphs
+
+
+def paragraphs():
+    return split_paragraphs(Passage("c1", "s1", "One.\n\nTwo.\n\nThree."))
+
+
+def test_ops_apply_against_original_paragraphs():
+    one, two, three = paragraphs()
+
+    result = apply_edits([one, two, three], [
+        {"op": "replace", "id": two.id, "text": "Second."},
+        {"op": "insert", "after": two.id, "text": "Between."},
+        {"op": "insert", "before": one.id, "text": "Zero."},
+        {"op": "delete", "id": three.id},
+    ])
+
+    assert [paragraph.text for paragraph in result.paragraphs] == [
+        "Zero.", "One.", "Second.", "Between."
+    ]
+    assert len(result.applied) == 4 and result.conflicts == []
+
+
+def test_conflicting_ops_are_reported_and_skipped():
+    one, two, _ = paragraphs()
+
+    result = apply_edits([one, two], [
+        {"op": "replace", "id": one.id, "text": "First."},
+        {"op": "delete", "id": one.id},
+        {"op": "replace", "id": "s1.deadbeef", "text": "Stale."},
+        {"op": "rewrite", "id": two.id},
+    ])
+
+    assert [paragraph.text for paragraph in result.paragraphs] == ["First.", "Two."]
+    assert [conflict["reason"] for conflict in result.conflicts] == [
+        "overlapping_edit", "unknown_paragraph", "invalid_op"
+    ]
+
+
+def test_edits_are_written_back_in_the_manuscript_form():
+    state = {"manuscript": "Chapter 1\n\nA cat sat.\n\n* * *\n\nA dog ran.\nChapter 2\n\nRain."}
+    dog = next(p for p in manuscript_paragraphs(state) if p.text == "A dog ran.")
+
+    report = apply_edits_to_state(state, [{"op": "replace", "id": dog.id, "text": "A dog slept."}])
+
+    assert report["scenes_changed"] == ["ch1_s2"]
+    assert state["manuscript"] == (
+        "Chapter 1\n\nA cat sat.\n\n* * *\n\nA dog slept.\n\nChapter 2\n\nRain."
+    )
+
+    structured = {"manuscript": {"chapters": [
+        {"id": "c1", "scenes": [{"id": "a", "content": "Old.\n\nKeep."}]}
+    ]}}
+    old = manuscript_paragraphs(structured)[0]
+    apply_edits_to_state(structured, [{"op": "delete", "id": old.id}])
+
+    assert structured["manuscript"]["chapters"][0]["scenes"][0] == {"id": "a", "content": "Keep."}
@@ -0,0 +1,226 @@
+import asyncio
+import time
+
+import pytest
+from workflows.pipeline import Stage, pipeline
+
+
+def delayed(seconds, log=None, name=None):
+    async def process(item):
+        if log is not None:
+            log.append((name, item))
+        await asyncio.sleep(seconds(item) if callable(seconds) else seconds)
+        return item
+    return process
+
+
+@pytest.mark.asyncio
+async def test_stages_overlap_so_latency_tracks_the_slowest_stage():
+    stages = [Stage(name, delayed(0.05)) for name in ("draft", "refine", "review")]
+
+    started = time.perf_counter()
+    results = [item async for item in pipeline(range(6), *stages)]
+    elapsed = time.perf_counter() - started
+
+    assert results == list(range(6))
+    # Sequential phases would take 3 stages x 6 items x 0.05s = 0.9s
+    assert elapsed < 0.5
+
+
+@pytest.mark.asyncio
+async def test_parallel_stage_keeps_input_order():
+    stage = Stage("draft", delayed(lambda item: 0.05 if item == 0 else 0.01), concurrency=3)
+
+    assert [item async for item in pipeline(range(5), stage)] == list(range(5))
+
+
+@pytest.mark.asyncio
+async def test_backpressure_bounds_how_far_upstream_runs_ahead():
+    log = []
+    fast = Stage("draft", delayed(0, log, "draft"), concurrency=2, buffer=1)
+    slow = Stage("refine", delayed(0.05, log, "refine"), buffer=1)
+
+    async for _ in pipeline(range(10), fast, slow):
+        drafted = sum(1 for name, _ in log if name == "draft")
+        refined = sum(1 for name, _ in log if name == "refine")
+        # In flight: refine's slot and buffer, draft's slots and buffer
+        assert drafted - refined <= 5
+
+
+@pytest.mark.asyncio
+async def test_a_failing_item_stops_the_pipeline():
+    async def fail_on_two(item):
+        if item == 2:
+            raise ValueError("chapter 2 failed")
+        return item
+
+    results = []
+    with pytest.raises(ValueError, match="chapter 2 failed"):
+        async for item in pipeline(range(5), Stage("draft", fail_on_two, concurrency=2)):
+            results.append(item)
+    assert results == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_pipeline_mode_streams_chapters_through_the_phases():
+    from unittest.mock import MagicMock, patch
+    with patch("agents.base.ChatAnthropic", MagicMock()), \
+            patch("agents.executive_director.ChatAnthropic", MagicMock()):
+        from agents.factory import AgentRegistry
+        from workflows.manager import WorkflowManager
+        # A registry of its own, so the mocked agents are not shared with other tests
+        manager = WorkflowManager(agents=AgentRegistry())
+        manager.agents.warm()
+
+    events = []
+
+    async def compose(state):
+        (act,) = state["plot_structure"]
+        return {"scenes": [{"id": "s1", "act": act}], "composition_quality_score": 0.5}
+
+    async def write_dialogue(state):
+        return {"scene_dialogues": [{"scene_id": scene["id"]} for scene in state["scenes"]]}
+
+    def record(name, **updates):
+        async def invoke(state):
+            scope = (state.get("recompute_scope") or {}).get("scenes")
+            events.append((name, [scene["id"] for scene in state.get("scenes", [])], scope))
+            return dict(updates)
+        return invoke
+
+    agents = {
+        "scene": compose,
+        "dialogue": write_dialogue,
+        "pacing": record("pacing"),
+        "continuity": record("continuity", continuity_analysis={}),
+        "style": record("style", style_metrics={}),
+        "summary": record("summary"),
+        "quality": record("quality", quality_assessment={}),
+    }
+    for name, invoke in agents.items():
+        manager.agents[name].invoke = invoke
+    manager.workflow_phases = manager.workflow_phases[4:]
+
+    result = await manager.create_story({
+        "execution_mode": "pipeline",
+        "plot_structure": {"act_one": {"setup": "x"}, "act_two": {"climax": "y"}},
+    })
+
+    story = result["story"]
+    assert [scene["id"] for scene in story["scenes"]] == ["s1", "act_two_s1"]
+    assert [dialogue["scene_id"] for dialogue in story["scene_dialogues"]] == ["s1", "act_two_s1"]
+    # Each chapter is refined as it arrives; the book is summarized once for the review
+    assert [event for event in events if event[0] == "continuity"] == [
+        ("continuity", ["s1"], ["s1"]),
+        ("continuity", ["s1", "act_two_s1"], ["act_two_s1"]),
+    ]
+    assert [event[1] for event in events if event[0] == "summary"] == [["s1", "act_two_s1"]]
+    # Pacing analyses the whole book, so it runs once after the last chapter
+    assert [event for event in events if event[0] == "pacing"] == [
+        ("pacing", ["s1", "act_two_s1"], None)
+    ]
+    assert events[-1] == ("quality", ["s1", "act_two_s1"], None)
+
+
+@pytest.mark.asyncio
+async def test_pipeline_mode_resolves_externalized_fields(tmp_path):
+    from unittest.mock import MagicMock, patch
+
+    from artifacts import FilesystemArtifactStore
+    with patch("agents.base.ChatAnthropic", MagicMock()), \
+            patch("agents.executive_director.ChatAnthropic", MagicMock()):
+        from agents.factory import AgentRegistry
+        from workflows.manager import WorkflowManager
+        manager = WorkflowManager(
+            agents=AgentRegistry(), artifact_store=FilesystemArtifactStore(str(tmp_path))
+        )
+        manager.agents.warm()
+
+    seen = []
+
+    async def compose(state):
+        (act,) = state["plot_structure"]
+        seen.append(state["characters"])
+        return {"scenes": [{"id": "s1", "act": act}], "composition_quality_score": 0.5}
+
+    async def write_dialogue(state):
+        return {"scene_dialogues": [{"scene_id": scene["id"]} for scene in state["scenes"]]}
+
+    def record(**updates):
+        async def invoke(state):
+            seen.append(state["characters"])
+            return dict(updates)
+        return invoke
+
+    agents = {
+        "scene": compose,
+        "dialogue": write_dialogue,
+        "pacing": record(),
+        "continuity": record(continuity_analysis={}),
+        "style": record(style_metrics={}),
+        "summary": record(),
+        "quality": record(quality_assessment={}),
+    }
+    for name, invoke in agents.items():
+        manager.agents[name].invoke = invoke
+    manager.workflow_phases = manager.workflow_phases[4:]
+
+    # Large enough to be kept in the artifact store between phases
+    characters = [{"name": f"character {index}", "bio": "x" * 100} for index in range(10)]
+    await manager.create_story({
+        "execution_mode": "pipeline",
+        "characters": characters,
+        "plot_structure": {"act_one": {"setup": "x"}, "act_two": {"climax": "y"}},
+    })
+
+    assert seen and all(value == characters for value in seen)
+
+
+@pytest.mark.asyncio
+async def test_scene_dialogue_and_style_stream_scene_by_scene():
+    from unittest.mock import MagicMock, patch
+
+    from agents.dialogue_writer import DialogueWriter
+    from agents.scene_composer import SceneComposer
+    from agents.style_editor import StyleEditor
+
+    with patch("agents.base.ChatAnthropic", MagicMock()):
+        composer, writer, editor = SceneComposer(), DialogueWriter(), StyleEditor()
+    events = []
+
+    async def compose(input_text, prompt=None, **variables):
+        if prompt is composer.transitions_prompt:
+            return {"scene_transitions": []}
+        act = "act_two" if "act_two" in input_text else "act_one"
+        await asyncio.sleep(0.1 if act == "act_two" else 0)
+        events.append(("composed", act))
+        return {
+            "scenes": [{"id": f"{act}_s1", "text": f"The {act} begins.\n\nIt ends."}],
+            "composition_quality_score": 0.8,
+        }
+
+    async def write(input_text, prompt=None, **variables):
+        events.append(("dialogue", "act_two" if "act_two" in input_text else "act_one"))
+        return {"scene_dialogue": {"exchanges": []}, "dialogue_metrics": {"naturalness_score": 0.5}}
+
+    async def style(input_text, prompt=None, **variables):
+        paragraph_id = input_text.split("[", 1)[1].split("]", 1)[0]
+        return {
+            "style_analysis": {"prose_quality": {"strengths": [paragraph_id]}},
+            "edits": [{"op": "replace", "id": paragraph_id, "text": "Polished."}],
+            "style_metrics": {"overall_style_score": 0.9},
+        }
+
+    composer._ainvoke_chain, writer._ainvoke_chain, editor._ainvoke_chain = compose, write, style
+    state = {"plot_structure": {"act_one": {"setup": "a"}, "act_two": {"climax": "b"}}}
+
+    items = editor.stream(writer.stream(composer.stream(state), state), state)
+    finished = [item["scene"]["id"] async for item in items]
+
+    assert finished == ["act_one_s1", "act_two_s1"]
+    # Dialogue for act one starts before act two is composed
+    assert events.index(("dialogue", "act_one")) < events.index(("composed", "act_two"))
+    assert [scene["text"] for scene in state["scenes"]] == ["Polished.\n\nIt ends."] * 2
+    assert [dialogue["scene_id"] for dialogue in state["scene_dialogues"]] == finished
+    assert state["style_metrics"] == {"overall_style_score": 0.9}
+    assert state["style_edit_report"]["scenes_changed"] == finished
@@ -0,0 +1,32 @@
+from agents.prompt_format import compact, compare_tokens, to_prompt
+
+CHARACTERS = [
+    {"name": "Sarah", "role": "Protagonist", "description": "An archaeologist", "traits": ["curious"], "notes": ""},
+    {"name": "Tom", "role": "Mentor", "description": "A sailor | retired", "traits": [], "background": None},
+]
+
+
+def test_homogeneous_lists_render_as_a_table_without_empty_fields():
+    text = to_prompt(CHARACTERS)
+
+    assert text.splitlines() == [
+        "name|role|description|traits",
+        'Sarah|Protagonist|An archaeologist|["curious"]',
+        'Tom|Mentor|"A sailor | retired"|',
+    ]
+    assert compare_tokens(CHARACTERS)["saved"] > 0
+
+
+def test_dicts_are_written_a_key_per_line_with_nested_values_minified():
+    world = {"setting": {"place": "harbour", "era": "1890s"}, "rules": ["magic needs salt"], "elements": []}
+
+    assert to_prompt(world) == 'setting: {"place":"harbour","era":"1890s"}\nrules: ["magic needs salt"]'
+    # Zero scores are kept; empty fields are only kept on request
+    assert compact({"score": 0, "passed": False, "notes": None}) == {"score": 0, "passed": False}
+    assert to_prompt({"score": 0.0, "dialogue": {}}, strip_empty=False) == "score: 0.0\ndialogue: {}"
+
+
+def test_abbreviated_keys_come_with_a_legend():
+    text = to_prompt(CHARACTERS, abbreviate=True)
+
+    assert text.splitlines()[:2] == ["(keys: desc=description)", "name|role|desc|traits"]
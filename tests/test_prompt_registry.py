@@ -0,0 +1,36 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from agents.plot_architect import PlotArchitect
+from prompt_registry import PromptRegistry, compile_prompt, get_prompt_registry
+from prompts import AGENT_PROMPTS
+from utils import estimate_tokens
+
+
+def test_agent_templates_are_compiled_once_with_normalized_whitespace():
+    registry = get_prompt_registry()
+
+    for name, raw in AGENT_PROMPTS.items():
+        prompt = registry.get(name)
+        assert registry.get(name) is prompt
+        assert prompt.variables <= {"project_state", "current_phase", "task", "input"}
+        assert not prompt.text.startswith((" ", "\n")) and "  \n" not in prompt.text
+        assert prompt.tokens == estimate_tokens(prompt.text) <= estimate_tokens(raw)
+
+    assert registry.get("no_such_agent").name == "default"
+
+
+def test_invalid_templates_fail_at_load():
+    with pytest.raises(ValueError, match="unknown variables"):
+        PromptRegistry(lambda: {"critic": "Review {manuscript}"}).load()
+    with pytest.raises(ValueError, match="Malformed"):
+        compile_prompt("critic", "Answer as JSON: {")
+
+
+def test_agents_share_compiled_prompts_and_version_them():
+    with patch("agents.base.ChatAnthropic", MagicMock()):
+        first, second = PlotArchitect(), PlotArchitect()
+
+    assert first.prompt is second.prompt
+    assert first.prompt_version == compile_prompt("plot", first.prompt.messages[0].content, literal=True).version
+    assert compile_prompt("plot", "Plan the plot.", literal=True).version != first.prompt_version
@@ -1,3 +1,5 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
 import pytest
 from agents.quality_assessor import QualityAssessor
 
@@ -49,4 +51,26 @@ async def test_improvement_recommendations(test_state):
 async def test_quality_assessor_error_handling():
     agent = QualityAssessor()
     with pytest.raises(Exception):
-        await agent.invoke({})
\ No newline at end of file
+        await agent.invoke({})
+
+@pytest.mark.asyncio
+async def test_prompt_carries_retrieved_context_not_whole_state(test_state):
+    with patch("agents.base.ChatAnthropic", MagicMock()):
+        agent = QualityAssessor()
+    agent._ainvoke_chain = AsyncMock(return_value={"quality_assessment": {
+        "improvement_recommendations": [],
+        "market_readiness": {"score": 0.8}
+    }})
+    test_state["characters"] = [
+        {"name": "Mira", "role": "protagonist", "motivation": "Find her brother"}
+    ]
+    test_state["scenes"] = [
+        {"id": f"scene_{number:03}", "content": "The harbour fog rolled in. " * 40}
+        for number in range(50)
+    ]
+
+    await agent.invoke(test_state)
+
+    input_text = agent._ainvoke_chain.await_args.args[0]
+    assert "[character:Mira]" in input_text
+    assert len(input_text) < len(str(test_state)) / 5
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight, request_key
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution():
+    group = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"scenes": ["scene_001"]}
+
+    results = await asyncio.gather(*[group.do("same-key", fetch) for _ in range(5)])
+
+    assert calls == 1
+    assert all(result == {"scenes": ["scene_001"]} for result in results)
+
+
+@pytest.mark.asyncio
+async def test_different_keys_are_not_coalesced():
+    group = SingleFlight()
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key
+
+    results = await asyncio.gather(
+        group.do("a", lambda: fetch("a")),
+        group.do("b", lambda: fetch("b")),
+    )
+
+    assert sorted(calls) == ["a", "b"]
+    assert results == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_waiters():
+    group = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("provider error")
+
+    results = await asyncio.gather(
+        *[group.do("failing", fail) for _ in range(3)], return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_sequential_calls_execute_again():
+    group = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await group.do("key", fetch) == 1
+    assert await group.do("key", fetch) == 2
+
+
+def test_request_key_depends_on_prompt_and_params():
+    params = {"model": "claude-3-opus-20240229", "temperature": 0.2}
+
+    assert request_key(["prompt"], params) == request_key(["prompt"], dict(params))
+    assert request_key(["prompt"], params) != request_key(["other prompt"], params)
+    assert request_key(["prompt"], params) != request_key(
+        ["prompt"], {**params, "temperature": 0.7}
+    )
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers():
+    group = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "result"
+
+    leader = asyncio.ensure_future(group.do("key", fetch))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(group.do("key", fetch))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await follower == "result"
+    assert leader.cancelled()
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_call_is_cancelled_once_no_caller_waits():
+    group = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def fetch():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    callers = [asyncio.ensure_future(group.do("key", fetch)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    for caller in callers:
+        caller.cancel()
+
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    assert group._inflight == {}
@@ -0,0 +1,90 @@
+import json
+
+from state import (NovelSystemState, ProjectState, TeamState, apply_delta,
+                   delta_view)
+
+
+def test_deltas_append_logs_and_scenes_and_overwrite_scalars():
+    state = {
+        "title": "Draft",
+        "errors": [{"agent": "executive"}],
+        "scenes": [{"id": "s1", "content": "old"}],
+        "composition_quality_score": 0.4,
+    }
+    errors = state["errors"]
+
+    apply_delta(state, {
+        "errors": [{"agent": "creative"}],
+        "scenes": [{"id": "s2", "content": "new"}],
+        "composition_quality_score": 0.8,
+    })
+    # A scene with a known id replaces the old one in place
+    apply_delta(state, {"scenes": [{"id": "s1", "content": "edited"}]})
+
+    assert [error["agent"] for error in state["errors"]] == ["executive", "creative"]
+    assert state["scenes"] == [{"id": "s1", "content": "edited"}, {"id": "s2", "content": "new"}]
+    assert state["composition_quality_score"] == 0.8
+    assert state["title"] == "Draft"
+    # Earlier values are not mutated by the merge
+    assert errors == [{"agent": "executive"}]
+
+
+def test_novel_system_state_reducers():
+    state = {"message_ids": ["0"], "errors": [], "current_output": {"agent": "a"}}
+
+    apply_delta(state, {
+        "message_ids": ["1"], "errors": [{"agent": "b"}], "current_output": {"agent": "b"}
+    }, NovelSystemState)
+
+    assert state["message_ids"] == ["0", "1"]
+    assert state["errors"] == [{"agent": "b"}]
+    assert state["current_output"] == {"agent": "b"}
+
+
+def test_delta_view_collects_writes_without_touching_the_state():
+    state = {"title": "Draft", "processing_ledger": {}}
+    view = delta_view(state)
+
+    view["processing_ledger"] = {"style": ["p1"]}
+
+    assert view["title"] == "Draft"
+    assert view.maps[0] == {"processing_ledger": {"style": ["p1"]}}
+    assert state["processing_ledger"] == {}
+
+
+def project():
+    return ProjectState(
+        project_id="p1", title="T", genre="fantasy", target_audience="adult", word_count_target=1000
+    )
+
+
+def test_project_json_is_compact_and_reused_until_the_state_changes():
+    state = project()
+    first = state.to_json()
+
+    assert "\n" not in first and ", " not in first
+    assert json.loads(first) == state.model_dump(mode="json")
+    assert state.to_json() is first
+
+    state.title = "Renamed"
+    assert json.loads(state.to_json())["title"] == "Renamed"
+
+
+def test_changes_to_nested_states_invalidate_the_cached_json():
+    state = project()
+    state.set_team_state("creative_director", "research", TeamState())
+    cached = state.to_json()
+
+    # Assigning a field of a nested team
+    state.creative_director.teams["research"].quality_metrics = {"depth": 0.9}
+    assert json.loads(state.to_json())["creative_director"]["teams"]["research"]["quality_metrics"] == {"depth": 0.9}
+
+    # In-place changes are picked up after touch()
+    cached = state.to_json()
+    state.human_feedback.append({"content": "More tension"})
+    assert state.to_json() is cached
+    state.touch()
+    assert json.loads(state.to_json())["human_feedback"] == [{"content": "More tension"}]
+
+    state.update_phase("development")
+    assert json.loads(state.to_json())["current_phase"] == "development"
@@ -1,5 +1,9 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
 import pytest
 from agents.style_editor import StyleEditor
+from indexing.manuscript import manuscript_paragraphs
+from state import apply_delta
 
 @pytest.fixture
 def test_state():
@@ -59,4 +63,60 @@ async def test_style_metrics(test_state):
 async def test_style_editor_error_handling():
     agent = StyleEditor()
     with pytest.raises(Exception):
-        await agent.invoke({})
\ No newline at end of file
+        await agent.invoke({})
+
+@pytest.mark.asyncio
+async def test_style_edits_are_applied_as_paragraph_ops(test_state):
+    with patch("agents.base.ChatAnthropic", MagicMock()):
+        agent = StyleEditor()
+    paragraph = manuscript_paragraphs(test_state)[0]
+    agent._ainvoke_chain = AsyncMock(return_value={
+        "style_analysis": {},
+        "edits": [{"op": "replace", "id": paragraph.id, "text": "The room sulked in the dark."}],
+        "style_metrics": {"overall_style_score": 0.8},
+    })
+
+    result = await agent.invoke(test_state)
+
+    assert f"[{paragraph.id}]" in agent._ainvoke_chain.await_args.args[0]
+    assert result["scenes"][0]["content"] == "The room sulked in the dark."
+    assert result["style_edit_report"]["applied"] == 1
+
+
+@pytest.mark.asyncio
+async def test_incremental_mode_skips_already_styled_prose(test_state):
+    with patch("agents.base.ChatAnthropic", MagicMock()):
+        agent = StyleEditor()
+    agent._ainvoke_chain = AsyncMock(return_value={
+        "style_analysis": {}, "edits": [], "style_metrics": {"overall_style_score": 0.8}
+    })
+    test_state["refinement_mode"] = "incremental"
+
+    state = apply_delta(test_state, await agent.invoke(test_state))
+    state = apply_delta(state, await agent.invoke(state))
+
+    assert agent._ainvoke_chain.await_count == 1
+    assert state["refinement_report"]["style"]["skipped_paragraphs"] == 1
+
+
+@pytest.mark.asyncio
+async def test_scene_outlines_are_retrieved_rather_than_all_sent(test_state):
+    with patch("agents.base.ChatAnthropic", MagicMock()):
+        agent = StyleEditor()
+    agent._ainvoke_chain = AsyncMock(return_value={
+        "style_analysis": {}, "edits": [], "style_metrics": {"overall_style_score": 0.8}
+    })
+    test_state["scenes"] = [
+        {"id": "scene_001", "summary": "A sardonic, darkly humorous standoff"},
+        {"id": "scene_002", "summary": "Cargo is loaded"},
+    ]
+    test_state["scene_dialogues"] = [
+        {"scene_id": "scene_001", "exchanges": [{"speaker": "Mira", "line": "Charming."}]},
+        {"scene_id": "scene_002", "exchanges": [{"speaker": "Joss", "line": "Lift."}]},
+    ]
+
+    await agent.invoke(test_state)
+
+    input_text = agent._ainvoke_chain.await_args.args[0]
+    assert "standoff" in input_text and "Charming." in input_text
+    assert "Cargo" not in input_text and "Lift." not in input_text
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from indexing.manuscript import Passage
+from indexing.summary_tree import SummaryTree, summary_context
+
+
+def gather(aws):
+    return asyncio.gather(*aws)
+
+
+def make_passages(second_scene: str = "Tom " * 200):
+    return [
+        Passage("c1", "s1", "Mira " * 200, "act_one"),
+        Passage("c1", "s2", second_scene, "act_one"),
+        Passage("c2", "s3", "A short scene.", "act_one"),
+        Passage("c3", "s4", "Ash " * 200, "act_two"),
+    ]
+
+
+@pytest.fixture
+def summarize():
+    calls = []
+
+    async def fake(level, node_id, parts):
+        calls.append(node_id)
+        return f"summary of {node_id}"
+
+    fake.calls = calls
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_summaries_roll_up_and_regenerate_only_changed_branch(summarize):
+    tree = SummaryTree()
+    await tree.refresh(make_passages(), summarize, gather)
+
+    assert summarize.calls == [
+        "scene:s1", "scene:s2", "scene:s4",
+        "chapter:c1", "chapter:c2", "chapter:c3",
+        "act:act_one", "act:act_two", "book",
+    ]
+    # Short scenes are kept verbatim rather than summarized
+    assert tree.summary("scene:s3") == "A short scene."
+
+    summarize.calls.clear()
+    regenerated = await tree.refresh(make_passages("Tom left " * 200), summarize, gather)
+
+    assert regenerated == ["scene:s2", "chapter:c1", "act:act_one", "book"]
+
+
+@pytest.mark.asyncio
+async def test_chapter_context_is_summaries_plus_target_chapter(summarize):
+    tree = SummaryTree()
+    passages = make_passages()
+    await tree.refresh(passages, summarize, gather)
+
+    context = tree.context_for_chapter(passages, "c3")
+
+    assert "summary of book" in context
+    assert "summary of act:act_two" in context
+    assert "summary of chapter:c2" in context
+    assert "summary of chapter:c1" not in context
+    assert "Ash Ash" in context and "Mira Mira" not in context
+
+
+@pytest.mark.asyncio
+async def test_summary_context_frames_a_chunk_without_its_text(summarize):
+    state = {"manuscript": "Chapter 1\nOnce.\n\nChapter 2\nTwice."}
+    assert summary_context(state, "ch2") == ""
+
+    tree = SummaryTree()
+    await tree.refresh(make_passages(), summarize, gather)
+    state["summary_tree"] = tree.to_dict()
+    state["manuscript"] = {"chapters": [
+        {"id": "c1", "act": "act_one", "scenes": [{"id": "s1", "content": "Mira"}]},
+        {"id": "c2", "act": "act_one", "scenes": [{"id": "s3", "content": "Short"}]},
+    ]}
+
+    context = summary_context(state, "c2")
+    assert "summary of book" in context and "summary of chapter:c1" in context
+    assert "Short" not in context
+    assert summary_context(state, "unknown") == "Book Summary:\nsummary of book"
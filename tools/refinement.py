@@ -6,12 +6,21 @@ from langchain_core.tools import tool
 from langsmith.run_helpers import traceable
 from pydantic import BaseModel
 
+from editing.ledger import record_pass, select_for_pass
+from editing.patches import EDIT_FORMAT, apply_edits_to_state
+from indexing.manuscript import (manuscript_paragraphs, manuscript_passages,
+                                 scene_chapters)
+from indexing.summary_tree import summary_context
 from tools.refinement import (analyze_story_coherence, edit_content,
                               verify_story_elements)
+from workflows.map_reduce import MapReduceExecutor, make_reducer, merge_edits
+
+# Edits are concatenated in chunk order; analyses are merged field by field
+reduce_editing = make_reducer({"edits": merge_edits})
 
 
 @traceable(name="Editor Agent")
-def editor_agent(state: StoryState) -> Dict:
+async def editor_agent(state: StoryState) -> Dict:
     """Agent responsible for story editing and refinement."""
     tools = [
         Tool(name="edit_content", func=edit_content),
@@ -26,18 +35,35 @@ def editor_agent(state: StoryState) -> Dict:
         agent=agent, tools=tools, verbose=True
     )
 
-    result = executor.invoke(
-        {
-            "input": {
-                "title": state["title"],
-                "manuscript": state["manuscript"],
-                "revision_depth": "detailed",
+    chapter = state.get("target_chapter")
+
+    async def edit_chunk(text, overlap, chunk):
+        return await executor.ainvoke(
+            {
+                "input": {
+                    "title": state["title"],
+                    # Book, act and previous chapter summaries for the chunk's chapter
+                    "story_context": summary_context(state, chunk.chapters[0]),
+                    "preceding_text": overlap,
+                    "manuscript": text,
+                    "edit_format": EDIT_FORMAT,
+                    "revision_depth": "detailed",
+                }
             }
-        }
+        )
+
+    result = await MapReduceExecutor().run(
+        manuscript_paragraphs(state, chapter),
+        edit_chunk,
+        reduce_editing,
+        scene_chapters(manuscript_passages(state))
     )
+    edit_report = apply_edits_to_state(state, result.get("edits", []), chapter)
 
     return {
-        "edits": result.get("edits", {}),
+        "edits": result.get("edits", []),
+        "edit_report": edit_report,
+        "manuscript": state["manuscript"],
         "coherence": result.get("coherence_analysis", {}),
         "feedback": ["Editing completed", "Story coherence improved"],
         "agent_type": "editor",
@@ -46,7 +72,7 @@ def editor_agent(state: StoryState) -> Dict:
 
 
 @traceable(name="Proofreader Agent")
-def proofreader_agent(state: StoryState) -> Dict:
+async def proofreader_agent(state: StoryState) -> Dict:
     """Agent responsible for final proofreading and verification."""
     tools = [
         Tool(name="verify_story_elements", func=verify_story_elements),
@@ -61,18 +87,40 @@ def proofreader_agent(state: StoryState) -> Dict:
         agent=agent, tools=tools, verbose=True
     )
 
-    result = executor.invoke(
-        {
-            "input": {
-                "title": state["title"],
-                "manuscript": state["manuscript"],
-                "focus_areas": ["technical", "consistency"],
+    # In incremental mode only changed paragraphs and their neighbours are proofread
+    chapter = state.get("target_chapter")
+    pending, _ = select_for_pass(state, "grammar", chapter)
+
+    async def proofread_chunk(text, overlap, chunk):
+        return await executor.ainvoke(
+            {
+                "input": {
+                    "title": state["title"],
+                    "story_context": summary_context(state, chunk.chapters[0]),
+                    "preceding_text": overlap,
+                    "manuscript": text,
+                    "edit_format": EDIT_FORMAT,
+                    "focus_areas": ["technical", "consistency"],
+                }
             }
-        }
+        )
+
+    result = await MapReduceExecutor().run(
+        pending,
+        proofread_chunk,
+        reduce_editing,
+        scene_chapters(manuscript_passages(state))
     )
+    edit_report = apply_edits_to_state(state, result.get("edits", []), chapter)
+    record_pass(state, "grammar", chapter)
 
     return {
         "verification": result.get("verification", {}),
+        "edits": result.get("edits", []),
+        "edit_report": edit_report,
+        "refinement_report": state["refinement_report"],
+        "processing_ledger": state["processing_ledger"],
+        "manuscript": state["manuscript"],
         "feedback": ["Proofreading completed", "Technical issues resolved"],
         "agent_type": "proofreader",
         "agent_model": state["model_name"],
@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import importlib
 import json
 import re
+import sys
 import uuid
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from config import QUALITY_GATES
 
@@ -124,3 +127,63 @@ def read_file(filepath: str, encoding: str = "utf-8") -> str:
         # If UTF-8 fails, try with a different encoding
         with open(filepath, "r", encoding="cp1252") as f:
             return f.read()
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text.
+
+    Uses the common heuristic of roughly four characters per token, which is
+    close enough for budgeting prompts without a provider tokenizer.
+
+    Args:
+        text: The text to measure.
+
+    Returns:
+        The estimated token count.
+    """
+    return (len(text) + 3) // 4
+
+
+def content_hash(value: Any) -> str:
+    """Compute a stable hash of a JSON-serializable value.
+
+    Dict keys are sorted, so equal content always gives the same hash.
+
+    Args:
+        value: The value to hash.
+
+    Returns:
+        The hex digest of the value's canonical JSON form.
+    """
+    canonical = json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def lazy_attributes(module_name: str, attributes: Dict[str, str]) -> Callable[[str], Any]:
+    """Build a module ``__getattr__`` (PEP 562) that imports attributes on first use.
+
+    Args:
+        module_name: The ``__name__`` of the module the attributes belong to.
+        attributes: Attribute names mapped to ``"package.module:name"``.
+
+    Returns:
+        The ``__getattr__`` function. An imported attribute is stored on the
+        module, so later lookups (and ``unittest.mock.patch``) see it directly.
+    """
+
+    def __getattr__(name: str) -> Any:
+        if name not in attributes:
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+        path, _, attribute = attributes[name].partition(":")
+        value = importlib.import_module(path)
+        if attribute:
+            value = getattr(value, attribute)
+        setattr(sys.modules[module_name], name, value)
+        return value
+
+    return __getattr__
+
+
+def lazy(module_name: str, name: str) -> Any:
+    """Look up a lazily imported attribute from code in the module that owns it."""
+    return getattr(sys.modules[module_name], name)
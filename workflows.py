@@ -87,11 +87,10 @@ def create_initialization_graph() -> StateGraph:
     # Define the initialization node
     async def initialize(state: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            state.update({
+            return {
                 "status": "initialized",
                 "initialization_complete": True
-            })
-            return state
+            }
         except Exception as e:
             logger.error("initialization_failed", error=str(e))
             raise
@@ -110,11 +109,10 @@ def create_development_graph() -> StateGraph:
     
     async def develop(state: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            state.update({
+            return {
                 "status": "developed",
                 "development_complete": True
-            })
-            return state
+            }
         except Exception as e:
             logger.error("development_failed", error=str(e))
             raise
@@ -0,0 +1,456 @@
+"""
+Offline batch execution for non-interactive runs.
+
+In batch mode, agent LLM calls are not sent one by one. A ``BatchCollector``
+gathers them into a provider batch submission (Anthropic Message Batches or
+the OpenAI Batch API), checkpoints the run, polls the batch and hands each
+caller its result when the batch ends. A run interrupted between submit and
+collect resumes from its checkpoint without resubmitting.
+"""
+
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set
+
+import httpx
+import structlog
+
+from artifacts import ArtifactState
+
+logger = structlog.get_logger(__name__)
+
+# The collector for the node currently running in batch mode, if any.
+active_batch: ContextVar[Optional["BatchCollector"]] = ContextVar(
+    "active_batch", default=None
+)
+
+DEFAULT_MAX_TOKENS = 4096
+
+
+class BatchError(Exception):
+    """Raised when a batch or one of its requests fails."""
+
+
+def _split_messages(messages: Sequence[Any]) -> Dict[str, Any]:
+    """Convert LangChain messages into a system prompt and chat turns."""
+    system: List[str] = []
+    turns: List[Dict[str, str]] = []
+    for message in messages:
+        role = getattr(message, "type", "human")
+        if role == "system":
+            system.append(message.content)
+        else:
+            turns.append(
+                {"role": "assistant" if role == "ai" else "user", "content": message.content}
+            )
+    return {"system": "\n\n".join(system), "messages": turns}
+
+
+class BatchProvider(ABC):
+    """Client for a provider's asynchronous batch API."""
+
+    name: str
+
+    @abstractmethod
+    async def submit(self, requests: Dict[str, Dict[str, Any]]) -> str:
+        """Submit requests keyed by custom id and return the batch id."""
+
+    @abstractmethod
+    async def is_complete(self, batch_id: str) -> bool:
+        """Return whether the provider has finished processing the batch."""
+
+    @abstractmethod
+    async def results(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        """Return ``{custom_id: {"text": ...}}`` or ``{custom_id: {"error": ...}}``."""
+
+
+class AnthropicBatchProvider(BatchProvider):
+    """Anthropic Message Batches API."""
+
+    name = "anthropic"
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.client = client or httpx.AsyncClient(
+            base_url=base_url or os.getenv("ANTHROPIC_BATCH_URL", "https://api.anthropic.com"),
+            headers={
+                "x-api-key": api_key or os.getenv("ANTHROPIC_API_KEY", ""),
+                "anthropic-version": "2023-06-01",
+            },
+            timeout=60,
+        )
+
+    async def submit(self, requests: Dict[str, Dict[str, Any]]) -> str:
+        payload = []
+        for custom_id, request in requests.items():
+            split = _split_messages(request["messages"])
+            params = {
+                "model": request["params"]["model"],
+                "max_tokens": request["params"].get("max_tokens") or DEFAULT_MAX_TOKENS,
+                "messages": split["messages"],
+            }
+            if split["system"]:
+                params["system"] = split["system"]
+            if request["params"].get("temperature") is not None:
+                params["temperature"] = request["params"]["temperature"]
+            payload.append({"custom_id": custom_id, "params": params})
+
+        response = await self.client.post("/v1/messages/batches", json={"requests": payload})
+        response.raise_for_status()
+        return response.json()["id"]
+
+    async def is_complete(self, batch_id: str) -> bool:
+        response = await self.client.get(f"/v1/messages/batches/{batch_id}")
+        response.raise_for_status()
+        return response.json()["processing_status"] == "ended"
+
+    async def results(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        response = await self.client.get(f"/v1/messages/batches/{batch_id}/results")
+        response.raise_for_status()
+
+        results = {}
+        for line in response.text.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            result = entry["result"]
+            if result["type"] == "succeeded":
+                text = "".join(
+                    block.get("text", "")
+                    for block in result["message"]["content"]
+                    if block.get("type") == "text"
+                )
+                results[entry["custom_id"]] = {"text": text}
+            else:
+                results[entry["custom_id"]] = {"error": result.get("error", result["type"])}
+        return results
+
+
+class OpenAIBatchProvider(BatchProvider):
+    """OpenAI Batch API over chat completions."""
+
+    name = "openai"
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.client = client or httpx.AsyncClient(
+            base_url=base_url or os.getenv("OPENAI_BATCH_URL", "https://api.openai.com"),
+            headers={"Authorization": f"Bearer {api_key or os.getenv('OPENAI_API_KEY', '')}"},
+            timeout=60,
+        )
+
+    async def submit(self, requests: Dict[str, Dict[str, Any]]) -> str:
+        lines = []
+        for custom_id, request in requests.items():
+            split = _split_messages(request["messages"])
+            messages = split["messages"]
+            if split["system"]:
+                messages = [{"role": "system", "content": split["system"]}] + messages
+            body = {"model": request["params"]["model"], "messages": messages}
+            for param in ("temperature", "max_tokens"):
+                if request["params"].get(param) is not None:
+                    body[param] = request["params"][param]
+            lines.append(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            }))
+
+        upload = await self.client.post(
+            "/v1/files",
+            data={"purpose": "batch"},
+            files={"file": ("batch.jsonl", "\n".join(lines).encode("utf-8"))},
+        )
+        upload.raise_for_status()
+
+        response = await self.client.post("/v1/batches", json={
+            "input_file_id": upload.json()["id"],
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h",
+        })
+        response.raise_for_status()
+        return response.json()["id"]
+
+    async def is_complete(self, batch_id: str) -> bool:
+        response = await self.client.get(f"/v1/batches/{batch_id}")
+        response.raise_for_status()
+        status = response.json()["status"]
+        if status in ("failed", "expired", "cancelled"):
+            raise BatchError(f"Batch {batch_id} {status}")
+        return status == "completed"
+
+    async def results(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        """Results from the output file, and the errors of failed requests from the error file.
+
+        Either file is missing (``null``) when no request succeeded or none failed.
+        """
+        batch = await self.client.get(f"/v1/batches/{batch_id}")
+        batch.raise_for_status()
+
+        results = {}
+        for file_field in ("output_file_id", "error_file_id"):
+            file_id = batch.json().get(file_field)
+            if not file_id:
+                continue
+            response = await self.client.get(f"/v1/files/{file_id}/content")
+            response.raise_for_status()
+
+            for line in response.text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                reply = entry.get("response") or {}
+                if reply.get("status_code") == 200:
+                    text = reply["body"]["choices"][0]["message"]["content"]
+                    results[entry["custom_id"]] = {"text": text}
+                else:
+                    results[entry["custom_id"]] = {"error": entry.get("error") or reply}
+        return results
+
+
+def get_batch_provider(name: Optional[str] = None) -> BatchProvider:
+    """Get the batch provider configured by ``BATCH_PROVIDER``."""
+    name = name or os.getenv("BATCH_PROVIDER", "anthropic")
+    providers = {
+        "anthropic": AnthropicBatchProvider,
+        "openai": OpenAIBatchProvider,
+    }
+    if name not in providers:
+        raise ValueError(f"Unsupported batch provider: {name}")
+    return providers[name]()
+
+
+class BatchCollector:
+    """Collects LLM calls into provider batches and resolves them on completion.
+
+    Calls arriving within ``collect_window`` seconds of each other are sent
+    together. ``on_submit`` is awaited with the batch id before polling
+    starts, so callers can checkpoint the run between submit and collect.
+    """
+
+    def __init__(
+        self,
+        provider: BatchProvider,
+        on_submit: Optional[Callable[[str], Awaitable[None]]] = None,
+        collect_window: float = 1.0,
+        poll_interval: float = 60.0,
+    ):
+        self.provider = provider
+        self.on_submit = on_submit
+        self.collect_window = collect_window
+        self.poll_interval = poll_interval
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._waiters: Dict[str, asyncio.Future] = {}
+        # The collect window restarts with each call until it fires; batches
+        # already being submitted or collected are never interrupted
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def dispatch(
+        self, key: str, messages: Sequence[Any], params: Dict[str, Any]
+    ) -> str:
+        """Queue a request for the next batch and wait for its response text."""
+        if key in self.results:
+            return self._unwrap(key, self.results[key])
+
+        if key not in self._waiters:
+            self._waiters[key] = asyncio.get_running_loop().create_future()
+            self._pending[key] = {"messages": list(messages), "params": params}
+            self._schedule_flush()
+        return await asyncio.shield(self._waiters[key])
+
+    async def collect(self, batch_id: str) -> None:
+        """Wait for a submitted batch and record its results for replay."""
+        while not await self.provider.is_complete(batch_id):
+            logger.info("batch_pending", batch_id=batch_id, provider=self.provider.name)
+            await asyncio.sleep(self.poll_interval)
+
+        results = await self.provider.results(batch_id)
+        self.results.update(results)
+        logger.info("batch_collected", batch_id=batch_id, result_count=len(results))
+
+    def _schedule_flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(self.collect_window, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self._timer = None
+        requests, self._pending = self._pending, {}
+        if requests:
+            task = asyncio.create_task(self._flush(requests))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, requests: Dict[str, Dict[str, Any]]) -> None:
+        try:
+            batch_id = await self.provider.submit(requests)
+            logger.info(
+                "batch_submitted",
+                batch_id=batch_id,
+                provider=self.provider.name,
+                request_count=len(requests),
+            )
+            if self.on_submit is not None:
+                await self.on_submit(batch_id)
+            await self.collect(batch_id)
+        except BaseException as e:
+            logger.error("batch_failed", error=str(e) or type(e).__name__)
+            for key in requests:
+                waiter = self._waiters.pop(key)
+                if not waiter.done():
+                    waiter.set_exception(BatchError(str(e) or type(e).__name__))
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        for key in requests:
+            waiter = self._waiters.pop(key)
+            if waiter.done():
+                continue
+            result = self.results.get(key, {"error": "missing from batch results"})
+            if "text" in result:
+                waiter.set_result(result["text"])
+            else:
+                waiter.set_exception(BatchError(str(result["error"])))
+
+    @staticmethod
+    def _unwrap(key: str, result: Dict[str, Any]) -> str:
+        if "text" not in result:
+            raise BatchError(f"Batch request {key} failed: {result['error']}")
+        return result["text"]
+
+
+class BatchCheckpointStore:
+    """In-memory store for batch checkpoints, keyed by run id."""
+
+    def __init__(self):
+        self._checkpoints: Dict[str, Dict[str, Any]] = {}
+
+    async def save(self, run_id: str, checkpoint: Dict[str, Any]) -> None:
+        self._checkpoints[run_id] = checkpoint
+
+    async def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        return self._checkpoints.get(run_id)
+
+    async def clear(self, run_id: str) -> None:
+        self._checkpoints.pop(run_id, None)
+
+
+class MongoBatchCheckpointStore(BatchCheckpointStore):
+    """Batch checkpoints persisted in MongoDB so runs survive restarts."""
+
+    def __init__(self, mongo_manager: Any, collection: str = "batch_checkpoints"):
+        self.mongo = mongo_manager
+        self.collection = collection
+
+    async def save(self, run_id: str, checkpoint: Dict[str, Any]) -> None:
+        collection = await self.mongo.get_collection(self.collection)
+        await collection.replace_one(
+            {"run_id": run_id}, {"run_id": run_id, **checkpoint}, upsert=True
+        )
+
+    async def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        collection = await self.mongo.get_collection(self.collection)
+        document = await collection.find_one({"run_id": run_id})
+        if document:
+            document.pop("_id", None)
+        return document
+
+    async def clear(self, run_id: str) -> None:
+        collection = await self.mongo.get_collection(self.collection)
+        await collection.delete_one({"run_id": run_id})
+
+
+def get_checkpoint_store(name: Optional[str] = None) -> BatchCheckpointStore:
+    """Get the checkpoint store configured by ``BATCH_CHECKPOINTS``.
+
+    ``mongodb`` keeps checkpoints in the configured database, so a run
+    resumes after a restart; ``memory`` (the default) only within a process.
+    """
+    name = name or os.getenv("BATCH_CHECKPOINTS", "memory")
+    if name == "mongodb":
+        from mongodb import MongoManager
+
+        return MongoBatchCheckpointStore(MongoManager())
+    if name != "memory":
+        raise ValueError(f"Unsupported batch checkpoint store: {name}")
+    return BatchCheckpointStore()
+
+
+class BatchExecutor:
+    """Runs workflow nodes with their LLM calls routed through provider batches."""
+
+    def __init__(
+        self,
+        provider: Optional[BatchProvider] = None,
+        store: Optional[BatchCheckpointStore] = None,
+        collect_window: float = 1.0,
+        poll_interval: float = 60.0,
+    ):
+        self.provider = provider or get_batch_provider()
+        self.store = store or get_checkpoint_store()
+        self.collect_window = collect_window
+        self.poll_interval = poll_interval
+
+    async def run_node(
+        self,
+        run_id: str,
+        node: Dict[str, Any],
+        invoke: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        state: Dict[str, Any],
+        batch_ids: Sequence[str] = (),
+    ) -> Dict[str, Any]:
+        """Run one node in batch mode.
+
+        Args:
+            run_id: Identifier of the workflow run, used for checkpoints.
+            node: Position of the node in the workflow (e.g. phase and agent).
+            invoke: The node function.
+            state: The state the node runs on.
+            batch_ids: Batches submitted by an interrupted earlier attempt,
+                whose results are collected and replayed instead of resubmitted.
+        """
+        submitted = list(batch_ids)
+        # Externalized state checkpoints as references only
+        snapshot = state.snapshot() if isinstance(state, ArtifactState) else dict(state)
+
+        async def checkpoint(batch_id: str) -> None:
+            submitted.append(batch_id)
+            await self.store.save(run_id, {
+                "node": node,
+                "batch_ids": list(submitted),
+                "provider": self.provider.name,
+                "state": snapshot,
+            })
+
+        collector = BatchCollector(
+            self.provider,
+            on_submit=checkpoint,
+            collect_window=self.collect_window,
+            poll_interval=self.poll_interval,
+        )
+        for batch_id in batch_ids:
+            await collector.collect(batch_id)
+
+        token = active_batch.set(collector)
+        try:
+            result = await invoke(state)
+        finally:
+            active_batch.reset(token)
+
+        await self.store.clear(run_id)
+        return result
@@ -0,0 +1,257 @@
+import asyncio
+import time
+from contextlib import AsyncExitStack
+from typing import (Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple,
+                    Optional, Tuple)
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+# Seconds assumed for a task that has not run before
+DEFAULT_TASK_ESTIMATE = 30.0
+
+
+class Task(NamedTuple):
+    """One node of the workflow DAG.
+
+    ``gate`` maps state fields (dotted for nested values) to the minimum
+    the task must leave in them; a task failing its gate is re-run up to
+    ``retries`` times before the run fails.
+    """
+    name: str
+    reads: Tuple[str, ...] = ()
+    writes: Tuple[str, ...] = ()
+    phase: str = ""
+    model: Optional[str] = None
+    gate: Dict[str, float] = {}
+    retries: int = 1
+    estimate: float = DEFAULT_TASK_ESTIMATE
+
+
+class QualityGateError(RuntimeError):
+    """A task kept failing its quality gate."""
+
+
+def _field(state: Dict[str, Any], path: str) -> Any:
+    value: Any = state
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def check_task_gate(task: Task, state: Dict[str, Any]) -> Dict[str, Any]:
+    """Check a task's quality gate, in the shape of ``utils.check_quality_gate``."""
+    failed_criteria = []
+    for criterion, threshold in task.gate.items():
+        actual = _field(state, criterion)
+        try:
+            passed = float(actual) >= threshold
+        except (TypeError, ValueError):
+            passed = False
+        if not passed:
+            failed_criteria.append({
+                "criterion": criterion,
+                "threshold": threshold,
+                "actual": "Not measured" if actual is None else actual,
+            })
+    return {"passed": not failed_criteria, "failed_criteria": failed_criteria}
+
+
+class TaskGraph:
+    """Dependencies between tasks, derived from the fields they read and write.
+
+    Tasks are declared in a valid sequential order. A task depends on an
+    earlier one when it reads a field the earlier task writes, writes a
+    field the earlier task reads, or writes the same field; any other pair
+    may run at the same time.
+    """
+
+    def __init__(self, tasks: Iterable[Task]):
+        self.tasks = {task.name: task for task in tasks}
+        self.order = list(self.tasks)
+        self.dependencies: Dict[str, List[str]] = {}
+        for position, name in enumerate(self.order):
+            task = self.tasks[name]
+            reads, writes = set(task.reads), set(task.writes)
+            self.dependencies[name] = [
+                earlier for earlier in self.order[:position]
+                if reads & set(self.tasks[earlier].writes)
+                or writes & set(self.tasks[earlier].reads)
+                or writes & set(self.tasks[earlier].writes)
+            ]
+
+    def edges(self) -> List[Tuple[str, str]]:
+        """Direct dependencies as ``(before, after)`` pairs, implied ones left out."""
+        edges = []
+        for name in self.order:
+            direct = set(self.dependencies[name])
+            for dependency in self.dependencies[name]:
+                direct -= set(self._ancestors(dependency))
+            edges.extend((dependency, name) for dependency in self.dependencies[name] if dependency in direct)
+        return edges
+
+    def _ancestors(self, name: str) -> List[str]:
+        seen: List[str] = []
+        pending = list(self.dependencies[name])
+        while pending:
+            dependency = pending.pop()
+            if dependency not in seen:
+                seen.append(dependency)
+                pending.extend(self.dependencies[dependency])
+        return seen
+
+    def critical_path(self, durations: Dict[str, float]) -> Tuple[List[str], float]:
+        """The longest chain of dependent tasks and its length in seconds.
+
+        No schedule finishes faster than this, however many tasks run at once.
+        """
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for name in self.order:
+            before = max(self.dependencies[name], key=lambda dependency: finish[dependency], default=None)
+            previous[name] = before
+            finish[name] = (finish[before] if before else 0.0) + durations.get(name, self.tasks[name].estimate)
+        if not finish:
+            return [], 0.0
+
+        last: Optional[str] = max(self.order, key=lambda name: finish[name])
+        total = finish[last]
+        path = []
+        while last is not None:
+            path.append(last)
+            last = previous[last]
+        return path[::-1], total
+
+    def remaining(self, durations: Dict[str, float]) -> Dict[str, float]:
+        """Per task, the longest chain of work from its start to the end of the run."""
+        dependents: Dict[str, List[str]] = {name: [] for name in self.order}
+        for name, dependencies in self.dependencies.items():
+            for dependency in dependencies:
+                dependents[dependency].append(name)
+        remaining: Dict[str, float] = {}
+        for name in reversed(self.order):
+            remaining[name] = durations.get(name, self.tasks[name].estimate) + max(
+                (remaining[dependent] for dependent in dependents[name]), default=0.0
+            )
+        return remaining
+
+
+class DagScheduler:
+    """Runs a task graph with as many tasks at once as the dependencies allow.
+
+    At most ``max_concurrency`` tasks run at a time overall, and at most
+    ``model_limits[model]`` per model. When more tasks are ready than there
+    are slots, the ones heading the longest remaining chain start first.
+    """
+
+    def __init__(self, max_concurrency: int = 4, model_limits: Optional[Dict[str, int]] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.model_limits = dict(model_limits or {})
+
+    async def run(
+        self,
+        graph: TaskGraph,
+        state: Dict[str, Any],
+        run_task: Callable[[Task, Dict[str, Any], int], Awaitable[Any]],
+        durations: Optional[Dict[str, float]] = None
+    ) -> Dict[str, Any]:
+        """Run every task of ``graph`` on ``state`` and report the schedule.
+
+        ``run_task(task, state, attempt)`` updates the shared ``state`` in
+        place; ``attempt`` counts quality gate retries from zero.
+        ``durations`` are the expected task durations, usually those of the
+        previous run; they drive the critical-path estimate and the start order.
+        """
+        durations = dict(durations or {})
+        estimated_path, estimated_seconds = graph.critical_path(durations)
+        priority = graph.remaining(durations)
+        logger.info(
+            "dag_run_started",
+            tasks=len(graph.order),
+            critical_path=estimated_path,
+            estimated_seconds=round(estimated_seconds, 3)
+        )
+
+        slots = asyncio.Semaphore(self.max_concurrency)
+        model_slots = {
+            model: asyncio.Semaphore(max(1, limit)) for model, limit in self.model_limits.items()
+        }
+        actual: Dict[str, float] = {}
+        gates: Dict[str, Dict[str, Any]] = {}
+
+        async def execute(task: Task) -> None:
+            async with AsyncExitStack() as stack:
+                # The model slot first, so a task waiting on its model holds no global slot
+                if task.model in model_slots:
+                    await stack.enter_async_context(model_slots[task.model])
+                await stack.enter_async_context(slots)
+                started = time.perf_counter()
+                for attempt in range(task.retries + 1):
+                    await run_task(task, state, attempt)
+                    gates[task.name] = check_task_gate(task, state)
+                    if gates[task.name]["passed"]:
+                        break
+                    logger.warning(
+                        "quality_gate_failed",
+                        task=task.name,
+                        attempt=attempt,
+                        failed_criteria=gates[task.name]["failed_criteria"]
+                    )
+                else:
+                    raise QualityGateError(
+                        f"Task {task.name} failed its quality gate: {gates[task.name]['failed_criteria']}"
+                    )
+                actual[task.name] = time.perf_counter() - started
+
+        waiting = {name: set(graph.dependencies[name]) for name in graph.order}
+        running: Dict[asyncio.Task, str] = {}
+        done: set = set()
+        started = time.perf_counter()
+        try:
+            while waiting or running:
+                ready = sorted(
+                    (name for name, dependencies in waiting.items() if dependencies <= done),
+                    key=lambda name: -priority[name]
+                )
+                for name in ready:
+                    del waiting[name]
+                    running[asyncio.create_task(execute(graph.tasks[name]))] = name
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    future.result()
+                    done.add(name)
+                    logger.info("dag_task_complete", task=name, seconds=round(actual[name], 3))
+        except Exception as e:
+            logger.error("dag_run_failed", error=str(e), completed=sorted(done))
+            raise
+        finally:
+            for future in running:
+                future.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+        elapsed = time.perf_counter() - started
+        path, path_seconds = graph.critical_path(actual)
+        work = sum(actual.values())
+        report = {
+            "estimated_critical_path": estimated_path,
+            "estimated_seconds": estimated_seconds,
+            "critical_path": path,
+            "critical_path_seconds": path_seconds,
+            "elapsed_seconds": elapsed,
+            "work_seconds": work,
+            "parallelism": work / elapsed if elapsed else 1.0,
+            "durations": actual,
+            "quality_gates": gates,
+        }
+        logger.info(
+            "dag_run_complete",
+            critical_path=path,
+            critical_path_seconds=round(path_seconds, 3),
+            elapsed_seconds=round(elapsed, 3),
+            parallelism=round(report["parallelism"], 2)
+        )
+        return report
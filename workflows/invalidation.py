@@ -0,0 +1,257 @@
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import structlog
+
+from indexing.entity_index import EntityIndex, sync_entity_index
+from indexing.manuscript import manuscript_passages
+from utils import estimate_tokens
+
+logger = structlog.get_logger(__name__)
+
+# Fields holding per-scene content; nodes reading them can be limited to some scenes
+SCENE_FIELDS = ("scenes", "manuscript", "scene_dialogues")
+
+# Feedback type -> the node that owns what the feedback is about
+FEEDBACK_NODES = {
+    "vision": "creative",
+    "world": "world_building",
+    "setting": "world_building",
+    "character": "character",
+    "plot": "plot",
+    "dialogue": "dialogue",
+    "pacing": "pacing",
+    "continuity": "continuity",
+    "style": "style",
+    "prose": "style",
+}
+DEFAULT_FEEDBACK_NODE = "style"
+
+CHAPTER_REFERENCE = re.compile(r"\bchapter\s+([\w-]+)", re.IGNORECASE)
+SCENE_REFERENCE = re.compile(r"\bscene\s+([\w-]+)", re.IGNORECASE)
+
+
+def recompute_scope(state: Dict[str, Any]) -> Optional[Set[str]]:
+    """The scenes a feedback re-run is limited to, or None for every scene."""
+    scenes = (state.get("recompute_scope") or {}).get("scenes")
+    return None if scenes is None else set(scenes)
+
+
+def recompute_feedback(state: Dict[str, Any]) -> Optional[str]:
+    """The feedback that triggered the current re-run, if any."""
+    return (state.get("recompute_scope") or {}).get("feedback")
+
+
+class DependencyGraph:
+    """Which workflow nodes depend on which, from the state fields they read and write.
+
+    A node depends on every earlier node that writes a field it reads.
+    Nodes marked ``item_scoped`` can be re-run for some scenes only.
+    """
+
+    def __init__(self, agents: Dict[str, Any], order: List[str]):
+        self.agents = agents
+        self.order = [node for node in order if node in agents]
+
+    def reads(self, node: str) -> Set[str]:
+        return set(getattr(self.agents[node], "reads", ()))
+
+    def writes(self, node: str) -> Set[str]:
+        return set(getattr(self.agents[node], "writes", ()))
+
+    def dependents(self, node: str, keep: Optional[Callable[[str], bool]] = None) -> List[str]:
+        """Later nodes reading something ``node`` writes, directly or transitively.
+
+        Nodes rejected by ``keep`` are left out, and so are the fields they write.
+        """
+        changed = self.writes(node)
+        affected = []
+        for later in self.order[self.order.index(node) + 1:]:
+            if self.reads(later) & changed and (keep is None or keep(later)):
+                affected.append(later)
+                changed |= self.writes(later)
+        return affected
+
+    def is_scene_consumer(self, node: str) -> bool:
+        """Whether a node works from scenes without generating them anew.
+
+        Item-scoped nodes qualify even when they rewrite the scenes they are
+        given; a scene generator such as the composer does not.
+        """
+        if getattr(self.agents[node], "item_scoped", False):
+            return True
+        return bool(self.reads(node) & set(SCENE_FIELDS)) and not (
+            self.writes(node) & {"scenes", "manuscript"}
+        )
+
+
+def _resolve_references(references: List[str], known: List[str], prefix: str) -> List[str]:
+    """Ids among ``known`` matching references such as "3" for chapter "ch3"."""
+    resolved = []
+    for reference in references:
+        for candidate in (reference, f"{prefix}{reference}"):
+            if candidate in known and candidate not in resolved:
+                resolved.append(candidate)
+    return resolved
+
+
+def feedback_targets(
+    feedback: Dict[str, Any], index: EntityIndex
+) -> Dict[str, List[str]]:
+    """The entities, chapters and scenes a feedback item is about.
+
+    Explicit ``targets`` take precedence; otherwise characters and places are
+    recognized by name (or alias) in the feedback text, and chapters and
+    scenes by references such as "chapter 3".
+    """
+    explicit = feedback.get("targets") or {}
+    content = str(feedback.get("content", ""))
+    chapters = list(dict.fromkeys(index.scene_chapters.values()))
+    scenes = list(index.scene_hashes)
+
+    entities = explicit.get("entities") or explicit.get("characters")
+    if entities is None:
+        entities = [entity for _, _, entity in index.matcher.find(content)]
+    return {
+        "entities": list(dict.fromkeys(entities)),
+        "chapters": _resolve_references(
+            explicit.get("chapters") or CHAPTER_REFERENCE.findall(content), chapters, "ch"
+        ),
+        "scenes": _resolve_references(
+            explicit.get("scenes") or SCENE_REFERENCE.findall(content), scenes, ""
+        ),
+    }
+
+
+def affected_scenes(index: EntityIndex, targets: Dict[str, List[str]]) -> List[str]:
+    """Scenes using any targeted entity, in any targeted chapter, or targeted directly."""
+    affected = set(targets["scenes"])
+    for entity in targets["entities"]:
+        affected.update(index.scenes_with(entity))
+    chapters = set(targets["chapters"])
+    affected.update(scene for scene, chapter in index.scene_chapters.items() if chapter in chapters)
+    return [scene for scene in index.scene_hashes if scene in affected]
+
+
+def _prompt_text(agent: Any) -> str:
+    prompt = getattr(agent, "prompt", None)
+    if prompt is None:
+        return ""
+    return "\n".join(
+        str(getattr(message, "content", None) or getattr(getattr(message, "prompt", None), "template", ""))
+        for message in prompt.messages
+    )
+
+
+def _scene_slice(field: str, value: Any, scenes: Set[str], texts: Dict[str, str]) -> Any:
+    """The part of a scene field that belongs to ``scenes``."""
+    if field == "manuscript":
+        return [text for scene, text in texts.items() if scene in scenes]
+    if isinstance(value, list):
+        return [
+            item for item in value
+            if not isinstance(item, dict) or str(item.get("id", item.get("scene_id"))) in scenes
+        ]
+    return value
+
+
+def estimate_node_tokens(
+    agent: Any,
+    state: Dict[str, Any],
+    scenes: Optional[Set[str]] = None,
+    texts: Optional[Dict[str, str]] = None
+) -> Dict[str, int]:
+    """Rough input and output tokens of re-running a node, optionally for some scenes.
+
+    Input is the prompt plus the fields the node reads; output is taken
+    from what the node wrote last time, scaled to the share of scenes.
+    """
+    texts = texts or {}
+    fields = {}
+    for field in getattr(agent, "reads", ()):
+        value = state.get(field)
+        if scenes is not None and field in SCENE_FIELDS:
+            value = _scene_slice(field, value, scenes, texts)
+        fields[field] = value
+
+    share = 1.0
+    if scenes is not None and texts:
+        share = len(scenes & set(texts)) / len(texts)
+    previous = {field: state.get(field) for field in getattr(agent, "writes", ()) if field in state}
+    return {
+        "input_tokens": estimate_tokens(_prompt_text(agent)) + estimate_tokens(
+            json.dumps(fields, default=str, ensure_ascii=False)
+        ),
+        "output_tokens": int(share * estimate_tokens(
+            json.dumps(previous, default=str, ensure_ascii=False)
+        )),
+    }
+
+
+def plan_recompute(
+    state: Dict[str, Any],
+    feedback: Dict[str, Any],
+    agents: Dict[str, Any],
+    order: List[str]
+) -> Dict[str, Any]:
+    """The minimal set of nodes and scenes to re-run for a feedback item.
+
+    Starts from the node owning what the feedback targets and follows the
+    field dependencies forward. Feedback about particular characters,
+    places, chapters or scenes keeps the story structure: only the start
+    node and the nodes consuming scenes are re-run, for the affected scenes
+    alone where the node supports it. Nothing is executed; ``state`` only
+    gains an up-to-date ``entity_index``.
+    """
+    graph = DependencyGraph(agents, order)
+    passages = manuscript_passages(state)
+    texts = {passage.scene: passage.text for passage in passages}
+    index = sync_entity_index(state, passages)
+    targets = feedback_targets(feedback, index)
+    scenes = affected_scenes(index, targets)
+    localized = bool(scenes)
+
+    start = FEEDBACK_NODES.get(str(feedback.get("type", "")).lower(), DEFAULT_FEEDBACK_NODE)
+    if start not in graph.order:
+        start = graph.order[0]
+    nodes = [start] + graph.dependents(start, graph.is_scene_consumer if localized else None)
+
+    planned = []
+    for node in nodes:
+        agent = agents[node]
+        scoped = localized and getattr(agent, "item_scoped", False)
+        if scoped:
+            items = scenes
+        elif node == start and targets["entities"]:
+            items = targets["entities"]
+        else:
+            items = ["*"]
+        planned.append({
+            "node": node,
+            "items": items,
+            **estimate_node_tokens(agent, state, set(scenes) if scoped else None, texts)
+        })
+
+    input_tokens = sum(node["input_tokens"] for node in planned)
+    output_tokens = sum(node["output_tokens"] for node in planned)
+    plan = {
+        "feedback_type": feedback.get("type", "general"),
+        "targets": targets,
+        "scenes": scenes,
+        "localized": localized,
+        "nodes": planned,
+        "estimated_tokens": {
+            "input": input_tokens,
+            "output": output_tokens,
+            "total": input_tokens + output_tokens,
+        },
+    }
+    logger.info(
+        "recompute_planned",
+        start=start,
+        nodes=len(planned),
+        scenes=len(scenes),
+        estimated_tokens=input_tokens + output_tokens
+    )
+    return plan
@@ -1,36 +1,35 @@
-from typing import Dict, Any, List
-from agents import (
-    ExecutiveDirectorAgent,
-    CreativeDirectorAgent,
-    WorldBuildingExpert,
-    CharacterDesigner,
-    PlotArchitect,
-    SceneComposer,
-    DialogueWriter,
-    PacingEditor,
-    ContinuityChecker,
-    StyleEditor,
-    QualityAssessor
-)
+import json
+import os
+from typing import Dict, Any, List, Optional, Tuple
+from agents.factory import AgentRegistry, get_agent_registry
 import structlog
 
+from artifacts import ArtifactState, ArtifactStore, get_artifact_store
+from state import apply_delta
+from workflows.batch import BatchExecutor
+from workflows.dag import DagScheduler, Task, TaskGraph
+from workflows.invalidation import plan_recompute
+from workflows.map_reduce import deep_merge
+from workflows.memo import run_memoized
+from workflows.pipeline import Stage, pipeline
+
 logger = structlog.get_logger(__name__)
 
 class WorkflowManager:
-    def __init__(self):
-        self.agents = {
-            'executive': ExecutiveDirectorAgent(),
-            'creative': CreativeDirectorAgent(),
-            'world_building': WorldBuildingExpert(),
-            'character': CharacterDesigner(),
-            'plot': PlotArchitect(),
-            'scene': SceneComposer(),
-            'dialogue': DialogueWriter(),
-            'pacing': PacingEditor(),
-            'continuity': ContinuityChecker(),
-            'style': StyleEditor(),
-            'quality': QualityAssessor()
-        }
+    def __init__(
+        self,
+        batch_executor: Optional[BatchExecutor] = None,
+        artifact_store: Optional[ArtifactStore] = None,
+        agents: Optional[AgentRegistry] = None
+    ):
+        self.logger = logger
+        self._batch_executor = batch_executor
+        # Agent outputs are kept in the artifact store when one is configured
+        if artifact_store is None and os.getenv('ARTIFACT_STORE_URL'):
+            artifact_store = get_artifact_store()
+        self.artifact_store = artifact_store
+        # Agents are shared with every other manager and factory in the process
+        self.agents = agents if agents is not None else get_agent_registry()
         
         # Define workflow phases and their agents
         self.workflow_phases = [
@@ -57,19 +56,44 @@ class WorkflowManager:
             {
                 'name': 'scene_creation',
                 'agents': ['scene', 'dialogue'],
-                'required_fields': ['plot_structure']
+                'required_fields': ['plot_structure'],
+                'per_chapter': True
             },
             {
                 'name': 'refinement',
                 'agents': ['pacing', 'continuity', 'style'],
-                'required_fields': ['scenes', 'scene_dialogues']
+                'required_fields': ['scenes', 'scene_dialogues'],
+                'per_chapter': True,
+                # Analyses of the whole book, run once after the last chapter in pipeline mode
+                'book_agents': ['pacing']
             },
             {
                 'name': 'final_review',
-                'agents': ['quality'],
+                # The quality review reads the summary tree of the refined prose
+                'agents': ['summary', 'quality'],
                 'required_fields': ['style_metrics', 'continuity_analysis']
             }
         ]
+
+        # Pipeline mode: chapters drafted at once, and chapters waiting between stages
+        self.pipeline_concurrency = int(os.getenv('PIPELINE_CONCURRENCY', '2'))
+        self.pipeline_buffer = int(os.getenv('PIPELINE_BUFFER', '1'))
+
+        # Stream mode: agents chained scene by scene, each starting on a scene
+        # as soon as the previous agent has finished it
+        self.scene_stream = ['scene', 'dialogue', 'style']
+
+        # DAG mode: agents run as soon as the fields they read are written,
+        # within a global limit and per-model limits such as {"claude-3-opus-20240229": 2}
+        self.dag_concurrency = int(os.getenv('DAG_CONCURRENCY', '4'))
+        self.model_concurrency = json.loads(os.getenv('MODEL_CONCURRENCY', '{}'))
+        # Minimum scores an agent must leave in the state; failing agents are re-run once
+        self.quality_gates = {
+            'creative': {'creative_quality_score': 0.5},
+            'world_building': {'world_consistency_score': 0.5},
+            'plot': {'plot_coherence_score': 0.5},
+            'scene': {'composition_quality_score': 0.5}
+        }
     
     def _validate_state(self, state: Dict[str, Any], required_fields: List[str]) -> None:
         """Validate that required fields are present in state."""
@@ -80,13 +104,82 @@ class WorkflowManager:
         if missing_fields:
             raise ValueError(f"Missing required fields: {missing_fields}")
     
-    async def execute_phase(self, phase: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute all agents in a single phase."""
+    @property
+    def batch_executor(self) -> BatchExecutor:
+        """Executor used for runs with ``execution_mode`` set to ``batch``."""
+        if self._batch_executor is None:
+            self._batch_executor = BatchExecutor()
+        return self._batch_executor
+
+    @staticmethod
+    def _run_id(state: Dict[str, Any]) -> str:
+        return str(state.get('project_id') or state.get('title'))
+
+    async def _externalize(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Move large state fields into the artifact store, leaving references."""
+        if self.artifact_store is None:
+            return state
+        if not isinstance(state, ArtifactState):
+            state = ArtifactState(state, self.artifact_store)
+        return await state.aexternalize()
+
+    async def _invoke_agent(
+        self,
+        phase: Dict[str, Any],
+        agent_name: str,
+        state: Dict[str, Any],
+        batch_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Invoke an agent directly, or through provider batches in batch mode.
+
+        An agent whose inputs are unchanged since its last run is skipped and
+        its outputs replayed, unless it is listed in ``state['force']``.
+        """
+        agent = self.agents[agent_name]
+
+        async def run(state: Dict[str, Any]) -> Dict[str, Any]:
+            # Agents return only the fields they change
+            if state.get('execution_mode') != 'batch':
+                return apply_delta(state, await agent.invoke(state))
+            return apply_delta(state, await self.batch_executor.run_node(
+                self._run_id(state),
+                {'phase': phase['name'], 'agent': agent_name},
+                agent.invoke,
+                state,
+                batch_ids=batch_ids or []
+            ))
+
+        return await run_memoized(agent_name, agent, state, run, self.artifact_store)
+
+    async def execute_phase(
+        self,
+        phase: Dict[str, Any],
+        state: Dict[str, Any],
+        resume: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Execute all agents in a single phase.
+
+        When ``resume`` holds a batch checkpoint for this phase, execution
+        restarts at the checkpointed agent and collects its pending batches.
+        """
+        agent_names = phase['agents']
+        if resume:
+            agent_names = agent_names[agent_names.index(resume['node']['agent']):]
+
+        streaming = state.get('execution_mode') == 'stream'
         try:
-            for agent_name in phase['agents']:
+            for agent_name in agent_names:
+                if streaming and agent_name in self.scene_stream:
+                    if agent_name == self.scene_stream[0]:
+                        state = await self._run_scene_stream(state)
+                        self.logger.info("scene_stream_complete", phase=phase['name'])
+                    continue
+                batch_ids = []
+                if resume and agent_name == resume['node']['agent']:
+                    batch_ids = resume['batch_ids']
                 try:
-                    agent = self.agents[agent_name]
-                    state = await agent.invoke(state)
+                    state = await self._invoke_agent(phase, agent_name, state, batch_ids)
+                    state = await self._externalize(state)
                     self.logger.info(
                         "agent_complete",
                         phase=phase['name'],
@@ -108,14 +201,292 @@ class WorkflowManager:
                 error=str(e)
             )
             raise
-    
+
+    def _last_phases(self) -> Dict[str, Dict[str, Any]]:
+        """The last phase running each agent, for agents listed in several phases."""
+        return {
+            agent_name: phase for phase in self.workflow_phases for agent_name in phase['agents']
+        }
+
+    @property
+    def node_order(self) -> List[str]:
+        """Every agent in the order the workflow last runs them."""
+        last_phases = self._last_phases()
+        return [
+            agent for phase in self.workflow_phases for agent in phase['agents']
+            if last_phases[agent] is phase
+        ]
+
+    def task_graph(self) -> TaskGraph:
+        """The workflow as a task DAG, from the agents' declared reads and writes.
+
+        An agent running in several phases is a single task, at the position
+        of its last phase; the graph orders it after whatever it reads.
+        """
+        tasks = []
+        last_phases = self._last_phases()
+        for phase in self.workflow_phases:
+            for agent_name in phase['agents']:
+                if last_phases[agent_name] is not phase:
+                    continue
+                agent = self.agents[agent_name]
+                tasks.append(Task(
+                    name=agent_name,
+                    reads=tuple(agent.reads),
+                    writes=tuple(agent.writes),
+                    phase=phase['name'],
+                    model=getattr(agent, 'model_name', None) or getattr(agent.llm, 'model', None),
+                    gate=self.quality_gates.get(agent_name, {})
+                ))
+        return TaskGraph(tasks)
+
+    async def _run_dag(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Run every agent through the DAG scheduler.
+
+        Durations of the previous run, kept in ``state['task_durations']``,
+        give the critical-path estimate; the run's own schedule is stored
+        in ``state['dag_report']``.
+        """
+        graph = self.task_graph()
+        phases = self._last_phases()
+        self._validate_state(state, self.workflow_phases[0]['required_fields'])
+
+        async def run_task(task: Task, state: Dict[str, Any], attempt: int) -> None:
+            if attempt:
+                # A quality gate retry must not replay the memoized output
+                apply_delta(state, await self.agents[task.name].invoke(state))
+            else:
+                await self._invoke_agent(phases[task.name], task.name, state)
+            await self._externalize(state)
+
+        scheduler = DagScheduler(self.dag_concurrency, self.model_concurrency)
+        report = await scheduler.run(graph, state, run_task, state.get('task_durations'))
+        state['task_durations'] = report['durations']
+        state['dag_report'] = {
+            key: report[key] for key in (
+                'estimated_critical_path', 'estimated_seconds', 'critical_path',
+                'critical_path_seconds', 'elapsed_seconds', 'parallelism'
+            )
+        }
+        return state
+
+    def plan_feedback(self, state: Dict[str, Any], feedback: Dict[str, Any]) -> Dict[str, Any]:
+        """Dry run: which agents and scenes a feedback item would recompute, and at what token cost."""
+        return plan_recompute(state, feedback, self.agents, self.node_order)
+
+    async def apply_feedback(
+        self,
+        state: Dict[str, Any],
+        feedback: Dict[str, Any],
+        plan: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Re-run only the agents and scenes a feedback item affects.
+
+        The planned agents are forced past their memo; item-scoped agents
+        are limited to the affected scenes through ``recompute_scope``.
+        """
+        plan = plan or self.plan_feedback(state, feedback)
+        nodes = [node['node'] for node in plan['nodes']]
+        phases = self._last_phases()
+        previous_force = state.get('force')
+        state['force'] = nodes
+        state['recompute_scope'] = {
+            'scenes': plan['scenes'] if plan['localized'] else None,
+            'feedback': feedback.get('content')
+        }
+
+        try:
+            for agent_name in nodes:
+                state = await self._invoke_agent(phases[agent_name], agent_name, state)
+                state = await self._externalize(state)
+                self.logger.info("agent_recomputed", agent=agent_name, scenes=len(plan['scenes']))
+        finally:
+            state.pop('recompute_scope', None)
+            if previous_force is None:
+                state.pop('force', None)
+            else:
+                state['force'] = previous_force
+
+        state.setdefault('human_feedback', []).append({**feedback, 'recomputed': nodes})
+        return state
+
+    async def _run_scene_stream(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the ``scene_stream`` agents as one pipeline of async generators.
+
+        The first agent's ``stream(state)`` yields scene items; each later
+        agent's ``stream(items, state)`` consumes them as they come and
+        yields them on, so the first scene is finished while later ones are
+        still being composed. Each agent updates the state once its stream
+        is exhausted.
+        """
+        source, *stages = [self.agents[agent_name] for agent_name in self.scene_stream]
+        items = source.stream(state, buffer=self.pipeline_buffer)
+        for agent in stages:
+            items = agent.stream(items, state, buffer=self.pipeline_buffer)
+
+        finished = 0
+        async for item in items:
+            finished += 1
+            self.logger.info("scene_finished", scene=item['scene'].get('id'), finished=finished)
+        return state
+
+    async def _run_agents(
+        self, phase: Dict[str, Any], agent_names: List[str], state: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        for agent_name in agent_names:
+            state = await self._invoke_agent(phase, agent_name, state)
+        return state
+
+    @staticmethod
+    def _chapter_view(state: Dict[str, Any], chapter: str, section: Any) -> Dict[str, Any]:
+        """A state for drafting one chapter on its own, from its section of the plot.
+
+        Copied through ``state.copy()``, so an ``ArtifactState`` view still
+        resolves its artifact references when read.
+        """
+        view = state.copy()
+        view.update({
+            'plot_structure': {chapter: section},
+            'scenes': [],
+            'scene_dialogues': [],
+            'recompute_scope': None
+        })
+        return view
+
+    def _merge_chapter(
+        self, book: Dict[str, Any], view: Dict[str, Any], phase: Dict[str, Any]
+    ) -> List[str]:
+        """Append a drafted chapter to the book and return its scene ids.
+
+        Scene ids clashing with earlier chapters are prefixed with the
+        chapter, in the scenes and their dialogue alike. Other outputs are
+        merged, with scores weighted by scene count.
+        """
+        chapter = next(iter(view['plot_structure']))
+        taken = {str(scene.get('id')) for scene in book.get('scenes', [])}
+        renamed = {}
+        for scene in view.get('scenes', []):
+            if str(scene.get('id')) in taken:
+                renamed[scene.get('id')] = f"{chapter}_{scene.get('id')}"
+                scene['id'] = renamed[scene.get('id')]
+            taken.add(str(scene.get('id')))
+        for dialogue in view.get('scene_dialogues', []):
+            dialogue['scene_id'] = renamed.get(dialogue.get('scene_id'), dialogue.get('scene_id'))
+
+        weights = [float(len(book.get('scenes', []))), float(len(view.get('scenes', [])))]
+        fields = dict.fromkeys(
+            field for agent_name in phase['agents'] for field in self.agents[agent_name].writes
+        )
+        for field in fields:
+            if field in ('scenes', 'scene_dialogues'):
+                book[field] = list(book.get(field) or []) + list(view.get(field) or [])
+            elif field in view:
+                book[field] = deep_merge([book.get(field), view[field]], weights)
+        return [str(scene.get('id')) for scene in view.get('scenes', [])]
+
+    async def _run_chapter_pipeline(
+        self,
+        state: Dict[str, Any],
+        phases: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Stream chapters through the per-chapter phases as soon as each is ready.
+
+        Chapters (the sections of the plot structure) are drafted in
+        parallel by the first phase, up to ``pipeline_concurrency`` at once.
+        Each later phase then handles chapters in story order on the growing
+        book, while the next chapters are still being drafted; item-scoped
+        agents only work on the new chapter's scenes (``recompute_scope``),
+        and a phase's ``book_agents`` run once on the finished book instead.
+        A bounded queue between the stages keeps drafting from running more
+        than ``pipeline_buffer`` chapters ahead.
+        """
+        draft_phase, *chapter_phases = phases
+        book = state
+        chapters = self.agents['scene']._split_plot_structure(state['plot_structure'])
+
+        async def draft(chapter: Tuple[str, Any]) -> Dict[str, Any]:
+            name, section = chapter
+            view = await self._run_agents(
+                draft_phase, draft_phase['agents'], self._chapter_view(book, name, section)
+            )
+            self.logger.info("chapter_drafted", chapter=name, scenes=len(view.get('scenes', [])))
+            return view
+
+        async def refine(view: Dict[str, Any]) -> Dict[str, Any]:
+            nonlocal book
+            scene_ids = self._merge_chapter(book, view, draft_phase)
+            book['recompute_scope'] = {'scenes': scene_ids, 'feedback': None}
+            try:
+                for phase in chapter_phases:
+                    agent_names = [
+                        agent_name for agent_name in phase['agents']
+                        if agent_name not in phase.get('book_agents', [])
+                    ]
+                    book = await self._run_agents(phase, agent_names, book)
+            finally:
+                book.pop('recompute_scope', None)
+            book = await self._externalize(book)
+            chapter = next(iter(view['plot_structure']))
+            self.logger.info("chapter_refined", chapter=chapter, scenes=len(scene_ids))
+            return chapter
+
+        stages = [
+            Stage('draft', draft, self.pipeline_concurrency, self.pipeline_buffer),
+            Stage('refine', refine, 1, self.pipeline_buffer)
+        ]
+        async for chapter in pipeline(chapters, *stages):
+            logger.info("chapter_complete", chapter=chapter)
+
+        # Agents analysing the whole book would redo it for every chapter
+        for phase in chapter_phases:
+            if phase.get('book_agents'):
+                book = await self._run_agents(phase, phase['book_agents'], book)
+                book = await self._externalize(book)
+        return book
+
     async def create_story(self, initial_state: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute the complete story creation workflow."""
+        """Execute the complete story creation workflow.
+
+        With ``execution_mode`` set to ``batch``, agent calls are sent through
+        provider batch APIs and an interrupted run resumes from its last
+        batch checkpoint. With ``execution_mode`` set to ``pipeline``, the
+        per-chapter phases stream chapters instead of waiting for the whole
+        book; see ``_run_chapter_pipeline``. With ``stream``, scene creation,
+        dialogue and style are chained scene by scene; see
+        ``_run_scene_stream``. With ``dag``, the phases give way to a task
+        DAG where independent agents run concurrently; see ``_run_dag``.
+        """
         state = initial_state.copy()
-        
+        phases = self.workflow_phases
+        resume = None
+
         try:
-            for phase in self.workflow_phases:
-                state = await self.execute_phase(phase, state)
+            if state.get('execution_mode') == 'batch':
+                resume = await self.batch_executor.store.load(self._run_id(state))
+                if resume:
+                    state = resume['state']
+                    phase_names = [phase['name'] for phase in phases]
+                    phases = phases[phase_names.index(resume['node']['phase']):]
+                    logger.info("batch_run_resumed", run_id=self._run_id(state), **resume['node'])
+
+            state = await self._externalize(state)
+            if state.get('execution_mode') == 'dag':
+                state = await self._run_dag(state)
+                phases = []
+            streaming = state.get('execution_mode') == 'pipeline'
+            pipelined = False
+            for position, phase in enumerate(phases):
+                if streaming and phase.get('per_chapter'):
+                    if pipelined:
+                        continue
+                    chapter_phases = [item for item in phases if item.get('per_chapter')]
+                    state = await self._run_chapter_pipeline(state, chapter_phases)
+                    pipelined = True
+                    logger.info("chapter_pipeline_complete", phases=[item['name'] for item in chapter_phases])
+                    continue
+
+                phase_resume = resume if resume and resume['node']['phase'] == phase['name'] else None
+                state = await self.execute_phase(phase, state, resume=phase_resume)
                 
                 logger.info(
                     "phase_complete",
@@ -0,0 +1,184 @@
+import json
+from numbers import Number
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import structlog
+
+from agents.base import gather_bounded
+from indexing.manuscript import Paragraph, annotate_paragraphs
+from utils import estimate_tokens
+
+logger = structlog.get_logger(__name__)
+
+
+class ManuscriptChunk(NamedTuple):
+    index: int
+    chapters: List[str]
+    scenes: List[str]
+    paragraphs: List[Paragraph]
+    # Read-only text preceding the chunk, so each chunk starts with context
+    overlap: str
+
+    @property
+    def tokens(self) -> int:
+        return sum(estimate_tokens(paragraph.text) for paragraph in self.paragraphs)
+
+
+def chunk_paragraphs(
+    paragraphs: List[Paragraph],
+    scene_chapters: Optional[Dict[str, str]] = None,
+    max_tokens: int = 6000,
+    overlap_paragraphs: int = 2
+) -> List[ManuscriptChunk]:
+    """Pack whole scenes into chunks of at most ``max_tokens``.
+
+    Chunks break between scenes, and prefer to break between chapters once
+    half full. A scene longer than the budget is split between paragraphs.
+    Each chunk carries the last ``overlap_paragraphs`` paragraphs before it
+    as read-only context.
+    """
+    scene_chapters = scene_chapters or {}
+    scenes: List[List[Paragraph]] = []
+    for paragraph in paragraphs:
+        if scenes and scenes[-1][0].scene == paragraph.scene:
+            scenes[-1].append(paragraph)
+        else:
+            scenes.append([paragraph])
+
+    groups: List[List[Paragraph]] = []
+    current: List[Paragraph] = []
+    size = 0
+    for scene in scenes:
+        scene_tokens = sum(estimate_tokens(paragraph.text) for paragraph in scene)
+        new_chapter = bool(current) and (
+            scene_chapters.get(scene[0].scene) != scene_chapters.get(current[-1].scene)
+        )
+        if current and (size + scene_tokens > max_tokens or (new_chapter and size > max_tokens // 2)):
+            groups.append(current)
+            current, size = [], 0
+        for paragraph in scene:
+            paragraph_tokens = estimate_tokens(paragraph.text)
+            if current and size + paragraph_tokens > max_tokens:
+                groups.append(current)
+                current, size = [], 0
+            current.append(paragraph)
+            size += paragraph_tokens
+    if current:
+        groups.append(current)
+
+    chunks = []
+    seen = 0
+    for index, group in enumerate(groups):
+        preceding = paragraphs[max(0, seen - overlap_paragraphs):seen]
+        chunks.append(ManuscriptChunk(
+            index,
+            list(dict.fromkeys(scene_chapters.get(paragraph.scene, "") for paragraph in group)),
+            list(dict.fromkeys(paragraph.scene for paragraph in group)),
+            group,
+            "\n\n".join(paragraph.text for paragraph in preceding)
+        ))
+        seen += len(group)
+    return chunks
+
+
+def _unique(items: List[Any]) -> List[Any]:
+    seen, unique = set(), []
+    for item in items:
+        key = json.dumps(item, sort_keys=True, default=str)
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
+
+
+def deep_merge(values: List[Any], weights: List[float]) -> Any:
+    """Merge partial results field by field.
+
+    Numbers are averaged by weight, lists concatenated without duplicates,
+    dicts merged per key, and distinct strings joined by line.
+    """
+    present = [(value, weight) for value, weight in zip(values, weights) if value is not None]
+    if not present:
+        return None
+    values, weights = [value for value, _ in present], [weight for _, weight in present]
+
+    if all(isinstance(value, Number) and not isinstance(value, bool) for value in values):
+        total = sum(weights) or len(values)
+        return sum(value * (weight or 1) for value, weight in zip(values, weights)) / total
+    if all(isinstance(value, list) for value in values):
+        return _unique([item for value in values for item in value])
+    if all(isinstance(value, dict) for value in values):
+        keys = list(dict.fromkeys(key for value in values for key in value))
+        return {key: deep_merge([value.get(key) for value in values], weights) for key in keys}
+    if all(isinstance(value, str) for value in values):
+        return "\n".join(dict.fromkeys(values))
+    return values[0]
+
+
+def merge_edits(values: List[Any], weights: List[float]) -> List[Dict[str, Any]]:
+    """Concatenate edit ops in chunk order, dropping exact duplicates."""
+    return _unique([op for value in values if isinstance(value, list) for op in value])
+
+
+Reducer = Callable[[List[Dict[str, Any]], List[float]], Dict[str, Any]]
+
+
+def make_reducer(fields: Optional[Dict[str, Callable[[List[Any], List[float]], Any]]] = None) -> Reducer:
+    """A reducer merging the named fields with their own functions and the rest with ``deep_merge``."""
+    fields = fields or {}
+
+    def reduce(results: List[Dict[str, Any]], weights: List[float]) -> Dict[str, Any]:
+        keys = list(dict.fromkeys(key for result in results for key in result))
+        return {
+            key: fields.get(key, deep_merge)([result.get(key) for result in results], weights)
+            for key in keys
+        }
+
+    return reduce
+
+
+class MapReduceExecutor:
+    """Run an agent over a manuscript chunk by chunk and merge what it returns.
+
+    Any agent that accepts a ``manuscript`` can be mapped: ``map_chunk``
+    receives the chunk text and the read-only overlap, and the partial
+    results are combined by an agent-specific reducer, weighted by chunk size.
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_tokens: int = 6000, overlap_paragraphs: int = 2):
+        self.max_concurrency = max_concurrency
+        self.max_tokens = max_tokens
+        self.overlap_paragraphs = overlap_paragraphs
+
+    async def run(
+        self,
+        paragraphs: List[Paragraph],
+        map_chunk: Callable[[str, str, ManuscriptChunk], Awaitable[Dict[str, Any]]],
+        reduce: Reducer,
+        scene_chapters: Optional[Dict[str, str]] = None,
+        annotate: bool = True
+    ) -> Dict[str, Any]:
+        """Map ``map_chunk(text, overlap, chunk)`` over the chunks and reduce the results.
+
+        With ``annotate`` the chunk text carries paragraph ids for edit ops.
+        """
+        chunks = chunk_paragraphs(
+            paragraphs, scene_chapters, self.max_tokens, self.overlap_paragraphs
+        )
+        if not chunks:
+            return {}
+
+        results = await gather_bounded(
+            [
+                map_chunk(
+                    annotate_paragraphs(chunk.paragraphs) if annotate
+                    else "\n\n".join(paragraph.text for paragraph in chunk.paragraphs),
+                    chunk.overlap,
+                    chunk
+                )
+                for chunk in chunks
+            ],
+            self.max_concurrency
+        )
+        logger.info("map_reduce_complete", chunk_count=len(chunks))
+        return reduce(list(results), [float(chunk.tokens) for chunk in chunks])
@@ -0,0 +1,158 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+import structlog
+
+from artifacts import ArtifactStore, is_ref
+from utils import content_hash
+
+logger = structlog.get_logger(__name__)
+
+MEMO_KEY = "node_memo"
+
+
+def node_version(agent: Any) -> str:
+    """Hash of what makes an agent's output differ for the same inputs.
+
+    Changing the agent class, its prompt or its model parameters
+    invalidates every memoized output of the node.
+    """
+    model_params = agent._model_params() if hasattr(agent, "_model_params") else None
+    return content_hash([
+        type(agent).__name__,
+        getattr(agent, "prompt_version", None) or repr(getattr(agent, "prompt", None)),
+        model_params,
+    ])
+
+
+def is_forced(state: Dict[str, Any], node: str) -> bool:
+    """Whether ``state["force"]`` asks for ``node`` to run regardless of the memo.
+
+    ``force`` is either ``True`` for every node or a list of node names.
+    """
+    force = state.get("force")
+    if force is True or force == "all":
+        return True
+    return isinstance(force, (list, tuple, set)) and node in force
+
+
+class NodeMemo:
+    """Per-node record of the inputs a workflow node read and the outputs it wrote.
+
+    Inputs and outputs are kept as per-field hashes. A node is replayed
+    instead of run when its version and every input hash match and, unless
+    an artifact store keeps its output values, its outputs are still in the
+    state. Fields a node both reads and writes (an agent extending its own
+    ``scenes``) still match while they hold exactly what the node last wrote.
+    """
+
+    def __init__(
+        self,
+        nodes: Optional[Dict[str, Dict[str, Any]]] = None,
+        store: Optional[ArtifactStore] = None
+    ):
+        self.nodes = nodes or {}
+        self.store = store
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], store: Optional[ArtifactStore] = None) -> "NodeMemo":
+        return cls((data or {}).get("nodes"), store)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"nodes": self.nodes}
+
+    @staticmethod
+    def fingerprint(state: Dict[str, Any], fields: Iterable[str]) -> Dict[str, str]:
+        return {field: content_hash(state.get(field)) for field in fields}
+
+    def lookup(
+        self,
+        node: str,
+        version: str,
+        state: Dict[str, Any],
+        reads: Iterable[str]
+    ) -> Optional[Dict[str, Any]]:
+        """The outputs to replay for ``node``, or None if it must run."""
+        entry = self.nodes.get(node)
+        if not entry or entry["version"] != version:
+            return None
+
+        inputs = self.fingerprint(state, reads)
+        if set(inputs) != set(entry["inputs"]):
+            return None
+        for field, field_hash in inputs.items():
+            if entry["outputs"].get(field) == field_hash:
+                # Still the node's own output: compare what it read before writing it
+                field_hash = entry["inputs"].get(field)
+            if entry["inputs"].get(field) != field_hash:
+                return None
+
+        if "values" not in entry:
+            # Without a store only hashes are kept: replay while the state
+            # still holds exactly what the node wrote
+            if self.fingerprint(state, entry["outputs"]) != entry["outputs"]:
+                return None
+            return {field: state[field] for field in entry["outputs"] if field in state}
+        return {
+            field: self.store.get(value) if is_ref(value) and self.store else value
+            for field, value in entry["values"].items()
+        }
+
+    def record(
+        self,
+        node: str,
+        version: str,
+        inputs: Dict[str, str],
+        state: Dict[str, Any],
+        writes: Iterable[str]
+    ) -> None:
+        """Remember the outputs ``node`` wrote for the given input hashes.
+
+        With an artifact store the output values are kept as references, so
+        they can be replayed into any state with the same inputs. Without
+        one only their hashes are kept, so the memo never duplicates large
+        fields of the state.
+        """
+        values = {field: state[field] for field in writes if field in state}
+        entry = {
+            "version": version,
+            "inputs": inputs,
+            "outputs": self.fingerprint(values, values)
+        }
+        if self.store is not None:
+            entry["values"] = {field: self.store.put(value) for field, value in values.items()}
+        self.nodes[node] = entry
+
+
+async def run_memoized(
+    node: str,
+    agent: Any,
+    state: Dict[str, Any],
+    run: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+    store: Optional[ArtifactStore] = None
+) -> Dict[str, Any]:
+    """Run a workflow node, or replay its memoized outputs if its inputs are unchanged.
+
+    The memo lives in ``state["node_memo"]``. Agents that declare no
+    ``reads`` always run, as do nodes listed in ``state["force"]``.
+    """
+    reads = tuple(getattr(agent, "reads", ()))
+    writes = tuple(getattr(agent, "writes", ()))
+    if not reads:
+        return await run(state)
+
+    memo = NodeMemo.from_dict(state.get(MEMO_KEY), store)
+    version = node_version(agent)
+    if not is_forced(state, node):
+        outputs = memo.lookup(node, version, state, reads)
+        if outputs is not None:
+            state.update(outputs)
+            logger.info("node_memoized", node=node, fields=len(outputs))
+            return state
+
+    inputs = memo.fingerprint(state, reads)
+    state = await run(state)
+    # Re-read the memo: nodes running concurrently may have recorded meanwhile
+    memo = NodeMemo.from_dict(state.get(MEMO_KEY), store)
+    memo.record(node, version, inputs, state, writes)
+    state[MEMO_KEY] = memo.to_dict()
+    return state
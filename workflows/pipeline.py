@@ -0,0 +1,113 @@
+import asyncio
+from typing import (Any, AsyncIterable, AsyncIterator, Awaitable, Callable,
+                    Iterable, List, Optional, Union)
+
+import structlog
+
+logger = structlog.get_logger(__name__)
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_DONE = object()
+
+
+async def iterate(items: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    """An async iterator over a plain or async iterable."""
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class Stage:
+    """One step of a streaming pipeline.
+
+    A stage consumes an async iterator of items and yields the processed
+    items as they finish. Up to ``concurrency`` items are processed at once,
+    and at most ``buffer`` finished items wait for the next stage. A stage
+    only pulls another item when it has a free slot, so a slow downstream
+    stage holds back everything upstream of it. With ``ordered`` the output
+    keeps the input order.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        process: Callable[[Any], Awaitable[Any]],
+        concurrency: int = 1,
+        buffer: int = 1,
+        ordered: bool = True
+    ):
+        self.name = name
+        self.process = process
+        self.concurrency = max(1, concurrency)
+        self.buffer = max(1, buffer)
+        self.ordered = ordered
+
+    async def __call__(self, items: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+        output: asyncio.Queue = asyncio.Queue(maxsize=self.buffer)
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks: List[asyncio.Task] = []
+
+        async def work(item: Any, previous: Optional[asyncio.Event], emitted: asyncio.Event) -> None:
+            try:
+                result: Any = await self.process(item)
+            except Exception as e:
+                result = _Failure(e)
+            try:
+                if previous is not None:
+                    await previous.wait()
+                await output.put(result)
+            finally:
+                emitted.set()
+                slots.release()
+
+        async def feed() -> None:
+            previous: Optional[asyncio.Event] = None
+            try:
+                async for item in iterate(items):
+                    await slots.acquire()
+                    emitted = asyncio.Event()
+                    tasks.append(asyncio.create_task(
+                        work(item, previous if self.ordered else None, emitted)
+                    ))
+                    previous = emitted
+                await asyncio.gather(*tasks)
+                await output.put(_DONE)
+            except Exception as e:
+                await output.put(_Failure(e))
+
+        feeder = asyncio.create_task(feed())
+        try:
+            while True:
+                result = await output.get()
+                if result is _DONE:
+                    break
+                if isinstance(result, _Failure):
+                    logger.error("pipeline_stage_failed", stage=self.name, error=str(result.error))
+                    raise result.error
+                yield result
+        finally:
+            for task in [feeder, *tasks]:
+                task.cancel()
+            await asyncio.gather(feeder, *tasks, return_exceptions=True)
+
+
+def pipeline(
+    source: Union[Iterable[Any], AsyncIterable[Any]], *stages: Stage
+) -> AsyncIterator[Any]:
+    """Chain stages so each consumes the previous one's output as it is produced.
+
+    With every stage busy at once, total latency approaches that of the
+    slowest stage rather than the sum of all stages.
+    """
+    items: AsyncIterator[Any] = iterate(source)
+    for stage in stages:
+        items = stage(items)
+    return items